@@ -0,0 +1,87 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+# The routes, state, controller and storage of the Flask API, served by an ASGI server
+# (uvicorn asgi_api:app). Handlers never block the event loop: inference runs on its own
+# executor and storage work in the thread pool, so /api/status keeps answering while
+# frames are being processed
+import flask_api as api
+
+# Inference is CPU-bound and holds the model: a few dedicated threads, so queued frames
+# never take the threads storage requests run on
+inference_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('TRAFFIC_INFERENCE_WORKERS', 1)),
+                                        thread_name_prefix='inference')
+
+async def home(request):
+    return JSONResponse({'message': 'Traffic Monitoring API is running'})
+
+async def get_status(request):
+    return JSONResponse(api.current_state)
+
+async def update_status(request):
+    data = await request.json()
+    # Controller update, telemetry logging and publishing to the stream clients
+    state = await run_in_threadpool(api.apply_update, data)
+    return JSONResponse({'status': 'success', 'state': state})
+
+async def stream_status(request):
+    return StreamingResponse(api.broadcaster.astream(request.headers.get('Last-Event-ID')),
+                             media_type='text/event-stream', headers=api.STREAM_HEADERS)
+
+async def detect_traffic(request):
+    form = await request.form()
+    if 'image' not in form:
+        return JSONResponse({'error': 'No image provided'}, status_code=400)
+    image_bytes = await form['image'].read()
+    lane_id = int(form.get('lane_id', 1))
+
+    loop = asyncio.get_running_loop()
+    vehicles_count, has_ambulance = await loop.run_in_executor(inference_executor, api.detect_image, image_bytes)
+    return JSONResponse({'lane_id': lane_id, 'vehicles_count': vehicles_count, 'has_ambulance': has_ambulance})
+
+async def control_simulation(request):
+    data = await request.json()
+    return JSONResponse(api.simulation_action(data.get('action', 'status')))
+
+async def get_data(request):
+    try:
+        records, next_cursor = await run_in_threadpool(api.data_page, request.query_params)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    return JSONResponse(records, headers={'X-Next-Cursor': next_cursor} if next_cursor else None)
+
+async def aggregate_data(request):
+    try:
+        return JSONResponse(await run_in_threadpool(api.aggregate_records, request.query_params))
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+async def export_data(request):
+    try:
+        mimetype, headers, chunks = api.export_stream(request.query_params)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    # StreamingResponse pulls the chunks of a plain iterator in the thread pool
+    return StreamingResponse(chunks, media_type=mimetype, headers=headers)
+
+app = Starlette(routes=[
+    Route('/', home),
+    Route('/api/status', get_status, methods=['GET']),
+    Route('/api/update', update_status, methods=['POST']),
+    Route('/api/stream', stream_status, methods=['GET']),
+    Route('/api/detect', detect_traffic, methods=['POST']),
+    Route('/api/simulate', control_simulation, methods=['POST']),
+    Route('/api/data', get_data, methods=['GET']),
+    Route('/api/data/aggregate', aggregate_data, methods=['GET']),
+    Route('/api/data/export', export_data, methods=['GET'])
+])
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=5000)
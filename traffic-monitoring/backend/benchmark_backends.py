@@ -0,0 +1,96 @@
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from inference_backends import export_onnx
+from traffic_detection import TrafficDetector, get_test_frames
+
+
+def benchmark_frames():
+    """
+    Test frames of a few sizes and layouts, as different cameras would send them
+
+    Returns:
+        frames: List of image frames
+    """
+    frame = get_test_frames()[1]
+    height, width = frame.shape[:2]
+    return [
+        frame,
+        cv2.flip(frame, 1),
+        cv2.resize(frame, (width * 2, height * 2)),
+        frame[:, :width // 2].copy(),
+        cv2.resize(frame, (width // 2, height // 2))
+    ]
+
+
+def measure(detector, frames, repeats=10):
+    """
+    Latency of single-frame detection and throughput of batched 4-lane detection
+
+    Returns:
+        stats: Dictionary with latency mean, p50 and p95 in milliseconds, throughput in
+            frames per second, and the vehicle count of every frame
+    """
+    counts = [detector.detect_vehicles(frame, annotate=False)[0] for frame in frames]  # Also warms up
+
+    latencies = []
+    for _ in range(repeats):
+        for frame in frames:
+            start = time.perf_counter()
+            detector.detect_vehicles(frame, annotate=False)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    lanes = {lane_id: frames[0] for lane_id in range(1, 5)}
+    detector.detect_batch(lanes, annotate=False)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        detector.detect_batch(lanes, annotate=False)
+    throughput = repeats * len(lanes) / (time.perf_counter() - start)
+
+    return {
+        'mean': float(np.mean(latencies)),
+        'p50': float(np.percentile(latencies, 50)),
+        'p95': float(np.percentile(latencies, 95)),
+        'throughput': throughput,
+        'counts': counts
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare the PyTorch and onnxruntime inference backends')
+    parser.add_argument('--weights', default='yolov8n.pt', help='YOLO weights for the ultralytics backend')
+    parser.add_argument('--onnx', default=None, help='ONNX model, exported from --weights if not given')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, os.cpu_count()],
+                        help='onnxruntime intra-op thread counts to try')
+    parser.add_argument('--repeats', type=int, default=10)
+    args = parser.parse_args()
+
+    frames = benchmark_frames()
+    onnx_path = args.onnx or export_onnx(args.weights)
+
+    configs = [('ultralytics', args.weights, 'ultralytics', None)]
+    for threads in sorted(set(args.threads)):
+        configs.append((f'onnx, {threads} thread(s)', onnx_path, 'onnx', {'intra_op_threads': threads}))
+
+    results = {}
+    for name, model_path, backend, options in configs:
+        detector = TrafficDetector(model_path, backend=backend, backend_options=options)
+        results[name] = measure(detector, frames, args.repeats)
+
+    print(f"{'backend':<24} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'batch fps':>10}  counts")
+    for name, stats in results.items():
+        print(f"{name:<24} {stats['mean']:>8.1f} {stats['p50']:>8.1f} {stats['p95']:>8.1f} "
+              f"{stats['throughput']:>10.1f}  {stats['counts']}")
+
+    # Parity: every backend must count the same vehicles on every frame
+    reference = results['ultralytics']['counts']
+    mismatches = {name: stats['counts'] for name, stats in results.items() if stats['counts'] != reference}
+    if mismatches:
+        print(f"Count parity FAILED against ultralytics {reference}: {mismatches}")
+        sys.exit(1)
+    print("Count parity OK")
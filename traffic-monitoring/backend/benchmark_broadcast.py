@@ -0,0 +1,113 @@
+import argparse
+import json
+import random
+import threading
+import time
+
+import numpy as np
+
+from state_broadcaster import StateBroadcaster
+
+
+def parse_events(chunk):
+    """
+    Decode the events in a chunk of a Server-Sent Events stream
+
+    Returns:
+        events: List of (event type, data) tuples, keep-alive comments left out
+    """
+    events = []
+    for message in chunk.decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in message.splitlines() if not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+class Subscriber(threading.Thread):
+    def __init__(self, broadcaster, delay=0.0):
+        """
+        A client following the stream, applying every event to its copy of the state
+
+        Args:
+            broadcaster: StateBroadcaster to follow
+            delay: Seconds the client takes to handle every chunk, to simulate a slow connection
+        """
+        super().__init__(daemon=True)
+        self.stream = broadcaster.stream()
+        self.delay = delay
+        self.lanes = {}
+        self.latencies = []
+        self.snapshots = 0
+        self.running = True
+
+    def run(self):
+        for chunk in self.stream:
+            received = time.perf_counter()
+            for event, data in parse_events(chunk):
+                if event == 'snapshot':
+                    self.snapshots += 1
+                    self.lanes = data['lanes']
+                else:
+                    for lane_id, changes in data['lanes'].items():
+                        self.lanes.setdefault(lane_id, {}).update(changes)
+                    # The benchmark publishes perf_counter() as the timestamp
+                    self.latencies.append(received - data['timestamp'])
+            if not self.running:
+                break
+            if self.delay:
+                time.sleep(self.delay)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Fan-out of live state deltas to many stream clients')
+    parser.add_argument('--subscribers', type=int, default=300)
+    parser.add_argument('--slow', type=int, default=10, help='Subscribers that take --slow-delay per chunk')
+    parser.add_argument('--slow-delay', type=float, default=1.0)
+    parser.add_argument('--updates', type=int, default=1000)
+    parser.add_argument('--rate', type=float, default=100.0, help='State updates per second')
+    args = parser.parse_args()
+
+    broadcaster = StateBroadcaster(history=64, heartbeat=1.0)
+    state = {'timestamp': time.perf_counter(), 'lanes': {
+        lane_id: {'vehicles': 0, 'signal': 'red', 'time': 0, 'ambulance': False} for lane_id in range(1, 5)}}
+    broadcaster.publish(state)
+
+    subscribers = [Subscriber(broadcaster) for _ in range(args.subscribers)]
+    subscribers += [Subscriber(broadcaster, delay=args.slow_delay) for _ in range(args.slow)]
+    for subscriber in subscribers:
+        subscriber.start()
+    while broadcaster.subscribers < len(subscribers):
+        time.sleep(0.01)
+
+    # The control loop: a few lanes change at every update
+    publish_times = []
+    for _ in range(args.updates):
+        lane = state['lanes'][random.randint(1, 4)]
+        lane['vehicles'] = random.randint(0, 20)
+        lane['time'] = random.randint(0, 60)
+        state['timestamp'] = time.perf_counter()
+        start = time.perf_counter()
+        broadcaster.publish(state)
+        publish_times.append(time.perf_counter() - start)
+        time.sleep(1 / args.rate)
+
+    # Let every client catch up, then check it ended with the published state
+    deadline = time.time() + 10
+    expected = json.loads(json.dumps(state['lanes']))
+    while time.time() < deadline and any(subscriber.lanes != expected for subscriber in subscribers):
+        time.sleep(0.05)
+    for subscriber in subscribers:
+        subscriber.running = False
+    in_sync = sum(subscriber.lanes == expected for subscriber in subscribers)
+
+    fast = subscribers[:args.subscribers]
+    latencies = np.concatenate([subscriber.latencies for subscriber in fast]) * 1000
+    publish_times = np.array(publish_times) * 1000
+    print(f"{args.subscribers} subscribers + {args.slow} slow, {args.updates} updates at {args.rate:.0f}/s")
+    print(f"  publish:  p50 {np.percentile(publish_times, 50):.3f} ms, p99 {np.percentile(publish_times, 99):.3f} ms, "
+          f"max {publish_times.max():.3f} ms")
+    print(f"  delivery to fast subscribers: p50 {np.percentile(latencies, 50):.1f} ms, "
+          f"p99 {np.percentile(latencies, 99):.1f} ms")
+    print(f"  slow subscribers resynced by snapshot {sum(s.snapshots for s in subscribers[args.subscribers:]) - args.slow} "
+          f"times, {in_sync}/{len(subscribers)} subscribers ended in sync")
@@ -0,0 +1,69 @@
+import argparse
+import time
+
+import numpy as np
+
+from controller_bank import ControllerBank
+from signal_engine import SignalEngine
+from traffic_control import TrafficSignalController
+
+
+def run(mode, intersections, ticks, share, seed=0):
+    """
+    Run the control loop once a second: lane readings, a signal update and a read of
+    every intersection's state, as the API does for one intersection
+
+    Args:
+        mode: 'controllers' for a TrafficSignalController per intersection, 'bank' for a ControllerBank
+        intersections: Number of intersections
+        ticks: Number of one-second ticks
+        share: Share of the lanes with a new reading at every tick
+
+    Returns:
+        seconds: Mean time per tick
+    """
+    rng = np.random.default_rng(seed)
+    clock = [0.0]
+    if mode == 'controllers':
+        engine = SignalEngine(clock=lambda: clock[0])
+        controllers = [TrafficSignalController(engine=engine) for _ in range(intersections)]
+    else:
+        bank = ControllerBank(intersections, clock=lambda: clock[0])
+
+    elapsed = 0.0
+    for tick in range(1, ticks + 1):
+        clock[0] = float(tick)
+        reading = np.flatnonzero(rng.random(intersections * 4) < share)
+        indices, columns = np.divmod(reading, 4)
+        counts = rng.integers(0, 25, len(reading))
+        ambulances = rng.random(len(reading)) < 0.001
+
+        start = time.perf_counter()
+        if mode == 'controllers':
+            for index, lane_id, count, ambulance in zip(indices.tolist(), (columns + 1).tolist(),
+                                                        counts.tolist(), ambulances.tolist()):
+                controllers[index].update_lane_state(lane_id, count, ambulance)
+            for controller in controllers:
+                controller.update_signals()
+            states = [controller.get_formatted_states() for controller in controllers]
+        else:
+            bank.update_lanes(indices, columns + 1, counts, ambulances)
+            bank.step()
+            states = (bank.signal, bank.time_remaining, bank.vehicles, bank.ambulance)
+        elapsed += time.perf_counter() - start
+    return elapsed / ticks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Control loop cost of per-intersection controllers vs a ControllerBank')
+    parser.add_argument('--intersections', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--ticks', type=int, default=60)
+    parser.add_argument('--share', type=float, default=0.25, help='Share of the lanes with a new reading every second')
+    args = parser.parse_args()
+
+    print(f"{args.ticks} one-second ticks, {args.share:.0%} of the lanes read per tick")
+    print(f"{'intersections':>13} {'controllers ms/tick':>20} {'bank ms/tick':>13} {'speedup':>8}")
+    for intersections in args.intersections:
+        controllers = run('controllers', intersections, args.ticks, args.share)
+        bank = run('bank', intersections, args.ticks, args.share)
+        print(f"{intersections:>13} {controllers * 1000:>20.2f} {bank * 1000:>13.3f} {controllers / bank:>7.0f}x")
@@ -0,0 +1,58 @@
+import argparse
+import json
+import multiprocessing
+import resource
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmark_telemetry import write_history
+from telemetry_export import EXPORT_FORMATS
+from telemetry_store import TELEMETRY_SCHEMA, TelemetryStore
+
+
+def export(root, mode):
+    """
+    Export the whole store, discarding the output, in a fresh process
+
+    Returns:
+        seconds: Export time
+        size: Bytes produced
+        peak_rss: Peak resident memory of the process in MB
+    """
+    store = TelemetryStore(root)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    size = 0
+    if mode == 'materialized':
+        # What /api/data did before: every row as a Python dict, then one JSON document
+        records = store.read().to_pylist()
+        for record in records:
+            record['timestamp'] = record['timestamp'].isoformat()
+        size = len(json.dumps(records))
+    else:
+        _, _, encode = EXPORT_FORMATS[mode]
+        for chunk in encode(store.iter_batches(), TELEMETRY_SCHEMA):
+            size += len(chunk)
+    seconds = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return seconds, size, (peak_rss - baseline) / 1024
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Time and memory of telemetry exports')
+    parser.add_argument('--days', type=int, default=3, help='Days of 4-lane, 1 Hz history to export')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_history(directory, args.days * 24, datetime(2025, 3, 10) + timedelta(days=args.days))
+        rows = args.days * 24 * 3600 * 4
+
+        # A new process per mode, so peak memory isn't carried over between them
+        context = multiprocessing.get_context('spawn')
+        print(f"{rows} rows")
+        print(f"{'mode':<14} {'seconds':>8} {'rows/s':>10} {'MB out':>8} {'peak RSS MB':>12}")
+        for mode in ['materialized'] + list(EXPORT_FORMATS):
+            with context.Pool(1) as pool:
+                seconds, size, peak_rss = pool.apply(export, (directory, mode))
+            print(f"{mode:<14} {seconds:>8.2f} {rows / seconds:>10.0f} {size / 1e6:>8.1f} {peak_rss:>12.0f}")
@@ -0,0 +1,45 @@
+import time
+
+from traffic_detection import TrafficDetector, get_test_frames
+
+
+def time_cycles(process, frames, warmup=3, cycles=20):
+    """
+    Average wall time of one 4-lane cycle, in milliseconds
+
+    Args:
+        process: Callable taking the frames dictionary
+        frames: Dictionary of frames, with lane IDs as keys
+        warmup: Number of untimed cycles run first
+        cycles: Number of timed cycles
+    """
+    for _ in range(warmup):
+        process(frames)
+    start = time.perf_counter()
+    for _ in range(cycles):
+        process(frames)
+    return (time.perf_counter() - start) / cycles * 1000
+
+
+if __name__ == "__main__":
+    detector = TrafficDetector()
+    frames = get_test_frames()
+
+    # Per-call processes: spawn, pickle the detector and send frames through a Manager queue
+    spawn_ms = time_cycles(detector.process_all_lanes, frames, warmup=1, cycles=5)
+
+    # Persistent workers with the model preloaded and frames in shared memory
+    detector.start_worker_pool(num_workers=len(frames))
+    pool_ms = time_cycles(detector.process_all_lanes, frames)
+    detector.stop_worker_pool()
+
+    # One batched forward pass for all lanes
+    batched_ms = time_cycles(detector.detect_batch, frames)
+
+    # Plain sequential inference in this process, as a lower bound for a single core
+    sequential_ms = time_cycles(lambda f: [detector.detect_vehicles(frame) for frame in f.values()], frames)
+
+    print(f"Per-call processes:  {spawn_ms:8.1f} ms per 4-lane cycle")
+    print(f"Worker pool:         {pool_ms:8.1f} ms per 4-lane cycle")
+    print(f"Batched in-proc:     {batched_ms:8.1f} ms per 4-lane cycle")
+    print(f"Sequential in-proc:  {sequential_ms:8.1f} ms per 4-lane cycle")
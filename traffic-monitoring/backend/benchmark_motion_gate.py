@@ -0,0 +1,85 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+from traffic_detection import MotionGate, TrafficDetector
+
+
+def low_activity_sequence(frame, num_frames=200, active_share=0.1, seed=0):
+    """
+    Camera frames of a mostly static scene with sensor noise and one burst of motion
+
+    Args:
+        frame: Background image frame
+        num_frames: Number of frames in the sequence
+        active_share: Share of the frames during which a block crosses the scene
+        seed: Seed of the noise generator
+
+    Returns:
+        frames: List of image frames
+    """
+    rng = np.random.default_rng(seed)
+    height, width = frame.shape[:2]
+    active = int(num_frames * active_share)
+    start = (num_frames - active) // 2
+
+    frames = []
+    for i in range(num_frames):
+        noise = rng.normal(0, 2, frame.shape)
+        current = np.clip(frame + noise, 0, 255).astype(np.uint8)
+        if start <= i < start + active:
+            # A vehicle-sized block driving across the frame, inverted so it contrasts with the road
+            x = int((i - start) / active * (width - 150))
+            block = current[height // 2:height // 2 + 90, x:x + 150]
+            block[...] = 255 - block
+        frames.append(current)
+    return frames
+
+
+def time_sequence(detector, frames, lane_id=1):
+    """
+    Wall time per frame of running the detector over a sequence, in milliseconds
+
+    Returns:
+        elapsed_ms: Mean time per frame
+        counts: Vehicle count of every frame
+    """
+    counts = []
+    start = time.perf_counter()
+    for frame in frames:
+        counts.append(detector.detect_vehicles(frame, annotate=False, lane_id=lane_id)[0])
+    return (time.perf_counter() - start) / len(frames) * 1000, counts
+
+
+if __name__ == "__main__":
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+    frame = cv2.imread(os.path.join(data_dir, "test_image.jpg"))
+    if frame is None:
+        raise SystemExit("data/test_image.jpg not found")
+
+    frames = low_activity_sequence(frame)
+
+    # Cost of the gate itself
+    gate = MotionGate()
+    for size in [(600, 800, 3), (1080, 1920, 3)]:
+        test_frame = np.resize(frame, size)
+        start = time.perf_counter()
+        for _ in range(200):
+            gate.check(test_frame)
+        print(f"Gate check on {size[1]}x{size[0]}: {(time.perf_counter() - start) / 200 * 1000:.2f} ms")
+
+    detector = TrafficDetector()
+    detector.detect_vehicles(frame, annotate=False)  # Warm up
+    ungated_ms, ungated_counts = time_sequence(detector, frames)
+
+    for refresh_interval in (10, 30):
+        gated = TrafficDetector(motion_gate={'refresh_interval': refresh_interval})
+        gated.detect_vehicles(frame, annotate=False)  # Warm up, without a lane so the gate stays empty
+        gated_ms, gated_counts = time_sequence(gated, frames)
+        stats = gated.get_motion_stats()['total']
+        mismatches = sum(a != b for a, b in zip(ungated_counts, gated_counts))
+        print(f"Refresh every {refresh_interval:>2}: {gated_ms:6.1f} ms/frame vs {ungated_ms:6.1f} ms/frame ungated "
+              f"({ungated_ms / gated_ms:.1f}x), hit rate {stats['hit_rate']:.0%}, "
+              f"{mismatches} frames with a different count")
@@ -0,0 +1,92 @@
+import os
+import time
+
+import cv2
+
+from traffic_detection import TrafficDetector
+
+# Share of the frame width and height covered by the ROI
+ROI_SIZES = [1.0, 0.75, 0.5, 0.35, 0.25]
+
+
+def approach_polygon(frame_shape, size):
+    """
+    Trapezoid over the lower middle of a frame, shaped like a lane approach
+
+    Args:
+        frame_shape: (height, width, channels) of the frame
+        size: Share of the frame width and height covered by the polygon's bounding box
+
+    Returns:
+        polygon: List of (x, y) points
+    """
+    height, width = frame_shape[:2]
+    box_width, box_height = width * size, height * size
+    left, top = (width - box_width) / 2, height - box_height
+    return [
+        (int(left + box_width * 0.3), int(top)),
+        (int(left + box_width * 0.7), int(top)),
+        (int(left + box_width), height - 1),
+        (int(left), height - 1)
+    ]
+
+
+def time_detection(detector, frame, lane_id, warmup=3, runs=20):
+    """
+    Average wall time of detect_vehicles on one frame, in milliseconds
+
+    Returns:
+        elapsed_ms: Mean time per call
+        vehicles_count: Vehicles counted on the frame
+    """
+    for _ in range(warmup):
+        vehicles_count = detector.detect_vehicles(frame, annotate=False, lane_id=lane_id)[0]
+    start = time.perf_counter()
+    for _ in range(runs):
+        detector.detect_vehicles(frame, annotate=False, lane_id=lane_id)
+    return (time.perf_counter() - start) / runs * 1000, vehicles_count
+
+
+if __name__ == "__main__":
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+    frame = cv2.imread(os.path.join(data_dir, "test_image.jpg"))
+    if frame is None:
+        raise SystemExit("data/test_image.jpg not found")
+
+    detector = TrafficDetector()
+    lane_id = 1
+    print(f"Frame {frame.shape[1]}x{frame.shape[0]}, imgsz {detector.imgsz}")
+    print(f"{'ROI':>6} {'crop':>9} {'imgsz':>6} {'ms/frame':>9} {'vehicles':>9}")
+
+    baseline_ms = None
+    for size in ROI_SIZES:
+        if size < 1.0:
+            detector.set_lane_roi(lane_id, approach_polygon(frame.shape, size))
+        else:
+            detector.set_lane_roi(lane_id, None)
+
+        # Crop and model input size, as detect_vehicles picks them
+        crop_shape = frame.shape
+        if lane_id in detector.lane_rois:
+            x0, y0, x1, y1, _ = detector._roi_region(lane_id, frame.shape)
+            crop_shape = (y1 - y0, x1 - x0)
+        imgsz = detector._inference_size(frame.shape, crop_shape)
+
+        elapsed_ms, vehicles_count = time_detection(detector, frame, lane_id)
+        baseline_ms = baseline_ms or elapsed_ms
+        print(f"{size:>6.0%} {f'{crop_shape[1]}x{crop_shape[0]}':>9} {imgsz:>6} "
+              f"{elapsed_ms:>9.1f} {vehicles_count:>9}  ({baseline_ms / elapsed_ms:.2f}x)")
+
+    # All four lanes through one batched pass, with and without ROIs
+    frames = {i: frame.copy() for i in range(1, 5)}
+    for size in (1.0, 0.5):
+        for i in frames:
+            detector.set_lane_roi(i, approach_polygon(frame.shape, size) if size < 1.0 else None)
+        for _ in range(2):
+            detector.detect_batch(frames, annotate=False)
+        start = time.perf_counter()
+        for _ in range(10):
+            results = detector.detect_batch(frames, annotate=False)
+        elapsed_ms = (time.perf_counter() - start) / 10 * 1000
+        counts = [results[i]['vehicles_count'] for i in frames]
+        print(f"Batched 4 lanes, ROI {size:.0%}: {elapsed_ms:.1f} ms per cycle, counts {counts}")
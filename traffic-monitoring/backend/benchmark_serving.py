@@ -0,0 +1,142 @@
+import argparse
+import http.client
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# How each server is started: the Flask development server with a thread per request,
+# as `python flask_api.py` runs it minus the reloader, and the ASGI app under uvicorn
+SERVERS = {
+    'flask': lambda port: [sys.executable, '-c',
+                           f"import flask_api; flask_api.app.run(port={port}, threaded=True)"],
+    'asgi': lambda port: [sys.executable, '-m', 'uvicorn', 'asgi_api:app', '--port', str(port),
+                          '--log-level', 'warning']
+}
+
+
+def multipart(image_bytes, lane_id=1):
+    """
+    Encode an /api/detect form
+
+    Returns:
+        body: Request body
+        content_type: Content-Type header carrying the boundary
+    """
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="lane_id"\r\n\r\n{lane_id}\r\n'
+            f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="frame.jpg"\r\n'
+            f'Content-Type: image/jpeg\r\n\r\n').encode() + image_bytes + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def request(connection, endpoint, body=None, content_type=None):
+    """Send one request on a kept-alive connection, reconnecting if the server closed it"""
+    if endpoint == 'detect':
+        connection.request('POST', '/api/detect', body, {'Content-Type': content_type})
+    else:
+        connection.request('GET', '/api/status')
+    response = connection.getresponse()
+    response.read()
+    if response.status != 200:
+        raise RuntimeError(f"{endpoint} returned {response.status}")
+    if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+        connection.close()
+
+
+def start_server(name, port):
+    """Start a server and wait until it answers"""
+    process = subprocess.Popen(SERVERS[name](port), cwd=BACKEND_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/')
+            connection.getresponse().read()
+            connection.close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{name} server did not start")
+
+
+def load(port, body, content_type, concurrency, duration, detect_ratio):
+    """
+    Send a mix of status and detect requests from concurrency clients for duration seconds
+
+    Returns:
+        latencies: {endpoint: list of seconds}
+        elapsed: Seconds the load ran
+    """
+    latencies = {'status': [], 'detect': []}
+    lock = threading.Lock()
+    stop = time.perf_counter() + duration
+
+    def client(seed):
+        generator = random.Random(seed)
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        mine = {'status': [], 'detect': []}
+        while time.perf_counter() < stop:
+            endpoint = 'detect' if generator.random() < detect_ratio else 'status'
+            start = time.perf_counter()
+            request(connection, endpoint, body, content_type)
+            mine[endpoint].append(time.perf_counter() - start)
+        connection.close()
+        with lock:
+            for endpoint, values in mine.items():
+                latencies[endpoint].extend(values)
+
+    start = time.perf_counter()
+    clients = [threading.Thread(target=client, args=(seed,)) for seed in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return latencies, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Throughput and latency of the Flask and ASGI servers under a status/detect mix')
+    parser.add_argument('--servers', nargs='+', default=list(SERVERS), choices=list(SERVERS))
+    parser.add_argument('--image', default=os.path.join(BACKEND_DIR, '..', 'data', 'test_image.jpg'))
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load per server')
+    parser.add_argument('--detect-ratio', type=float, default=0.1, help='Share of requests that are /api/detect')
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    with open(args.image, 'rb') as f:
+        body, content_type = multipart(f.read())
+
+    print(f"{args.concurrency} clients, {args.detect_ratio:.0%} detect, {args.duration:.0f} s per server "
+          f"(model: {os.environ.get('TRAFFIC_MODEL', 'yolov8n.pt')})")
+    print(f"{'server':<7} {'endpoint':<8} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for name in args.servers:
+        process = start_server(name, args.port)
+        try:
+            # Load the model before measuring
+            connection = http.client.HTTPConnection('127.0.0.1', args.port, timeout=120)
+            request(connection, 'detect', body, content_type)
+            connection.close()
+
+            latencies, elapsed = load(args.port, body, content_type, args.concurrency, args.duration, args.detect_ratio)
+        finally:
+            process.terminate()
+            process.wait()
+
+        total = sum(len(values) for values in latencies.values())
+        for endpoint in ('status', 'detect'):
+            values = np.array(latencies[endpoint]) * 1000
+            if len(values):
+                print(f"{name:<7} {endpoint:<8} {len(values):>9} {len(values) / elapsed:>8.1f} "
+                      f"{np.percentile(values, 50):>8.1f} {np.percentile(values, 99):>8.1f}")
+        print(f"{name:<7} {'all':<8} {total:>9} {total / elapsed:>8.1f}")
@@ -0,0 +1,84 @@
+import argparse
+import time
+
+import numpy as np
+
+from signal_engine import SignalEngine
+from traffic_control import TrafficSignalController
+
+
+def readings(intersections, seconds, tick, interval, seed=0):
+    """
+    Detector readings arriving during a run, the same for every mode
+
+    Args:
+        intersections: Number of intersections
+        seconds: Simulated seconds
+        tick: Seconds between control loop ticks
+        interval: Mean seconds between readings of an intersection
+
+    Returns:
+        ticks: List, per tick, of (intersection indices, lane IDs, vehicle counts, ambulance flags)
+    """
+    rng = np.random.default_rng(seed)
+    ticks = []
+    for _ in range(int(seconds / tick)):
+        indices = np.flatnonzero(rng.random(intersections) < tick / interval)
+        ticks.append((indices.tolist(), rng.integers(1, 5, len(indices)).tolist(),
+                      rng.integers(0, 25, len(indices)).tolist(), (rng.random(len(indices)) < 0.002).tolist()))
+    return ticks
+
+
+def run(mode, intersections, ticks, tick):
+    """
+    Drive intersections through the readings, ticking the control loop every tick seconds
+
+    Returns:
+        seconds: Time spent in the controllers
+        active: Final green lane of every intersection
+    """
+    clock = [0.0]
+    if mode == 'polling':
+        # The current call pattern: a controller per intersection, each polled every tick
+        controllers = [TrafficSignalController(engine=SignalEngine(clock=lambda: clock[0]))
+                       for _ in range(intersections)]
+    else:
+        engine = SignalEngine(clock=lambda: clock[0])
+        for _ in range(intersections):
+            engine.add_intersection()
+
+    start = time.perf_counter()
+    for i, (indices, lanes, counts, ambulances) in enumerate(ticks):
+        clock[0] = i * tick
+        if mode == 'polling':
+            for index, lane_id, count, ambulance in zip(indices, lanes, counts, ambulances):
+                controllers[index].update_lane_state(lane_id, count, ambulance)
+            for controller in controllers:
+                controller.update_signals()
+        else:
+            for index, lane_id, count, ambulance in zip(indices, lanes, counts, ambulances):
+                engine.update_lane(index, lane_id, count, ambulance)
+            engine.advance()
+    seconds = time.perf_counter() - start
+
+    active = [controller.active_lane for controller in controllers] if mode == 'polling' else engine.active
+    return seconds, active
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Control loop cost of polled controllers vs one event-driven engine')
+    parser.add_argument('--intersections', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--seconds', type=float, default=60.0, help='Simulated seconds')
+    parser.add_argument('--tick', type=float, default=0.1, help='Seconds between control loop ticks')
+    parser.add_argument('--interval', type=float, default=5.0, help='Mean seconds between readings of an intersection')
+    args = parser.parse_args()
+
+    print(f"{args.seconds:.0f} simulated s, a tick every {args.tick} s, a reading every {args.interval} s per intersection")
+    print(f"{'intersections':>13} {'readings':>9} {'polling s':>10} {'engine s':>9} {'speedup':>8} "
+          f"{'engine us/tick':>15} {'same phases':>12}")
+    for intersections in args.intersections:
+        ticks = readings(intersections, args.seconds, args.tick, args.interval)
+        polling, polled_active = run('polling', intersections, ticks, args.tick)
+        engine, engine_active = run('engine', intersections, ticks, args.tick)
+        print(f"{intersections:>13} {sum(len(t[0]) for t in ticks):>9} {polling:>10.2f} {engine:>9.3f} "
+              f"{polling / engine:>7.0f}x {engine / len(ticks) * 1e6:>15.0f} {str(polled_active == engine_active):>12}")
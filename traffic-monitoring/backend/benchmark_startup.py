@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import cv2
+
+# Runs in a fresh interpreter, so nothing is imported or loaded beforehand
+CHILD = """
+import json, os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, 'backend')
+import flask_api
+timings = {'import': time.perf_counter() - start}
+
+client = flask_api.app.test_client()
+client.get('/api/status')
+timings['first_status'] = time.perf_counter() - start
+
+if os.environ.get('TRAFFIC_API_WARMUP') == '1':
+    while flask_api.detector is None:
+        time.sleep(0.01)
+    timings['warmed_up'] = time.perf_counter() - start
+
+with open(sys.argv[1], 'rb') as f:
+    image = f.read()
+for name in ('first_detect', 'second_detect'):
+    request_start = time.perf_counter()
+    response = client.post('/api/detect', data={'image': (__import__('io').BytesIO(image), 'frame.jpg'), 'lane_id': '1'})
+    assert response.status_code == 200, response.data
+    timings[name + '_latency'] = time.perf_counter() - request_start
+print(json.dumps(timings))
+"""
+
+
+def run_child(image_path, model_path, warmup):
+    """
+    Start a fresh API process and time its startup milestones
+
+    Returns:
+        timings: Dictionary of seconds since interpreter start (import, first_status,
+            warmed_up) and per-request latencies of the first two /api/detect calls
+    """
+    env = dict(os.environ, TRAFFIC_MODEL=model_path, TRAFFIC_API_WARMUP='1' if warmup else '0')
+    # flask_api keeps its data file under backend/, relative to the project directory
+    project_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    output = subprocess.run([sys.executable, '-c', CHILD, image_path], cwd=project_dir, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Time how long a fresh API process takes to serve requests')
+    parser.add_argument('--model', default='yolov8n.pt', help='Model the API loads (TRAFFIC_MODEL)')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+    image_path = os.path.join(data_dir, "test_image.jpg")
+    if cv2.imread(image_path) is None:
+        raise SystemExit("data/test_image.jpg not found")
+    model_path = os.path.abspath(args.model) if os.path.exists(args.model) else args.model
+
+    for warmup in (False, True):
+        runs = [run_child(image_path, model_path, warmup) for _ in range(args.runs)]
+        print("Background warm-up" if warmup else "Load on first /api/detect")
+        for key in runs[0]:
+            values = sorted(run[key] for run in runs)
+            print(f"  {key:<22} {values[len(values) // 2] * 1000:8.0f} ms (median of {len(values)})")
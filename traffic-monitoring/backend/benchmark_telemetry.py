@@ -0,0 +1,179 @@
+import argparse
+import csv
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from telemetry_rollups import aggregate_table
+from telemetry_store import TELEMETRY_SCHEMA, TelemetryStore, hour_key
+
+
+def telemetry_rows(intersections, ticks, start=datetime(2025, 3, 10, 8)):
+    """
+    Synthetic lane observations: every lane of every intersection, once per second
+
+    Returns:
+        rows: List of row dictionaries in time order
+    """
+    rows = []
+    for tick in range(ticks):
+        timestamp = start + timedelta(seconds=tick)
+        for intersection_id in range(intersections):
+            for lane_id in range(1, 5):
+                rows.append({
+                    'timestamp': timestamp,
+                    'intersection_id': intersection_id,
+                    'lane_id': lane_id,
+                    'vehicle_count': (tick + lane_id) % 20,
+                    'signal_state': 'green' if (tick // 30) % 4 + 1 == lane_id else 'red',
+                    'signal_duration': 30.0,
+                    'has_ambulance': tick % 997 == 0
+                })
+    return rows
+
+
+def write_csv_per_row(path, rows):
+    """The old controller logger: open the CSV for every row"""
+    for row in rows:
+        with open(path, 'a', newline='') as f:
+            csv.writer(f).writerow(row.values())
+
+
+def write_history(root, hours, end, lanes=4):
+    """
+    Fill a store directory with compacted hourly partitions, one row per lane and second
+
+    Written directly as Parquet parts in the layout the store compacts to, which is
+    much faster than appending months of rows.
+    """
+    for hour in range(hours):
+        start = end - timedelta(hours=hours - hour)
+        seconds = np.repeat(np.arange(3600), lanes)
+        lane_ids = np.tile(np.arange(1, lanes + 1), 3600)
+        table = pa.table({
+            'timestamp': pa.array(np.datetime64(start, 'us') + seconds * np.timedelta64(1, 's')),
+            'intersection_id': pa.array(np.zeros(len(seconds), dtype=np.int32)),
+            'lane_id': pa.array(lane_ids.astype(np.int8)),
+            'vehicle_count': pa.array(((seconds + lane_ids) % 20).astype(np.int32)),
+            'signal_state': pa.array(np.where((seconds // 30) % lanes + 1 == lane_ids, 'green', 'red')),
+            'signal_duration': pa.array(np.full(len(seconds), 30.0, dtype=np.float32)),
+            'has_ambulance': pa.array(seconds % 997 == 0)
+        }, schema=TELEMETRY_SCHEMA).sort_by([('intersection_id', 'ascending'), ('lane_id', 'ascending'),
+                                             ('timestamp', 'ascending')])
+        partition = os.path.join(root, f"hour={hour_key(start)}")
+        os.makedirs(partition, exist_ok=True)
+        pq.write_table(table, os.path.join(partition, 'segment-history-00000.parquet'), row_group_size=16384)
+    # A live store creates one partition an hour: age the root like one, so the
+    # partition listing is cached as it would be in steady state
+    os.utime(root, (time.time() - 3600, time.time() - 3600))
+
+
+def compare_csv(intersections=50, ticks=600):
+    """Old per-row CSV logging and pandas filtering against the store"""
+    rows = telemetry_rows(intersections, ticks)
+    query = {'start': datetime(2025, 3, 10, 8, 5), 'end': datetime(2025, 3, 10, 8, 6), 'lane_id': 2}
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, 'traffic_data.csv')
+        start = time.perf_counter()
+        write_csv_per_row(csv_path, rows)
+        csv_write = time.perf_counter() - start
+
+        start = time.perf_counter()
+        df = pd.read_csv(csv_path, header=None, names=list(rows[0]), parse_dates=['timestamp'])
+        df = df[(df['timestamp'] >= query['start']) & (df['timestamp'] <= query['end']) & (df['lane_id'] == query['lane_id'])]
+        csv_read = time.perf_counter() - start
+
+        store = TelemetryStore(os.path.join(directory, 'telemetry'), segment_rows=20000)
+        start = time.perf_counter()
+        for tick in range(ticks):
+            # One append per tick and intersection, as the API and controllers log
+            batch = rows[tick * intersections * 4:(tick + 1) * intersections * 4]
+            for i in range(0, len(batch), 4):
+                store.append_rows(batch[i:i + 4])
+        store.flush(fsync=True)
+        store.rollups.write()
+        store_write = time.perf_counter() - start
+
+        start = time.perf_counter()
+        table = store.read(**query)
+        store_read = time.perf_counter() - start
+        store.close()
+
+        print(f"{len(rows)} rows, {intersections} intersections x 4 lanes x {ticks} s")
+        print(f"CSV, file opened per row:   write {csv_write * 1000:8.1f} ms, "
+              f"filtered read {csv_read * 1000:7.1f} ms ({len(df)} rows)")
+        print(f"Telemetry store:            write {store_write * 1000:8.1f} ms, "
+              f"filtered read {store_read * 1000:7.1f} ms ({table.num_rows} rows)")
+
+
+def history_scaling(history_days, repeats=20):
+    """Latency of a dashboard query (one lane, last 5 minutes) as the history grows"""
+    end = datetime(2025, 3, 10, 8)
+    print(f"{'history':>10} {'rows':>12} {'5 min page':>12} {'page, 1st hour':>15}")
+    for days in history_days:
+        with tempfile.TemporaryDirectory() as directory:
+            write_history(directory, days * 24, end)
+            store = TelemetryStore(directory)
+            query = {'start': end - timedelta(minutes=5), 'lane_id': 2}
+            first_hour = {'start': end - timedelta(days=days), 'end': end - timedelta(days=days, minutes=-5),
+                          'lane_id': 2}
+
+            timings = {}
+            for name, filters in (('recent', query), ('oldest', first_hour)):
+                store.read_page(**filters)
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    table, _ = store.read_page(**filters)
+                timings[name] = (time.perf_counter() - start) / repeats
+                assert table.num_rows >= 300, table.num_rows  # 5 minutes of one lane
+            store.close()
+            print(f"{days:>8} d {days * 24 * 3600 * 4:>12} {timings['recent'] * 1000:>9.2f} ms "
+                  f"{timings['oldest'] * 1000:>12.2f} ms")
+
+
+def aggregation(days, repeats=5):
+    """Hourly chart of one lane over the whole history, from the rollups and from the raw rows"""
+    end = datetime(2025, 3, 10, 8)
+    with tempfile.TemporaryDirectory() as directory:
+        write_history(directory, days * 24, end)
+        store = TelemetryStore(directory)
+        # The history was written around the store, so its rollups are built once here
+        start = time.perf_counter()
+        store.rebuild_rollups()
+        rebuild = time.perf_counter() - start
+
+        timings = {}
+        for name, aggregate in (('rollup', lambda: store.aggregate('1h', lane_id=2)),
+                                ('raw', lambda: aggregate_table(store.read(lane_id=2), '1h'))):
+            table = aggregate()
+            start = time.perf_counter()
+            for _ in range(repeats):
+                aggregate()
+            timings[name] = (time.perf_counter() - start) / repeats
+            assert table.num_rows == days * 24, table.num_rows
+        store.close()
+
+    print(f"Hourly chart of one lane over {days} days ({days * 24 * 3600 * 4} rows):")
+    print(f"  from rollups {timings['rollup'] * 1000:8.1f} ms, from raw rows {timings['raw'] * 1000:8.1f} ms "
+          f"(rollups rebuilt in {rebuild:.1f} s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the telemetry store')
+    parser.add_argument('--history-days', type=int, nargs='+', default=[1, 7, 30],
+                        help='History lengths for the query latency scaling run')
+    parser.add_argument('--aggregate-days', type=int, default=30, help='History length for the aggregation run')
+    args = parser.parse_args()
+
+    compare_csv()
+    print()
+    history_scaling(args.history_days)
+    print()
+    aggregation(args.aggregate_days)
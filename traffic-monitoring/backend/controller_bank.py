@@ -0,0 +1,174 @@
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Codes of ControllerBank.signal, SIGNAL_NAMES[code] is the state's name
+RED, GREEN = 0, 1
+SIGNAL_NAMES = np.array(['red', 'green'])
+
+
+def readonly(array):
+    """A view of an array that can't be written through"""
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class ControllerBank:
+    def __init__(self, intersections, lanes=4, base_time=10, time_per_vehicle=2, max_green_time=60,
+                 min_green_time=10, telemetry=None, intersection_ids=None, clock=time.time):
+        """
+        Signal controllers of many intersections, as NumPy arrays updated all at once
+
+        Holds what TrafficSignalController holds per lane for intersections x lanes,
+        column j being lane j + 1. Readings are taken with update_lanes and step
+        runs the control loop for every intersection in one vectorized pass, with
+        the timing and ambulance rules of SignalEngine. The state is exposed as
+        read-only views of the arrays, which step and update_lanes keep current:
+
+            signal: Signal state codes (RED, GREEN)
+            time_remaining: Seconds left of the green, 0 for red lanes
+            vehicles: Vehicle counts
+            ambulance: Ambulance detected
+            active: Lane ID with the green, per intersection
+
+        Args:
+            intersections: Number of intersections
+            lanes: Lanes per intersection
+            base_time: Base time allocated to each lane in seconds
+            time_per_vehicle: Additional time allocated per vehicle in seconds
+            max_green_time: Maximum green time allowed for any lane
+            min_green_time: Minimum green time for any lane
+            telemetry: TelemetryStore phase changes are logged to, None to not log
+            intersection_ids: IDs of the intersections in the telemetry, their indices if None
+            clock: Function returning the current time in seconds since the epoch
+        """
+        self.lanes = lanes
+        self.base_time = base_time
+        self.time_per_vehicle = time_per_vehicle
+        self.max_green_time = max_green_time
+        self.min_green_time = min_green_time
+        self.telemetry = telemetry
+        self.intersection_ids = np.arange(intersections) if intersection_ids is None else np.asarray(intersection_ids)
+        self.clock = clock
+        self.rows = np.arange(intersections)
+
+        # Every intersection starts with its last lane green for base_time
+        shape = (intersections, lanes)
+        self._signal = np.full(shape, RED, dtype=np.int8)
+        self._signal[:, -1] = GREEN
+        self._time_remaining = np.zeros(shape)
+        self._time_remaining[:, -1] = base_time
+        self._vehicles = np.zeros(shape, dtype=np.int32)
+        self._ambulance = np.zeros(shape, dtype=bool)
+        self._active = np.full(intersections, lanes, dtype=np.intp)
+        self.last_step = clock()
+
+        self.signal = readonly(self._signal)
+        self.time_remaining = readonly(self._time_remaining)
+        self.vehicles = readonly(self._vehicles)
+        self.ambulance = readonly(self._ambulance)
+        self.active = readonly(self._active)
+
+    def calculate_green_time(self, vehicle_counts):
+        """
+        Calculate green times based on vehicle counts
+
+        Args:
+            vehicle_counts: Number of vehicles, scalar or array
+
+        Returns:
+            green_time: Calculated green times in seconds, of the shape of vehicle_counts
+        """
+        # t = n * x + y, within the min and max constraints
+        green_time = np.asarray(vehicle_counts) * self.time_per_vehicle + self.base_time
+        return np.minimum(np.maximum(green_time, self.min_green_time), self.max_green_time)
+
+    def update_lanes(self, intersections, lane_ids, vehicle_counts, has_ambulance):
+        """
+        Take detector readings, acted upon at the next step
+
+        Args:
+            intersections: Intersection indices, scalar or array
+            lane_ids: Lane IDs (1 to lanes), of the same shape
+            vehicle_counts: Number of vehicles in each lane
+            has_ambulance: Booleans indicating if an ambulance is detected
+        """
+        columns = np.asarray(lane_ids) - 1
+        self._vehicles[intersections, columns] = vehicle_counts
+        self._ambulance[intersections, columns] = has_ambulance
+
+    def step(self, now=None, force_lanes=None):
+        """
+        Advance every intersection's signals to now
+
+        A green lane that ran out of time hands the green to the next lane in
+        rotation, or keeps it while it has an ambulance. An ambulance on a red lane
+        takes the green, unless the green lane has one too.
+
+        Args:
+            now: Time to advance to, the clock if None
+            force_lanes: Array of lane IDs to force green per intersection, 0 to leave
+                an intersection alone
+
+        Returns:
+            changed: Indices of the intersections that started a new green phase
+        """
+        now = self.clock() if now is None else now
+        elapsed = now - self.last_step
+        self.last_step = now
+
+        rows = self.rows
+        columns = self._active - 1
+        self._time_remaining[rows, columns] -= elapsed
+
+        # Lane ID to turn green per intersection, 0 to keep the current phase
+        ambulance_here = self._ambulance[rows, columns]
+        expired = self._time_remaining[rows, columns] <= 0
+        target = np.where(expired, np.where(ambulance_here, self._active, self._active % self.lanes + 1), 0)
+
+        red_ambulance = self._ambulance & (self._signal == RED)
+        preempt = red_ambulance.any(axis=1) & ~ambulance_here
+        target[preempt] = red_ambulance[preempt].argmax(axis=1) + 1
+
+        if force_lanes is not None:
+            force_lanes = np.asarray(force_lanes)
+            forced = (force_lanes > 0) & (force_lanes != self._active)
+            target[forced] = force_lanes[forced]
+
+        changed = np.flatnonzero(target)
+        self._switch(changed, target[changed], now)
+        return changed
+
+    def _switch(self, indices, lane_ids, now):
+        """Start a green phase of the given lanes of the given intersections"""
+        columns = lane_ids - 1
+        self._signal[indices] = RED
+        self._signal[indices, columns] = GREEN
+        self._time_remaining[indices] = 0
+        self._time_remaining[indices, columns] = self.calculate_green_time(self._vehicles[indices, columns])
+        self._active[indices] = lane_ids
+        self.log(indices, now)
+
+    def log(self, indices, now=None):
+        """Log the green lane of the given intersections to the telemetry store, if there is one"""
+        if self.telemetry is None or not len(indices):
+            return
+        timestamp = datetime.fromtimestamp(self.clock() if now is None else now)
+        columns = self._active[indices] - 1
+        self.telemetry.append_rows(
+            {
+                'timestamp': timestamp,
+                'intersection_id': intersection_id,
+                'lane_id': column + 1,
+                'vehicle_count': vehicle_count,
+                'signal_state': 'green',
+                'signal_duration': time_remaining,
+                'has_ambulance': has_ambulance
+            }
+            for intersection_id, column, vehicle_count, time_remaining, has_ambulance in zip(
+                self.intersection_ids[indices].tolist(), columns.tolist(),
+                self._vehicles[indices, columns].tolist(), self._time_remaining[indices, columns].tolist(),
+                self._ambulance[indices, columns].tolist())
+        )
@@ -1,16 +1,17 @@
-from flask import Flask, request, jsonify
-import pandas as pd
+from flask import Flask, Response, request, jsonify
 import json
 import os
-import cv2
-import numpy as np
+import random
 from datetime import datetime
 import threading
 import time
 
-# Import our traffic modules
-from traffic_detection import TrafficDetector
+# Import our traffic modules. traffic_detection (cv2, the inference backend and the
+# model weights) is only imported when the detector is first needed, see get_detector
 from traffic_control import TrafficSignalController
+from telemetry_store import TELEMETRY_SCHEMA, TelemetryStore, to_datetime
+from telemetry_export import EXPORT_FORMATS
+from state_broadcaster import StateBroadcaster
 
 app = Flask(__name__)
 
@@ -20,17 +21,34 @@ def home():
     return jsonify({'message': 'Traffic Monitoring API is running'}), 200
 
 # Initialize components
-detector = TrafficDetector()
-controller = TrafficSignalController()
-
-# Data storage
-data_file = 'backend/traffic_data.csv'
-if not os.path.exists(data_file):
-    df = pd.DataFrame(columns=[
-        'timestamp', 'lane_id', 'vehicle_count', 'signal_state', 
-        'signal_duration', 'has_ambulance'
-    ])
-    df.to_csv(data_file, index=False)
+detector = None
+detector_lock = threading.Lock()
+
+# Data storage, shared by the API and the controller
+telemetry = TelemetryStore()
+controller = TrafficSignalController(telemetry=telemetry)
+
+# Rows per /api/data page, by default and at most
+DATA_PAGE_SIZE = 1000
+MAX_DATA_PAGE_SIZE = 10000
+
+def get_detector():
+    """Load the detector on first use, so processes that never detect never pay for it"""
+    global detector
+    if detector is None:
+        with detector_lock:
+            if detector is None:
+                from traffic_detection import TrafficDetector
+                new_detector = TrafficDetector(os.environ.get('TRAFFIC_MODEL', 'yolov8n.pt'))
+                new_detector.warm_up()
+                detector = new_detector
+    return detector
+
+# Replicas that serve detections can load the model in the background instead of on
+# the first /api/detect request, without delaying the other routes. TRAFFIC_MODEL
+# selects the weights, e.g. an exported .onnx model to run without torch
+if os.environ.get('TRAFFIC_API_WARMUP') == '1':
+    threading.Thread(target=get_detector, daemon=True).start()
 
 # Global simulation state
 simulation_running = False
@@ -43,6 +61,13 @@ current_state = {
         4: {'vehicles': 0, 'signal': 'green', 'time': 10, 'ambulance': False}
     }
 }
+# Serializes the writers of current_state (update requests and the simulation)
+state_lock = threading.Lock()
+
+# Pushes the changes of current_state to /api/stream clients
+broadcaster = StateBroadcaster()
+broadcaster.publish(current_state)
+STREAM_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
 
 @app.route('/api/status', methods=['GET'])
 def get_status():
@@ -50,65 +75,177 @@ def get_status():
 
 @app.route('/api/update', methods=['POST'])
 def update_status():
-    data = request.json
-    current_state['timestamp'] = datetime.now().isoformat()
-    for lane_id, lane_data in data['lanes'].items():
-        lane_id = int(lane_id)
-        current_state['lanes'][lane_id]['vehicles'] = lane_data['vehicles']
-        if 'ambulance' in lane_data:
-            current_state['lanes'][lane_id]['ambulance'] = lane_data['ambulance']
-    
-    vehicle_counts = {lane_id: lane['vehicles'] for lane_id, lane in current_state['lanes'].items()}
-    ambulance_presence = {lane_id: lane['ambulance'] for lane_id, lane in current_state['lanes'].items()}
-    signal_updates = controller.update_signals(vehicle_counts, ambulance_presence)
-    
-    for lane_id, signal_data in signal_updates.items():
-        current_state['lanes'][lane_id]['signal'] = signal_data['state']
-        current_state['lanes'][lane_id]['time'] = signal_data['time']
-    
-    log_data(current_state)
-    return jsonify({'status': 'success', 'state': current_state})
+    return jsonify({'status': 'success', 'state': apply_update(request.json)})
+
+@app.route('/api/stream', methods=['GET'])
+def stream_status():
+    # Server-Sent Events: a snapshot of current_state, then the changed lanes of every update
+    return Response(broadcaster.stream(request.headers.get('Last-Event-ID')), mimetype='text/event-stream',
+                    headers=STREAM_HEADERS)
 
 @app.route('/api/detect', methods=['POST'])
 def detect_traffic():
     if 'image' not in request.files:
         return jsonify({'error': 'No image provided'}), 400
-    file = request.files['image']
-    img = cv2.imdecode(np.frombuffer(file.read(), np.uint8), cv2.IMREAD_COLOR)
     lane_id = int(request.form.get('lane_id', 1))
-    results = detector.detect_vehicles(img, lane_id)
-    return jsonify(results)
+    vehicles_count, has_ambulance = detect_image(request.files['image'].read())
+    return jsonify({'lane_id': lane_id, 'vehicles_count': vehicles_count, 'has_ambulance': has_ambulance})
 
 @app.route('/api/simulate', methods=['POST'])
 def control_simulation():
+    return jsonify(simulation_action(request.json.get('action', 'status')))
+
+@app.route('/api/data', methods=['GET'])
+def get_data():
+    try:
+        records, next_cursor = data_page(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    response = jsonify(records)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+@app.route('/api/data/aggregate', methods=['GET'])
+def aggregate_data():
+    try:
+        return jsonify(aggregate_records(request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/data/export', methods=['GET'])
+def export_data():
+    try:
+        mimetype, headers, chunks = export_stream(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return Response(chunks, mimetype=mimetype, headers=headers)
+
+# Request handling shared with the ASGI server (asgi_api.py), which runs the same
+# functions in worker threads
+
+def apply_update(data):
+    """
+    Apply the lane counts of an /api/update body, run the controller and publish the changes
+    
+    Returns:
+        state: Copy of the updated current_state
+    """
+    with state_lock:
+        current_state['timestamp'] = datetime.now().isoformat()
+        for lane_id, lane_data in data['lanes'].items():
+            lane_id = int(lane_id)
+            current_state['lanes'][lane_id]['vehicles'] = lane_data['vehicles']
+            if 'ambulance' in lane_data:
+                current_state['lanes'][lane_id]['ambulance'] = lane_data['ambulance']
+        
+        update_signals()
+        log_data(current_state)
+        broadcaster.publish(current_state)
+        return {'timestamp': current_state['timestamp'],
+                'lanes': {lane_id: dict(lane) for lane_id, lane in current_state['lanes'].items()}}
+
+def detect_image(image_bytes):
+    """
+    Count the vehicles in an encoded image
+    
+    Returns:
+        vehicles_count: Number of vehicles detected
+        has_ambulance: Boolean indicating if an ambulance is detected
+    """
+    import cv2
+    import numpy as np
+    
+    detector = get_detector()
+    img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    # Only the counts are returned, so skip copying and drawing on the frame
+    vehicles_count, has_ambulance, _ = detector.detect_vehicles(img, annotate=False)
+    return vehicles_count, has_ambulance
+
+def simulation_action(action):
+    """Start, stop or report the simulation, returns the response body"""
     global simulation_running
-    action = request.json.get('action', 'status')
     if action == 'start':
         simulation_running = True
         threading.Thread(target=run_simulation).start()
-        return jsonify({'status': 'simulation started'})
+        return {'status': 'simulation started'}
     elif action == 'stop':
         simulation_running = False
-        return jsonify({'status': 'simulation stopped'})
+        return {'status': 'simulation stopped'}
     else:
-        return jsonify({'status': 'running' if simulation_running else 'stopped'})
+        return {'status': 'running' if simulation_running else 'stopped'}
 
-@app.route('/api/data', methods=['GET'])
-def get_data():
-    if os.path.exists(data_file):
-        df = pd.read_csv(data_file)
-        start_time = request.args.get('start')
-        end_time = request.args.get('end')
-        lane_id = request.args.get('lane')
-        if start_time:
-            df = df[df['timestamp'] >= start_time]
-        if end_time:
-            df = df[df['timestamp'] <= end_time]
-        if lane_id:
-            df = df[df['lane_id'] == int(lane_id)]
-        return jsonify(df.to_dict(orient='records'))
-    else:
-        return jsonify([])
+def data_page(args):
+    """
+    One page of /api/data
+    
+    Args:
+        args: Query parameters (start, end, lane, limit, cursor)
+    
+    Returns:
+        records: List of row dictionaries
+        next_cursor: Cursor of the next page, None on the last page
+    """
+    lane_id = args.get('lane')
+    # Paginated: the cursor of the next page, if any, is returned in the X-Next-Cursor header
+    limit = min(int(args.get('limit', DATA_PAGE_SIZE)), MAX_DATA_PAGE_SIZE)
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    # Only the partitions and row groups around the requested page are read
+    table, next_cursor = telemetry.read_page(args.get('start'), args.get('end'), int(lane_id) if lane_id else None,
+                                             limit=limit, cursor=args.get('cursor'))
+    records = table.to_pylist()
+    for record in records:
+        record['timestamp'] = record['timestamp'].isoformat()
+    return records, next_cursor
+
+def aggregate_records(args):
+    """
+    Bucketed lane statistics of /api/data/aggregate
+    
+    Args:
+        args: Query parameters (resolution, start, end, lane, intersection)
+    
+    Returns:
+        records: List of bucket dictionaries
+    """
+    lane_id = args.get('lane')
+    intersection_id = args.get('intersection')
+    # 1m and 1h come from the rollups kept up to date by log_data, 1s from the raw rows
+    table = telemetry.aggregate(args.get('resolution', '1m'), args.get('start'), args.get('end'),
+                                int(lane_id) if lane_id else None,
+                                int(intersection_id) if intersection_id else None)
+    records = table.to_pylist()
+    for record in records:
+        record['bucket'] = record['bucket'].isoformat()
+    return records
+
+def export_stream(args):
+    """
+    Streamed export of /api/data/export
+    
+    Args:
+        args: Query parameters (format, start, end, lane)
+    
+    Returns:
+        mimetype: Content type of the export
+        headers: Extra response headers
+        chunks: Iterator of encoded chunks
+    """
+    export_format = args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format: {export_format}, use one of {', '.join(EXPORT_FORMATS)}")
+    # Checked before streaming starts, errors after the headers are sent can't be reported
+    start_time = to_datetime(args.get('start'))
+    end_time = to_datetime(args.get('end'))
+    lane_id = int(args['lane']) if args.get('lane') else None
+    
+    # Streamed batch by batch, so the export never has to fit in memory
+    mimetype, extension, encode = EXPORT_FORMATS[export_format]
+    headers = {}
+    if export_format in ('csv', 'parquet'):
+        headers['Content-Disposition'] = f'attachment; filename=traffic_data.{extension}'
+    return mimetype, headers, encode(telemetry.iter_batches(start_time, end_time, lane_id), TELEMETRY_SCHEMA)
 
 def log_data(state):
     rows = []
@@ -123,22 +260,28 @@ def log_data(state):
             'has_ambulance': lane_data['ambulance']
         }
         rows.append(row)
-    df = pd.DataFrame(rows)
-    df.to_csv(data_file, mode='a', header=False, index=False)
+    # Buffered: rows reach disk in batches, not with a file open per update
+    telemetry.append_rows(rows)
+
+def update_signals():
+    """Feed the lanes of current_state to the controller and copy its signals back"""
+    for lane_id, lane in current_state['lanes'].items():
+        controller.update_lane_state(lane_id, lane['vehicles'], lane['ambulance'])
+    controller.update_signals()
+    for lane_id, lane_state in controller.get_formatted_states().items():
+        current_state['lanes'][lane_id]['signal'] = lane_state['signal']
+        current_state['lanes'][lane_id]['time'] = lane_state['time_remaining']
 
 def run_simulation():
     while simulation_running:
-        for lane_id in range(1, 5):
-            current_state['lanes'][lane_id]['vehicles'] = np.random.randint(0, 21)
-            current_state['lanes'][lane_id]['ambulance'] = np.random.random() < 0.05
-        vehicle_counts = {lane_id: lane['vehicles'] for lane_id, lane in current_state['lanes'].items()}
-        ambulance_presence = {lane_id: lane['ambulance'] for lane_id, lane in current_state['lanes'].items()}
-        signal_updates = controller.update_signals(vehicle_counts, ambulance_presence)
-        for lane_id, signal_data in signal_updates.items():
-            current_state['lanes'][lane_id]['signal'] = signal_data['state']
-            current_state['lanes'][lane_id]['time'] = signal_data['time']
-        current_state['timestamp'] = datetime.now().isoformat()
-        log_data(current_state)
+        with state_lock:
+            for lane_id in range(1, 5):
+                current_state['lanes'][lane_id]['vehicles'] = random.randint(0, 20)
+                current_state['lanes'][lane_id]['ambulance'] = random.random() < 0.05
+            update_signals()
+            current_state['timestamp'] = datetime.now().isoformat()
+            log_data(current_state)
+            broadcaster.publish(current_state)
         time.sleep(5)
 
 if __name__ == '__main__':
@@ -0,0 +1,195 @@
+import multiprocessing as mp
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Slot states
+FREE, WRITING, READY, PROCESSING, ANNOTATED = 0, 1, 2, 3, 4
+
+
+class FrameRingBuffer:
+    def __init__(self, num_slots=16, frame_shape=(1080, 1920, 3)):
+        """
+        Initialize a ring of fixed-size frame slots in shared memory
+
+        Frames are written once into a slot by a capture process and then read,
+        annotated in place and displayed from that same slot. Only slot indices and
+        small metadata travel between processes. The buffer can be passed to
+        mp.Process arguments, children attach to the same memory.
+
+        Args:
+            num_slots: Number of frame slots in the ring
+            frame_shape: Largest (height, width, channels) uint8 frame a slot can hold
+        """
+        self.num_slots = num_slots
+        self.frame_shape = tuple(frame_shape)
+        self.slot_size = int(np.prod(self.frame_shape))
+        self.lock = mp.Lock()
+
+        self.frames = shared_memory.SharedMemory(create=True, size=self.slot_size * num_slots)
+        self.header = shared_memory.SharedMemory(create=True, size=self._header_size(num_slots))
+        self._owner_pid = os.getpid()
+        self._attach_header()
+        self.states[:] = FREE
+        self.next_slot[0] = 0
+
+    @staticmethod
+    def _header_size(num_slots):
+        # states, lane IDs, heights, widths (int64) and timestamps (float64) per slot, plus the ring cursor
+        return 8 * (5 * num_slots + 1)
+
+    def _attach_header(self):
+        """Create the NumPy views over the slot metadata"""
+        n = self.num_slots
+        header = np.ndarray((5 * n + 1,), dtype=np.int64, buffer=self.header.buf)
+        self.states = header[0:n]
+        self.lane_ids = header[n:2 * n]
+        self.heights = header[2 * n:3 * n]
+        self.widths = header[3 * n:4 * n]
+        self.timestamps = header[4 * n:5 * n].view(np.float64)
+        self.next_slot = header[5 * n:]
+
+    def __getstate__(self):
+        return {
+            'num_slots': self.num_slots,
+            'frame_shape': self.frame_shape,
+            'lock': self.lock,
+            'frames_name': self.frames.name,
+            'header_name': self.header.name
+        }
+
+    def __setstate__(self, state):
+        self.num_slots = state['num_slots']
+        self.frame_shape = state['frame_shape']
+        self.slot_size = int(np.prod(self.frame_shape))
+        self.lock = state['lock']
+        self.frames = shared_memory.SharedMemory(name=state['frames_name'])
+        self.header = shared_memory.SharedMemory(name=state['header_name'])
+        self._owner_pid = None
+        self._attach_header()
+
+    def view(self, slot, shape=None):
+        """
+        NumPy view of a slot, no copy is made
+
+        Args:
+            slot: Slot index
+            shape: Frame shape to view, defaults to the shape recorded with the slot
+        """
+        if shape is None:
+            shape = (int(self.heights[slot]), int(self.widths[slot]), self.frame_shape[2])
+        offset = slot * self.slot_size
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.frames.buf, offset=offset)
+
+    def acquire(self):
+        """
+        Claim the next free slot in ring order for writing
+
+        Returns:
+            slot: Slot index, or None if every slot is in use
+        """
+        with self.lock:
+            start = int(self.next_slot[0])
+            for i in range(self.num_slots):
+                slot = (start + i) % self.num_slots
+                if self.states[slot] == FREE:
+                    self.states[slot] = WRITING
+                    self.next_slot[0] = (slot + 1) % self.num_slots
+                    return slot
+        return None
+
+    def commit(self, slot, lane_id, shape):
+        """Mark a slot written by acquire() as a ready frame for lane_id"""
+        if len(shape) != 3 or shape[2] != self.frame_shape[2] or int(np.prod(shape)) > self.slot_size:
+            raise ValueError(f"Frame of shape {shape} does not fit a {self.frame_shape} slot")
+        self.heights[slot], self.widths[slot] = shape[0], shape[1]
+        self.lane_ids[slot] = lane_id
+        self.timestamps[slot] = time.time()
+        self.states[slot] = READY
+
+    def write(self, frame, lane_id):
+        """
+        Copy a frame into a free slot
+
+        Args:
+            frame: uint8 image frame
+            lane_id: ID of the lane the frame belongs to
+
+        Returns:
+            slot: Slot index holding the frame, or None if the ring is full
+        """
+        if frame.dtype != np.uint8 or frame.ndim != 3 or frame.size > self.slot_size:
+            raise ValueError(f"Frame of shape {frame.shape} does not fit a {self.frame_shape} uint8 slot")
+        slot = self.acquire()
+        if slot is None:
+            return None
+        self.view(slot, frame.shape)[...] = frame
+        self.commit(slot, lane_id, frame.shape)
+        return slot
+
+    def set_state(self, slot, state):
+        """Move a slot to another state (READY, PROCESSING, ANNOTATED)"""
+        self.states[slot] = state
+
+    def release(self, slot):
+        """Return a slot to the ring once its frame has been consumed"""
+        self.states[slot] = FREE
+
+    def close(self):
+        """Detach from the shared memory, and free it if this process created it"""
+        # Drop the views before closing, the buffers cannot be released while exported
+        self.states = self.lane_ids = self.heights = self.widths = self.timestamps = self.next_slot = None
+        self.frames.close()
+        self.header.close()
+        # Forked children inherit this object as is, only the creating process frees the memory
+        if self._owner_pid == os.getpid():
+            self.frames.unlink()
+            self.header.unlink()
+
+
+def capture_frames(source, lane_id, ring, slot_queue, stop_event):
+    """
+    Capture process: decode camera frames straight into ring slots
+
+    Args:
+        source: cv2.VideoCapture source (device index, file or stream URL)
+        lane_id: ID of the lane the camera watches
+        ring: FrameRingBuffer shared with the detector workers
+        slot_queue: Queue receiving the index of every ready slot
+        stop_event: Event that stops the capture loop when set
+    """
+    import cv2
+
+    cap = cv2.VideoCapture(source)
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    shape = (height, width, ring.frame_shape[2])
+
+    try:
+        while not stop_event.is_set() and cap.isOpened():
+            slot = ring.acquire()
+            if slot is None:
+                # Every slot is busy: grab and discard so the camera does not fall behind
+                if not cap.grab():
+                    break
+                continue
+
+            # Decode into the slot itself; fall back to a copy if the size does not match
+            view = ring.view(slot, shape)
+            ret, frame = cap.read(view)
+            if not ret:
+                ring.release(slot)
+                break
+            if frame is not view and not np.shares_memory(frame, view):
+                if frame.size > ring.slot_size:
+                    ring.release(slot)
+                    raise ValueError(f"Camera frame of shape {frame.shape} does not fit a {ring.frame_shape} slot")
+                shape = frame.shape
+                ring.view(slot, shape)[...] = frame
+
+            ring.commit(slot, lane_id, shape)
+            slot_queue.put(slot)
+    finally:
+        cap.release()
@@ -0,0 +1,231 @@
+import os
+
+import cv2
+import numpy as np
+
+
+class UltralyticsBackend:
+    def __init__(self, model_path="yolov8n.pt"):
+        """
+        PyTorch eager inference through ultralytics.YOLO
+
+        Args:
+            model_path: Path to the YOLO model weights
+        """
+        from ultralytics import YOLO
+
+        self.model = YOLO(model_path)
+
+    def predict(self, image, conf, imgsz=640):
+        """
+        Detect objects in one image
+
+        Args:
+            image: BGR uint8 image
+            conf: Confidence threshold
+            imgsz: Size the longest side of the image is scaled to
+
+        Returns:
+            detections: Array of [x1, y1, x2, y2, confidence, class_id] rows in image coordinates
+        """
+        results = self.model(image, conf=conf, imgsz=imgsz)[0]
+        return results.boxes.data.cpu().numpy()
+
+    def predict_batch(self, batch, conf):
+        """
+        Detect objects in a batch of already letterboxed images
+
+        Args:
+            batch: (N, H, W, 3) BGR uint8 array, H and W multiples of 32
+            conf: Confidence threshold
+
+        Returns:
+            detections: List of detection arrays, in batch image coordinates
+        """
+        import torch
+
+        # BGR HWC uint8 to RGB CHW float in [0, 1], which YOLO takes as an already preprocessed batch
+        tensor = torch.from_numpy(np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2))).float() / 255
+        return [results.boxes.data.cpu().numpy() for results in self.model(tensor, conf=conf)]
+
+
+class OnnxBackend:
+    def __init__(self, model_path="yolov8n.onnx", intra_op_threads=None, inter_op_threads=1, providers=None,
+                 iou=0.7, max_det=300):
+        """
+        Inference on an exported ONNX model with onnxruntime, no PyTorch needed
+
+        Export the model with export_onnx. Exports with dynamic=True take any
+        stride-aligned input, so frames are padded to the smallest rectangle like
+        ultralytics does. Static exports always get their fixed input size.
+
+        Args:
+            model_path: Path to the .onnx model
+            intra_op_threads: Threads used inside one operator, None for onnxruntime's
+                default (one per physical core)
+            inter_op_threads: Threads running independent operators in parallel
+            providers: onnxruntime execution providers, e.g. ['OpenVINOExecutionProvider']
+                with onnxruntime-openvino, defaults to the plain CPU provider
+            iou: IoU threshold of the non-maximum suppression
+            max_det: Maximum number of detections kept per image
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+
+        self.session = ort.InferenceSession(model_path, options, providers=providers or ['CPUExecutionProvider'])
+        self.iou = iou
+        self.max_det = max_det
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch_size, _, height, width = model_input.shape
+        self.fixed_shape = (height, width) if isinstance(height, int) and isinstance(width, int) else None
+        self.fixed_batch = batch_size if isinstance(batch_size, int) else None
+
+    def _letterbox(self, image, imgsz):
+        """
+        Resize and pad an image the way ultralytics does for prediction
+
+        Returns:
+            canvas: Letterboxed image
+            scale: Resize factor
+            pad: (x, y) offset of the resized image inside the canvas
+        """
+        height, width = image.shape[:2]
+        target = self.fixed_shape or (imgsz, imgsz)
+        scale = min(target[0] / height, target[1] / width)
+        new_width, new_height = round(width * scale), round(height * scale)
+        pad_x, pad_y = target[1] - new_width, target[0] - new_height
+        if self.fixed_shape is None:
+            # Minimum rectangle: only pad up to the next multiple of the stride
+            pad_x, pad_y = pad_x % 32, pad_y % 32
+        pad_x, pad_y = pad_x / 2, pad_y / 2
+
+        if (new_width, new_height) != (width, height):
+            image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        top, bottom = round(pad_y - 0.1), round(pad_y + 0.1)
+        left, right = round(pad_x - 0.1), round(pad_x + 0.1)
+        canvas = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+        return canvas, scale, (left, top)
+
+    def _run(self, batch):
+        """Run the session on a BGR uint8 NHWC batch and return the raw (N, 4 + classes, boxes) output"""
+        blob = np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32) / 255
+        return self.session.run(None, {self.input_name: blob})[0]
+
+    def _postprocess(self, output, conf):
+        """
+        Confidence filter and class-aware non-maximum suppression of one raw output
+
+        Returns:
+            detections: Array of [x1, y1, x2, y2, confidence, class_id] rows, highest confidence first
+        """
+        predictions = output.T
+        class_ids = predictions[:, 4:].argmax(axis=1)
+        scores = predictions[np.arange(len(predictions)), 4 + class_ids]
+        keep = scores > conf
+        predictions, class_ids, scores = predictions[keep], class_ids[keep], scores[keep]
+        if not len(scores):
+            return np.empty((0, 6), dtype=np.float32)
+
+        boxes = np.empty((len(predictions), 4), dtype=np.float32)
+        boxes[:, :2] = predictions[:, :2] - predictions[:, 2:4] / 2
+        boxes[:, 2:] = predictions[:, :2] + predictions[:, 2:4] / 2
+
+        # Offsetting boxes by class keeps NMS from suppressing across classes
+        offsets = class_ids[:, None].astype(np.float32) * 7680
+        nms_boxes = np.concatenate([boxes[:, :2] + offsets, boxes[:, 2:] - boxes[:, :2]], axis=1)
+        indices = np.asarray(cv2.dnn.NMSBoxes(nms_boxes.tolist(), scores.tolist(), conf, self.iou), dtype=int).reshape(-1)
+        indices = indices[np.argsort(-scores[indices], kind='stable')][:self.max_det]
+
+        return np.concatenate([boxes[indices], scores[indices, None], class_ids[indices, None]], axis=1).astype(np.float32)
+
+    def predict(self, image, conf, imgsz=640):
+        """
+        Detect objects in one image
+
+        Args:
+            image: BGR uint8 image
+            conf: Confidence threshold
+            imgsz: Size the longest side of the image is scaled to (dynamic exports only)
+
+        Returns:
+            detections: Array of [x1, y1, x2, y2, confidence, class_id] rows in image coordinates
+        """
+        canvas, scale, (pad_x, pad_y) = self._letterbox(image, imgsz)
+        detections = self._postprocess(self._run(canvas[None])[0], conf)
+
+        detections[:, [0, 2]] = ((detections[:, [0, 2]] - pad_x) / scale).clip(0, image.shape[1])
+        detections[:, [1, 3]] = ((detections[:, [1, 3]] - pad_y) / scale).clip(0, image.shape[0])
+        return detections
+
+    def predict_batch(self, batch, conf):
+        """
+        Detect objects in a batch of already letterboxed images
+
+        Args:
+            batch: (N, H, W, 3) BGR uint8 array, H and W multiples of 32
+            conf: Confidence threshold
+
+        Returns:
+            detections: List of detection arrays, in batch image coordinates
+        """
+        if self.fixed_shape is None and self.fixed_batch is None:
+            return [self._postprocess(output, conf) for output in self._run(batch)]
+
+        # Static export: run the images one at a time at the model's own size
+        return [self.predict(image, conf, max(image.shape[:2])) for image in batch]
+
+
+# Backends TrafficDetector can be created with, by name
+BACKENDS = {
+    'ultralytics': UltralyticsBackend,
+    'onnx': OnnxBackend
+}
+
+
+def create_backend(backend, model_path, **options):
+    """
+    Create an inference backend
+
+    Args:
+        backend: Name in BACKENDS, None to pick one from the model file extension,
+            or an object with predict and predict_batch methods, used as is
+        model_path: Path to the model
+        **options: Keyword arguments of the backend class
+
+    Returns:
+        backend: Backend instance
+    """
+    if backend is None:
+        backend = 'onnx' if model_path.endswith('.onnx') else 'ultralytics'
+    if not isinstance(backend, str):
+        return backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    return BACKENDS[backend](model_path, **options)
+
+
+def export_onnx(model_path="yolov8n.pt", dynamic=True, imgsz=640):
+    """
+    Export YOLO weights to ONNX for OnnxBackend
+
+    Args:
+        model_path: Path to the YOLO model weights
+        dynamic: Allow any input size and batch size
+        imgsz: Input size of a static export
+
+    Returns:
+        onnx_path: Path of the exported model, next to the weights
+    """
+    from ultralytics import YOLO
+
+    onnx_path = os.path.splitext(model_path)[0] + ".onnx"
+    if not os.path.exists(onnx_path):
+        onnx_path = YOLO(model_path).export(format='onnx', dynamic=dynamic, imgsz=imgsz)
+    return onnx_path
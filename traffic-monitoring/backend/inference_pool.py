@@ -0,0 +1,210 @@
+import multiprocessing as mp
+import threading
+import time
+from queue import Empty
+
+from frame_buffer import FrameRingBuffer, PROCESSING, ANNOTATED, capture_frames
+from traffic_detection import TrafficDetector
+
+
+def _inference_worker(model_path, confidence, detector_options, ring, task_queue, result_queue):
+    """
+    Worker loop: load the model once, then run detection on frames in the ring buffer
+
+    Args:
+        model_path: Path to the YOLO model weights
+        confidence: Confidence threshold for detections
+        detector_options: Further TrafficDetector keyword arguments (lane_rois, motion_gate, backend, ...)
+        ring: FrameRingBuffer holding the frames
+        task_queue: Queue of ready slot indices, None to stop
+        result_queue: Queue to put results in
+    """
+    detector = TrafficDetector(model_path, confidence, **detector_options)
+    result_queue.put({'ready': True})
+
+    try:
+        while True:
+            slot = task_queue.get()
+            if slot is None:
+                break
+
+            # Annotate the frame inside its slot, so neither the input nor the
+            # annotated frame is ever copied or pickled
+            ring.set_state(slot, PROCESSING)
+            lane_id = int(ring.lane_ids[slot])
+            vehicles_count, has_ambulance = detector.detect_vehicles(ring.view(slot), annotate_in_place=True,
+                                                                     lane_id=lane_id)[:2]
+            ring.set_state(slot, ANNOTATED)
+
+            result_queue.put({
+                'lane_id': lane_id,
+                'vehicles_count': vehicles_count,
+                'has_ambulance': has_ambulance,
+                'slot': slot,
+                'timestamp': time.time()
+            })
+    finally:
+        ring.close()
+
+
+class InferencePool:
+    def __init__(self, model_path="yolov8n.pt", confidence=0.25, num_workers=4, ring=None, num_slots=16,
+                 max_frame_shape=(1080, 1920, 3), startup_timeout=120, timeout=30, lane_rois=None,
+                 motion_gate=None, backend=None, backend_options=None):
+        """
+        Initialize a pool of long-lived detection workers
+
+        Each worker loads the YOLO model once at startup. Frames live in a shared
+        memory FrameRingBuffer and only slot indices travel through the queues,
+        so a call costs inference time only, with no process spawn, model
+        transfer or frame pickling.
+
+        Args:
+            model_path: Path to the YOLO model weights
+            confidence: Confidence threshold for detections
+            num_workers: Number of worker processes
+            ring: FrameRingBuffer to read frames from, a new one is created if None
+            num_slots: Number of slots of the ring created when ring is None
+            max_frame_shape: Largest (height, width, channels) frame of the ring created when ring is None
+            startup_timeout: Seconds to wait for the workers to load the model
+            timeout: Seconds to wait for a single frame result
+            lane_rois: Dictionary mapping lane IDs to ROI polygons, see TrafficDetector.set_lane_roi
+            motion_gate: MotionGate keyword arguments, see TrafficDetector. Each worker keeps
+                its own gates, so a lane only reuses results computed by the same worker
+            backend: Inference backend name, see TrafficDetector
+            backend_options: Keyword arguments of the backend, e.g. {'intra_op_threads': 1}
+        """
+        self.timeout = timeout
+        self.lock = threading.Lock()
+
+        self.owns_ring = ring is None
+        self.ring = ring if ring is not None else FrameRingBuffer(num_slots, max_frame_shape)
+
+        self.task_queue = mp.Queue()
+        self.result_queue = mp.Queue()
+        self.stop_event = mp.Event()
+        self.cameras = []
+        self.workers = []
+        detector_options = {
+            'lane_rois': lane_rois,
+            'motion_gate': motion_gate,
+            'backend': backend,
+            'backend_options': backend_options
+        }
+        for _ in range(num_workers):
+            p = mp.Process(
+                target=_inference_worker,
+                args=(model_path, confidence, detector_options, self.ring, self.task_queue, self.result_queue),
+                daemon=True
+            )
+            p.start()
+            self.workers.append(p)
+
+        # Wait until every worker has its model loaded
+        try:
+            for _ in self.workers:
+                self.result_queue.get(timeout=startup_timeout)
+        except Empty:
+            self.close()
+            raise RuntimeError("Inference workers did not start in time")
+
+    def add_camera(self, source, lane_id):
+        """
+        Start a capture process that decodes a camera straight into the ring
+
+        Results are then read with get_result. Do not mix cameras with
+        process_all_lanes on the same pool, they share the result queue.
+
+        Args:
+            source: cv2.VideoCapture source (device index, file or stream URL)
+            lane_id: ID of the lane the camera watches
+        """
+        p = mp.Process(
+            target=capture_frames,
+            args=(source, lane_id, self.ring, self.task_queue, self.stop_event),
+            daemon=True
+        )
+        p.start()
+        self.cameras.append(p)
+
+    def submit(self, slot):
+        """Queue a committed ring slot for detection"""
+        self.task_queue.put(slot)
+
+    def get_result(self, timeout=None):
+        """
+        Get the next detection result
+
+        The annotated frame is ring.view(result['slot']); call ring.release(slot)
+        once it has been consumed.
+
+        Returns:
+            result: Dictionary with lane_id, vehicles_count, has_ambulance, slot and timestamp
+        """
+        try:
+            return self.result_queue.get(timeout=self.timeout if timeout is None else timeout)
+        except Empty:
+            raise RuntimeError("Timed out waiting for an inference worker")
+
+    def process_all_lanes(self, frames):
+        """
+        Process all lanes on the worker pool
+
+        Args:
+            frames: Dictionary of frames, with lane IDs as keys
+
+        Returns:
+            results: Dictionary of results, with lane IDs as keys
+        """
+        results = {}
+        lanes = list(frames.items())
+
+        with self.lock:
+            # Lanes beyond the number of free slots are sent in further rounds
+            while lanes:
+                submitted = 0
+                while lanes:
+                    slot = self.ring.write(lanes[0][1], lanes[0][0])
+                    if slot is None:
+                        break
+                    self.submit(slot)
+                    lanes.pop(0)
+                    submitted += 1
+                if submitted == 0:
+                    raise RuntimeError("No free slot in the frame ring buffer")
+
+                for _ in range(submitted):
+                    result = self.get_result()
+
+                    # Copy the annotated frame out so the slot can be reused
+                    slot = result.pop('slot')
+                    result['processed_frame'] = self.ring.view(slot).copy()
+                    self.ring.release(slot)
+                    results[result['lane_id']] = result
+
+        return results
+
+    def close(self):
+        """Stop the cameras and workers, and release the ring if the pool created it"""
+        self.stop_event.set()
+        for p in self.cameras:
+            p.join(timeout=5)
+        self.cameras = []
+
+        for _ in self.workers:
+            self.task_queue.put(None)
+        for p in self.workers:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+        self.workers = []
+
+        if self.owns_ring and self.ring is not None:
+            self.ring.close()
+        self.ring = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
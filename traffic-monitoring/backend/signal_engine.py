@@ -0,0 +1,233 @@
+import heapq
+import time
+from datetime import datetime
+
+# Shortest green phase scheduled: a zero-length phase would end the instant it starts
+MIN_PHASE = 1.0
+
+
+class SignalEngine:
+    def __init__(self, base_time=10, time_per_vehicle=2, max_green_time=60, min_green_time=10,
+                 lanes=4, telemetry=None, clock=time.time):
+        """
+        Event-driven signal timing for any number of intersections
+
+        Every intersection gives the green to one lane at a time, in rotation, for a
+        green time set by the lane's vehicle count when it turns green. Instead of
+        every intersection being polled, the end of each green phase sits in a timer
+        heap and detector readings arrive as events, so the cost is proportional to
+        the number of phase changes and readings, not to intersections x ticks.
+
+        An ambulance on a red lane takes the green as soon as it is reported, unless
+        the green lane has one too, and a lane keeps the green while it has one.
+
+        Args:
+            base_time: Base time allocated to each lane in seconds
+            time_per_vehicle: Additional time allocated per vehicle in seconds
+            max_green_time: Maximum green time allowed for any lane
+            min_green_time: Minimum green time for any lane
+            lanes: Lanes per intersection, numbered from 1
+            telemetry: TelemetryStore readings and phase changes are logged to, None to not log
+            clock: Function returning the current time in seconds since the epoch, used
+                by every call that is not given a time
+        """
+        self.base_time = base_time
+        self.time_per_vehicle = time_per_vehicle
+        self.max_green_time = max_green_time
+        self.min_green_time = min_green_time
+        self.lanes = lanes
+        self.telemetry = telemetry
+        self.clock = clock
+
+        # Per intersection, by index
+        self.intersection_ids = []
+        self.vehicles = []   # [vehicle count by lane ID], index 0 unused
+        self.ambulance = []  # [ambulance detected by lane ID], index 0 unused
+        self.active = []     # Lane ID with the green
+        self.expiry = []     # Time the green phase ends
+        self.phase = []      # Number of the current phase, to tell stale timers apart
+        self.switches = []   # Number of phase changes so far
+
+        # (phase end time, intersection index, phase number), a replaced phase's entry
+        # is left in place and skipped when it comes up
+        self.timers = []
+
+    def add_intersection(self, intersection_id=None, now=None):
+        """
+        Start an intersection with its last lane green for base_time
+
+        Args:
+            intersection_id: ID of the intersection in the telemetry, its index if None
+            now: Start time, the clock if None
+
+        Returns:
+            index: Index of the intersection in the engine
+        """
+        now = self.clock() if now is None else now
+        index = len(self.active)
+        self.intersection_ids.append(index if intersection_id is None else intersection_id)
+        self.vehicles.append([0] * (self.lanes + 1))
+        self.ambulance.append([False] * (self.lanes + 1))
+        self.active.append(self.lanes)
+        self.expiry.append(now + self.base_time)
+        self.phase.append(0)
+        self.switches.append(0)
+        heapq.heappush(self.timers, (now + self.base_time, index, 0))
+        return index
+
+    def calculate_green_time(self, vehicle_count):
+        """
+        Calculate green time based on vehicle count
+
+        Args:
+            vehicle_count: Number of vehicles in the lane
+
+        Returns:
+            green_time: Calculated green time in seconds
+        """
+        # t = n * x + y
+        green_time = (vehicle_count * self.time_per_vehicle) + self.base_time
+
+        # Apply min and max constraints
+        green_time = max(green_time, self.min_green_time)
+        green_time = min(green_time, self.max_green_time)
+
+        return green_time
+
+    def _switch(self, index, lane_id, now):
+        """Give the green to a lane from now on, replacing the pending phase end"""
+        green_time = max(self.calculate_green_time(self.vehicles[index][lane_id]), MIN_PHASE)
+        self.active[index] = lane_id
+        self.expiry[index] = now + green_time
+        self.phase[index] += 1
+        self.switches[index] += 1
+        heapq.heappush(self.timers, (now + green_time, index, self.phase[index]))
+        self.log_lane(index, lane_id, now)
+
+    def _ambulance_lane(self, index):
+        """First red lane with an ambulance, None if there is none"""
+        ambulance = self.ambulance[index]
+        active = self.active[index]
+        for lane_id in range(1, self.lanes + 1):
+            if ambulance[lane_id] and lane_id != active:
+                return lane_id
+        return None
+
+    def advance(self, now=None):
+        """
+        End the green phases due by now, each handing the green on
+
+        The next green goes to the green lane again if it has an ambulance, else to
+        the first red lane with one, else to the next lane in rotation. Phases are
+        changed at the time they were due, however late advance is called.
+
+        Args:
+            now: Time to advance to, the clock if None
+
+        Returns:
+            switches: List of (intersection index, lane ID given the green), in time order
+        """
+        now = self.clock() if now is None else now
+        timers = self.timers
+        switches = []
+        while timers and timers[0][0] <= now:
+            expiry, index, phase = heapq.heappop(timers)
+            if phase != self.phase[index]:
+                continue
+            lane_id = self.active[index]
+            if not self.ambulance[index][lane_id]:
+                lane_id = self._ambulance_lane(index) or lane_id % self.lanes + 1
+            self._switch(index, lane_id, expiry)
+            switches.append((index, lane_id))
+        return switches
+
+    def next_expiry(self):
+        """Time of the next phase end of any intersection, None if there are none"""
+        timers = self.timers
+        while timers and timers[0][2] != self.phase[timers[0][1]]:
+            heapq.heappop(timers)
+        return timers[0][0] if timers else None
+
+    def update_lane(self, index, lane_id, vehicles_count, has_ambulance, now=None):
+        """
+        Take a detector reading of a lane
+
+        Phase ends due by now are processed first.
+
+        Args:
+            index: Index of the intersection
+            lane_id: ID of the lane (1 to lanes)
+            vehicles_count: Number of vehicles in the lane
+            has_ambulance: Boolean indicating if an ambulance is detected
+            now: Time of the reading, the clock if None
+
+        Returns:
+            switched: True if the reading gave the green to an ambulance's lane
+        """
+        now = self.clock() if now is None else now
+        self.advance(now)
+        self.vehicles[index][lane_id] = vehicles_count
+        self.ambulance[index][lane_id] = has_ambulance
+        self.log_lane(index, lane_id, now)
+
+        # Preempt, unless the green lane is serving an ambulance itself
+        if not self.ambulance[index][self.active[index]]:
+            ambulance_lane = self._ambulance_lane(index)
+            if ambulance_lane is not None:
+                self._switch(index, ambulance_lane, now)
+                return True
+        return False
+
+    def force_lane(self, index, lane_id, now=None):
+        """
+        Give the green to a lane now, for its usual green time
+
+        Returns:
+            switched: False if the lane already had the green
+        """
+        now = self.clock() if now is None else now
+        self.advance(now)
+        if lane_id == self.active[index]:
+            return False
+        self._switch(index, lane_id, now)
+        return True
+
+    def time_remaining(self, index, now=None):
+        """Seconds left of an intersection's green phase"""
+        now = self.clock() if now is None else now
+        return max(self.expiry[index] - now, 0)
+
+    def lane_states(self, index, now=None):
+        """
+        States of the lanes of an intersection
+
+        Returns:
+            states: {lane_id: {'signal', 'time_remaining', 'vehicles', 'has_ambulance'}}
+        """
+        active = self.active[index]
+        time_remaining = self.time_remaining(index, now)
+        return {
+            lane_id: {
+                'signal': 'green' if lane_id == active else 'red',
+                'time_remaining': time_remaining if lane_id == active else 0,
+                'vehicles': self.vehicles[index][lane_id],
+                'has_ambulance': self.ambulance[index][lane_id]
+            }
+            for lane_id in range(1, self.lanes + 1)
+        }
+
+    def log_lane(self, index, lane_id, now=None):
+        """Log the state of a lane to the telemetry store, if there is one"""
+        if self.telemetry is None:
+            return
+        now = self.clock() if now is None else now
+        active = lane_id == self.active[index]
+        self.telemetry.append(
+            datetime.fromtimestamp(now),
+            lane_id,
+            self.vehicles[index][lane_id],
+            'green' if active else 'red',
+            self.time_remaining(index, now) if active else 0,
+            self.ambulance[index][lane_id],
+            self.intersection_ids[index]
+        )
@@ -0,0 +1,169 @@
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque
+
+
+def format_event(event_id, event, data):
+    """
+    Encode one Server-Sent Events message
+
+    Returns:
+        message: UTF-8 bytes
+    """
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+class StateBroadcaster:
+    def __init__(self, history=256, heartbeat=15.0):
+        """
+        Push per-lane changes of the live state to any number of Server-Sent Events clients
+
+        Every change is encoded once and appended to a shared ring of recent events,
+        and waiting clients are woken up. Each client follows the ring at its own
+        pace, so publishing never waits for a client. A client that falls more than
+        history events behind, or reconnects with an expired Last-Event-ID, gets a
+        snapshot of the current state instead of the events it missed.
+
+        Args:
+            history: Number of recent events kept for slow and reconnecting clients
+            heartbeat: Seconds between keep-alive comments while nothing changes,
+                which is also how quickly a gone client is noticed
+        """
+        self.heartbeat = heartbeat
+        self.condition = threading.Condition()
+        self.events = deque(maxlen=history)  # (event ID, encoded message)
+        self.last_id = 0
+        self.lanes = {}
+        self.timestamp = None
+        self.snapshot_cache = (None, None)  # (event ID, encoded snapshot)
+        self.subscribers = 0
+        # asyncio.Event per event loop with waiting astream clients, set by the next publish
+        self.loop_events = {}
+
+    def publish(self, state):
+        """
+        Push the lanes of a state that changed since the last publish
+
+        Args:
+            state: Dictionary with 'timestamp' and 'lanes' ({lane_id: {field: value}})
+
+        Returns:
+            event_id: ID of the delta event, None if no lane changed
+        """
+        with self.condition:
+            lanes = {lane_id: dict(lane) for lane_id, lane in state['lanes'].items()}
+            delta = {}
+            for lane_id, lane in lanes.items():
+                previous = self.lanes.get(lane_id, {})
+                changed = {key: value for key, value in lane.items() if key not in previous or previous[key] != value}
+                if changed:
+                    delta[lane_id] = changed
+            self.lanes = lanes
+            self.timestamp = state.get('timestamp')
+            if not delta:
+                return None
+
+            self.last_id += 1
+            self.events.append((self.last_id, format_event(
+                self.last_id, 'delta', {'timestamp': self.timestamp, 'lanes': delta})))
+            self.condition.notify_all()
+            # One wake-up per event loop, however many of its clients wait
+            for loop, event in self.loop_events.items():
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(event.set)
+            self.loop_events = {}
+            return self.last_id
+
+    def _snapshot(self):
+        """The full current state as an event, encoded once per state"""
+        if self.snapshot_cache[0] != self.last_id:
+            self.snapshot_cache = (self.last_id, format_event(
+                self.last_id, 'snapshot', {'timestamp': self.timestamp, 'lanes': self.lanes}))
+        return self.snapshot_cache[1]
+
+    @staticmethod
+    def _cursor(last_event_id):
+        """Event ID a client resumes after, None for a new client or an unreadable ID"""
+        try:
+            return int(last_event_id) if last_event_id else None
+        except ValueError:
+            return None
+
+    def _pending(self, cursor):
+        """
+        Messages a client at cursor has not seen yet, called with the condition held
+
+        Returns:
+            messages: List of encoded messages
+            cursor: ID of the last event they cover
+        """
+        if cursor == self.last_id:
+            return [], cursor
+        first_id = self.events[0][0] if self.events else self.last_id + 1
+        if cursor is None or cursor < first_id - 1 or cursor > self.last_id:
+            # New, fallen behind the ring or unknown: start over from the current state
+            return [self._snapshot()], self.last_id
+        return [message for _, message in itertools.islice(self.events, cursor - first_id + 1, None)], self.last_id
+
+    def stream(self, last_event_id=None):
+        """
+        Messages for one client, to be returned as a text/event-stream response
+
+        Args:
+            last_event_id: Last-Event-ID header of a reconnecting client
+
+        Yields:
+            message: Encoded events, or a keep-alive comment
+        """
+        cursor = self._cursor(last_event_id)
+
+        with self.condition:
+            self.subscribers += 1
+        try:
+            while True:
+                with self.condition:
+                    messages, cursor = self._pending(cursor)
+                    if not messages:
+                        self.condition.wait(self.heartbeat)
+                        messages, cursor = self._pending(cursor)
+                # Written outside the lock: a slow client only delays itself
+                yield b''.join(messages) if messages else b': keep-alive\n\n'
+        finally:
+            with self.condition:
+                self.subscribers -= 1
+
+    async def astream(self, last_event_id=None):
+        """
+        Messages for one client of an asyncio server, as stream, without holding a thread
+
+        Args:
+            last_event_id: Last-Event-ID header of a reconnecting client
+
+        Yields:
+            message: Encoded events, or a keep-alive comment
+        """
+        loop = asyncio.get_running_loop()
+        cursor = self._cursor(last_event_id)
+
+        with self.condition:
+            self.subscribers += 1
+        try:
+            while True:
+                with self.condition:
+                    messages, cursor = self._pending(cursor)
+                    if not messages:
+                        # Taken under the lock, so a publish in between can't be missed
+                        event = self.loop_events.setdefault(loop, asyncio.Event())
+                if not messages:
+                    try:
+                        await asyncio.wait_for(event.wait(), self.heartbeat)
+                    except asyncio.TimeoutError:
+                        pass
+                    with self.condition:
+                        messages, cursor = self._pending(cursor)
+                yield b''.join(messages) if messages else b': keep-alive\n\n'
+        finally:
+            with self.condition:
+                self.subscribers -= 1
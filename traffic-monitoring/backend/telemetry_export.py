@@ -0,0 +1,146 @@
+import json
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+class ChunkSink:
+    """
+    Write-only file that hands what was written to it out in chunks
+
+    Lets the pyarrow CSV and Parquet writers feed a streamed response. The
+    position keeps counting across chunks, as the Parquet footer records file
+    offsets.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def drain(self):
+        """Return and forget everything written since the last drain"""
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def json_values(column):
+    """
+    JSON text of every value of a column, computed in Arrow without per-row Python
+
+    Returns:
+        values: Arrow string array
+    """
+    if pa.types.is_timestamp(column.type):
+        # ISO 8601: the cast gives 'YYYY-MM-DD HH:MM:SS.ffffff', 20x faster than pc.strftime
+        text = pc.binary_replace_slice(pc.cast(column, pa.string()), start=10, stop=11, replacement='T')
+        values = pc.binary_join_element_wise('"', text, '"', '')
+    elif pa.types.is_boolean(column.type):
+        values = pc.if_else(column, 'true', 'false')
+    elif pa.types.is_string(column.type):
+        # Few distinct values (signal states): escape each once and look them up
+        encoded = column.dictionary_encode()
+        escaped = pa.array([json.dumps(value) for value in encoded.dictionary.to_pylist()], pa.string())
+        values = escaped.take(encoded.indices)
+    elif pa.types.is_floating(column.type):
+        # JSON has no NaN or infinity
+        values = pc.if_else(pc.is_finite(column), pc.cast(column, pa.string()), 'null')
+    else:
+        values = pc.cast(column, pa.string())
+    return pc.fill_null(values, 'null')
+
+
+def json_lines(batch, separator):
+    """
+    Encode a record batch as JSON objects, each followed by separator
+
+    Returns:
+        data: UTF-8 bytes
+    """
+    parts = []
+    for i, (name, column) in enumerate(zip(batch.schema.names, batch.columns)):
+        parts.append(('{' if i == 0 else ',') + json.dumps(name) + ':')
+        parts.append(json_values(column))
+    parts.append('}' + separator)
+    lines = pc.binary_join_element_wise(*parts, '')
+    if isinstance(lines, pa.ChunkedArray):
+        lines = lines.combine_chunks()
+
+    # The lines are stored back to back, so their data buffer is the encoded batch
+    offsets = np.frombuffer(lines.buffers()[1], dtype=np.int32)[lines.offset:lines.offset + len(lines) + 1]
+    return lines.buffers()[2].to_pybytes()[offsets[0]:offsets[-1]]
+
+
+def ndjson_chunks(batches):
+    """Newline-delimited JSON, one object per row"""
+    for batch in batches:
+        if batch.num_rows:
+            yield json_lines(batch, '\n')
+
+
+def json_array_chunks(batches):
+    """One JSON array of row objects, produced batch by batch"""
+    yield b'['
+    first = True
+    for batch in batches:
+        if batch.num_rows:
+            data = json_lines(batch, ',\n')[:-2]
+            yield data if first else b',\n' + data
+            first = False
+    yield b']'
+
+
+def csv_chunks(batches, schema):
+    """CSV with a header row"""
+    import pyarrow.csv as csv
+
+    sink = ChunkSink()
+    with csv.CSVWriter(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def parquet_chunks(batches, schema):
+    """Parquet file, one row group per batch"""
+    import pyarrow.parquet as pq
+
+    sink = ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for batch in batches:
+            if batch.num_rows:
+                writer.write_batch(batch)
+                yield sink.drain()
+    yield sink.drain()
+
+
+# Export formats by name: (mimetype, file extension, encoder taking batches and their schema)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson', lambda batches, schema: ndjson_chunks(batches)),
+    'json': ('application/json', 'json', lambda batches, schema: json_array_chunks(batches)),
+    'csv': ('text/csv', 'csv', csv_chunks),
+    'parquet': ('application/vnd.apache.parquet', 'parquet', parquet_chunks)
+}
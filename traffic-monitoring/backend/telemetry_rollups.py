@@ -0,0 +1,329 @@
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Bucket sizes in seconds, by name
+RESOLUTIONS = {
+    '1s': 1,
+    '1m': 60,
+    '1h': 3600
+}
+
+# Vehicle counts are kept as a histogram of 0..62 vehicles plus one bin for 63 and more,
+# so rollups add up and percentiles are exact. A percentile in the last bin is reported
+# as the bucket maximum, an upper bound
+HISTOGRAM_BINS = 64
+PERCENTILES = (50, 90, 95)
+
+# Aggregated lane statistics, one row per bucket, intersection and lane
+AGGREGATE_SCHEMA = pa.schema(
+    [('bucket', pa.timestamp('us')), ('intersection_id', pa.int32()), ('lane_id', pa.int8()),
+     ('samples', pa.int64()), ('mean_vehicles', pa.float64()), ('max_vehicles', pa.int32())]
+    + [(f'p{q}_vehicles', pa.int32()) for q in PERCENTILES]
+    + [('green_share', pa.float64()), ('ambulance_events', pa.int64())]
+)
+
+COUNTER_COLUMNS = ['samples', 'vehicle_sum', 'vehicle_max', 'green_samples', 'ambulance_events']
+HISTOGRAM_COLUMNS = [f'h{i}' for i in range(HISTOGRAM_BINS)]
+
+
+def batch_columns(batch):
+    """
+    NumPy columns of a telemetry record batch or table, as aggregation needs them
+
+    Returns:
+        columns: Dictionary of arrays: time (microseconds since the epoch), intersection_id,
+            lane_id, vehicle_count, green and has_ambulance
+    """
+    def numpy(name):
+        column = batch.column(name)
+        if isinstance(column, pa.ChunkedArray):
+            column = column.combine_chunks()
+        return column.to_numpy(zero_copy_only=False)
+
+    return {
+        'time': numpy('timestamp').astype('datetime64[us]').astype(np.int64),
+        'intersection_id': numpy('intersection_id').astype(np.int64),
+        'lane_id': numpy('lane_id').astype(np.int64),
+        'vehicle_count': numpy('vehicle_count').astype(np.int64),
+        'green': pc.equal(batch.column('signal_state'), 'green').to_numpy(zero_copy_only=False).astype(bool),
+        'has_ambulance': numpy('has_ambulance').astype(bool)
+    }
+
+
+def ambulance_onsets(columns, previous):
+    """
+    Mark the observations where an ambulance appears in a lane that had none
+
+    Args:
+        columns: Output of batch_columns
+        previous: Dictionary of the last has_ambulance of every (intersection_id, lane_id),
+            updated in place, so events spanning batches are counted once
+
+    Returns:
+        onsets: Boolean array, aligned with the columns
+    """
+    order = np.lexsort((columns['time'], columns['lane_id'], columns['intersection_id']))
+    intersections = columns['intersection_id'][order]
+    lanes = columns['lane_id'][order]
+    ambulance = columns['has_ambulance'][order]
+
+    # Each observation against the one before it in the same lane
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (intersections[1:] != intersections[:-1]) | (lanes[1:] != lanes[:-1])
+    before = np.empty(len(order), dtype=bool)
+    before[1:] = ambulance[:-1]
+    starts = np.flatnonzero(first)
+    before[starts] = [previous.get(key, False) for key in zip(intersections[starts].tolist(), lanes[starts].tolist())]
+
+    last = np.append(starts[1:], len(order)) - 1
+    previous.update(zip(zip(intersections[last].tolist(), lanes[last].tolist()), ambulance[last].tolist()))
+
+    onsets = np.empty(len(order), dtype=bool)
+    onsets[order] = ambulance & ~before
+    return onsets
+
+
+def accumulate(columns, onsets, seconds):
+    """
+    Sum observations into buckets per intersection and lane
+
+    Returns:
+        counters: Dictionary of arrays, one entry per bucket, intersection and lane:
+            bucket (seconds since the epoch), intersection_id, lane_id, the COUNTER_COLUMNS
+            and histogram, an (n, HISTOGRAM_BINS) array of vehicle counts
+    """
+    bucket = columns['time'] // (seconds * 1000000) * seconds
+    intersections, lanes = columns['intersection_id'], columns['lane_id']
+
+    # Group by sorting: a new group starts wherever the key changes
+    order = np.lexsort((lanes, intersections, bucket))
+    change = np.ones(len(order), dtype=bool)
+    change[1:] = ((bucket[order[1:]] != bucket[order[:-1]])
+                  | (intersections[order[1:]] != intersections[order[:-1]])
+                  | (lanes[order[1:]] != lanes[order[:-1]]))
+    inverse = np.empty(len(order), dtype=np.int64)
+    inverse[order] = np.cumsum(change) - 1
+    firsts = order[change]
+    size = len(firsts)
+
+    counts = columns['vehicle_count']
+    maximum = np.full(size, -1, dtype=np.int64)
+    np.maximum.at(maximum, inverse, counts)
+    bins = np.clip(counts, 0, HISTOGRAM_BINS - 1)
+
+    return {
+        'bucket': bucket[firsts],
+        'intersection_id': intersections[firsts],
+        'lane_id': lanes[firsts],
+        'samples': np.bincount(inverse, minlength=size),
+        'vehicle_sum': np.bincount(inverse, weights=counts, minlength=size).astype(np.int64),
+        'vehicle_max': maximum,
+        'green_samples': np.bincount(inverse, weights=columns['green'], minlength=size).astype(np.int64),
+        'ambulance_events': np.bincount(inverse, weights=onsets, minlength=size).astype(np.int64),
+        'histogram': np.bincount(inverse * HISTOGRAM_BINS + bins, minlength=size * HISTOGRAM_BINS)
+                       .reshape(size, HISTOGRAM_BINS)
+    }
+
+
+def finalize(counters):
+    """
+    Turn bucket counters into the statistics of AGGREGATE_SCHEMA
+
+    Returns:
+        table: pyarrow Table ordered like the counters
+    """
+    samples = counters['samples']
+    histogram = counters['histogram']
+    # Nearest-rank percentiles: the first bin whose cumulative count reaches the rank
+    cumulative = np.cumsum(histogram, axis=1)
+    percentiles = {}
+    for q in PERCENTILES:
+        rank = np.maximum(np.ceil(samples * q / 100), 1)
+        value = (cumulative < rank[:, None]).sum(axis=1)
+        percentiles[f'p{q}_vehicles'] = np.where(value == HISTOGRAM_BINS - 1, counters['vehicle_max'], value)
+
+    return pa.table({
+        'bucket': pa.array(counters['bucket'].astype('datetime64[s]').astype('datetime64[us]')),
+        'intersection_id': counters['intersection_id'],
+        'lane_id': counters['lane_id'],
+        'samples': samples,
+        'mean_vehicles': counters['vehicle_sum'] / samples,
+        'max_vehicles': counters['vehicle_max'],
+        **percentiles,
+        'green_share': counters['green_samples'] / samples,
+        'ambulance_events': counters['ambulance_events']
+    }, schema=AGGREGATE_SCHEMA)
+
+
+def aggregate_table(table, resolution):
+    """
+    Aggregate raw telemetry in one pass, without rollups
+
+    An ambulance already present in the first observation of a lane counts as an event.
+
+    Args:
+        table: Telemetry table or record batch
+        resolution: Name in RESOLUTIONS
+
+    Returns:
+        table: pyarrow Table with the AGGREGATE_SCHEMA columns, in bucket order
+    """
+    if not table.num_rows:
+        return AGGREGATE_SCHEMA.empty_table()
+    columns = batch_columns(table)
+    return finalize(accumulate(columns, ambulance_onsets(columns, {}), RESOLUTIONS[resolution]))
+
+
+class TelemetryRollups:
+    def __init__(self, path, resolutions=('1m', '1h'), write_interval=5.0):
+        """
+        Pre-aggregated lane statistics, updated incrementally as telemetry is written
+
+        Every resolution is an SQLite table of bucket counters keyed by (bucket,
+        intersection_id, lane_id). Updates add to the counters of existing buckets,
+        so rows arriving late and several writer processes are handled. Long-range
+        charts then read a few rows per bucket instead of all the raw telemetry.
+        Updates are gathered in memory and written every write_interval seconds, so
+        one upsert covers many updates of a bucket.
+
+        Args:
+            path: SQLite database file
+            resolutions: Names in RESOLUTIONS to keep rollups of
+            write_interval: Seconds between writes of the gathered updates, 0 to write every update
+        """
+        self.path = path
+        self.resolutions = list(resolutions)
+        self.lock = threading.RLock()
+        # Last has_ambulance per (intersection_id, lane_id), to count events across updates
+        self.previous_ambulance = {}
+        self.write_interval = write_interval
+        self.pending = []  # (columns, onsets) of the updates not written yet
+        self.last_write = time.monotonic()
+
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL: readers don't block the writers, and commits don't fsync (checkpoints do)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+
+        columns = COUNTER_COLUMNS + HISTOGRAM_COLUMNS
+        self.upserts = {}
+        for resolution in self.resolutions:
+            table = self._table(resolution)
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (bucket INTEGER, intersection_id INTEGER, lane_id INTEGER, "
+                + ', '.join(f'{column} INTEGER' for column in columns)
+                + ", PRIMARY KEY (bucket, intersection_id, lane_id)) WITHOUT ROWID")
+            updates = [f'{column} = max({column}, excluded.{column})' if column == 'vehicle_max'
+                       else f'{column} = {column} + excluded.{column}' for column in columns]
+            self.upserts[resolution] = (
+                f"INSERT INTO {table} (bucket, intersection_id, lane_id, {', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * (len(columns) + 3))}) "
+                f"ON CONFLICT (bucket, intersection_id, lane_id) DO UPDATE SET {', '.join(updates)}")
+        self.connection.commit()
+
+    @staticmethod
+    def _table(resolution):
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}, use one of {', '.join(RESOLUTIONS)}")
+        return f"rollup_{resolution}"
+
+    def update(self, batch):
+        """
+        Add a batch of telemetry rows to every rollup
+
+        Args:
+            batch: Telemetry record batch or table
+        """
+        if not batch.num_rows:
+            return
+        with self.lock:
+            columns = batch_columns(batch)
+            # Onsets are found now, the order of the updates is lost once they are gathered
+            self.pending.append((columns, ambulance_onsets(columns, self.previous_ambulance)))
+            if time.monotonic() - self.last_write >= self.write_interval:
+                self.write()
+
+    def write(self):
+        """Add the gathered updates to the rollup tables"""
+        with self.lock:
+            self.last_write = time.monotonic()
+            if not self.pending:
+                return
+            columns = {name: np.concatenate([update[0][name] for update in self.pending])
+                       for name in self.pending[0][0]}
+            onsets = np.concatenate([update[1] for update in self.pending])
+            self.pending = []
+
+            with self.connection:
+                for resolution in self.resolutions:
+                    counters = accumulate(columns, onsets, RESOLUTIONS[resolution])
+                    rows = np.column_stack(
+                        [counters[name] for name in ['bucket', 'intersection_id', 'lane_id'] + COUNTER_COLUMNS]
+                        + [counters['histogram']])
+                    self.connection.executemany(self.upserts[resolution], rows.tolist())
+
+    def query(self, resolution, start=None, end=None, lane_id=None, intersection_id=None):
+        """
+        Read aggregated statistics from a rollup
+
+        Args:
+            resolution: Name in resolutions
+            start: Earliest time, the bucket containing it is included (datetime)
+            end: Latest time (datetime)
+            lane_id: Only return this lane
+            intersection_id: Only return this intersection
+
+        Returns:
+            table: pyarrow Table with the AGGREGATE_SCHEMA columns, in bucket order
+        """
+        if resolution not in self.resolutions:
+            raise ValueError(f"No rollup at resolution {resolution}")
+        seconds = RESOLUTIONS[resolution]
+
+        conditions, parameters = [], []
+        if start is not None:
+            conditions.append('bucket >= ?')
+            parameters.append(int(np.datetime64(start, 's').astype(np.int64)) // seconds * seconds)
+        if end is not None:
+            conditions.append('bucket <= ?')
+            parameters.append(int(np.datetime64(end, 's').astype(np.int64)))
+        if lane_id is not None:
+            conditions.append('lane_id = ?')
+            parameters.append(lane_id)
+        if intersection_id is not None:
+            conditions.append('intersection_id = ?')
+            parameters.append(intersection_id)
+
+        columns = ['bucket', 'intersection_id', 'lane_id'] + COUNTER_COLUMNS + HISTOGRAM_COLUMNS
+        with self.lock:
+            self.write()
+            rows = self.connection.execute(
+                f"SELECT {', '.join(columns)} FROM {self._table(resolution)}"
+                + (f" WHERE {' AND '.join(conditions)}" if conditions else '')
+                + " ORDER BY bucket, intersection_id, lane_id", parameters).fetchall()
+        if not rows:
+            return AGGREGATE_SCHEMA.empty_table()
+
+        values = np.array(rows, dtype=np.int64)
+        counters = {name: values[:, i] for i, name in enumerate(columns[:3 + len(COUNTER_COLUMNS)])}
+        counters['histogram'] = values[:, 3 + len(COUNTER_COLUMNS):]
+        return finalize(counters)
+
+    def clear(self):
+        """Empty every rollup, before rebuilding them"""
+        with self.lock:
+            with self.connection:
+                for resolution in self.resolutions:
+                    self.connection.execute(f"DELETE FROM {self._table(resolution)}")
+            self.previous_ambulance = {}
+            self.pending = []
+
+    def close(self):
+        with self.lock:
+            self.write()
+            self.connection.close()
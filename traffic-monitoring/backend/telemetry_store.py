@@ -0,0 +1,516 @@
+import atexit
+import base64
+import binascii
+import bisect
+import glob
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+# pa.array imports pandas on first use, and pandas imports this module, which can't be
+# imported during interpreter shutdown. Importing it now lets the atexit close flush rows
+# appended just before exit.
+import concurrent.futures.thread  # noqa: F401
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+
+from telemetry_rollups import RESOLUTIONS, TelemetryRollups, aggregate_table
+
+# One schema for every writer (API state updates and controller events)
+TELEMETRY_SCHEMA = pa.schema([
+    ('timestamp', pa.timestamp('us')),
+    ('intersection_id', pa.int32()),
+    ('lane_id', pa.int8()),
+    ('vehicle_count', pa.int32()),
+    ('signal_state', pa.string()),
+    ('signal_duration', pa.float32()),
+    ('has_ambulance', pa.bool_())
+])
+
+# Total order of the rows, so pages are stable whichever files the rows are read from
+ROW_ORDER = [(name, 'ascending') for name in
+             ['timestamp', 'intersection_id', 'lane_id', 'signal_state', 'vehicle_count', 'signal_duration',
+              'has_ambulance']]
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "telemetry")
+
+
+def hour_key(timestamp):
+    """Name of the hourly partition a timestamp belongs to"""
+    return timestamp.strftime('%Y-%m-%dT%H')
+
+
+def encode_cursor(timestamp, skip):
+    """Page cursor: resume at a timestamp, after the first skip rows at it"""
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{skip}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Inverse of encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        timestamp, skip = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(skip)
+    except (ValueError, UnicodeError, binascii.Error):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def to_datetime(value):
+    """Accept datetimes, ISO strings and UNIX timestamps, None stays None"""
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value)
+    return datetime.fromisoformat(value)
+
+
+class TelemetryStore:
+    def __init__(self, root=DEFAULT_ROOT, flush_rows=1000, flush_interval=1.0, fsync_interval=5.0,
+                 segment_rows=100000, row_group_size=16384, rollup_resolutions=('1m', '1h')):
+        """
+        Initialize an append-only telemetry store partitioned by hour
+
+        Rows are buffered in memory and appended as Arrow IPC record batches to a
+        live segment under root/hour=YYYY-MM-DDTHH/, every flush_rows rows or
+        flush_interval seconds. Segments are only fsynced every fsync_interval
+        seconds. Once a segment is full or its hour has passed, it is compacted into
+        a Parquet file sorted by intersection, lane and time, so reads skip row
+        groups by their statistics. Each store writes its own files, so several
+        processes can share a root. Flushed rows are also added to the rollups in
+        root/rollups.sqlite, which aggregate queries read instead of the raw rows.
+
+        Args:
+            root: Directory of the store
+            flush_rows: Buffered rows that trigger a flush
+            flush_interval: Seconds after which an append flushes the buffer
+            fsync_interval: Seconds between fsyncs of the live segments, 0 to fsync every flush
+            segment_rows: Rows after which a live segment is compacted
+            row_group_size: Rows per Parquet row group
+            rollup_resolutions: Resolutions (see telemetry_rollups.RESOLUTIONS) to keep
+                rollups of, empty for none
+        """
+        self.root = root
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.segment_rows = segment_rows
+        self.row_group_size = row_group_size
+
+        self.lock = threading.RLock()
+        self.buffer = [[] for _ in TELEMETRY_SCHEMA.names]  # One list per schema column
+        self.last_flush = time.monotonic()
+        self.last_fsync = time.monotonic()
+
+        # Live segments by hour partition: [path, file, IPC writer, rows]
+        self.segments = {}
+        self.writer_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.next_segment = 0
+        self.closed = False
+        self.partition_index = None  # (root mtime, sorted hour keys)
+
+        os.makedirs(root, exist_ok=True)
+        self.rollups = TelemetryRollups(os.path.join(root, 'rollups.sqlite'), rollup_resolutions) \
+            if rollup_resolutions else None
+        atexit.register(self.close)
+
+    def append(self, timestamp, lane_id, vehicle_count, signal_state, signal_duration, has_ambulance,
+               intersection_id=0):
+        """
+        Buffer one lane observation
+
+        Args:
+            timestamp: Time of the observation (datetime, ISO string or UNIX time)
+            lane_id: ID of the lane (1-4)
+            vehicle_count: Number of vehicles in the lane
+            signal_state: 'red', 'yellow' or 'green'
+            signal_duration: Seconds allocated to or remaining in the signal state
+            has_ambulance: Boolean indicating if an ambulance is detected
+            intersection_id: ID of the intersection
+        """
+        self.append_rows([{
+            'timestamp': timestamp,
+            'intersection_id': intersection_id,
+            'lane_id': lane_id,
+            'vehicle_count': vehicle_count,
+            'signal_state': signal_state,
+            'signal_duration': signal_duration,
+            'has_ambulance': has_ambulance
+        }])
+
+    def append_rows(self, rows):
+        """
+        Buffer several observations
+
+        Args:
+            rows: Iterable of dictionaries with the TELEMETRY_SCHEMA columns,
+                intersection_id defaults to 0
+        """
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("Telemetry store is closed")
+            # Coerced on append so a bad value fails here, not in a later flush together
+            # with other rows, Arrow conversion happens in bulk on flush
+            buffer = self.buffer
+            for row in rows:
+                timestamp = row['timestamp']
+                values = (
+                    timestamp if isinstance(timestamp, datetime) else to_datetime(timestamp),
+                    int(row.get('intersection_id', 0)),
+                    int(row['lane_id']),
+                    int(row['vehicle_count']),
+                    str(row['signal_state']),
+                    float(row['signal_duration']),
+                    bool(row['has_ambulance'])
+                )
+                for column, value in zip(buffer, values):
+                    column.append(value)
+
+            if (len(buffer[0]) >= self.flush_rows
+                    or time.monotonic() - self.last_flush >= self.flush_interval):
+                self.flush()
+
+    def flush(self, fsync=False):
+        """
+        Append the buffered rows to the live segments
+
+        Args:
+            fsync: Force an fsync of the live segments, regardless of fsync_interval
+        """
+        with self.lock:
+            self.last_flush = time.monotonic()
+            if self.buffer[0]:
+                batch = pa.RecordBatch.from_arrays([
+                    pa.array(column, type=field.type) for column, field in zip(self.buffer, TELEMETRY_SCHEMA)
+                ], schema=TELEMETRY_SCHEMA)
+                self.buffer = [[] for _ in TELEMETRY_SCHEMA.names]
+
+                hours = pc.strftime(batch.column('timestamp'), format='%Y-%m-%dT%H')
+                unique_hours = sorted(pc.unique(hours).to_pylist())
+                for hour in unique_hours:
+                    self._write(hour, batch if len(unique_hours) == 1 else batch.filter(pc.equal(hours, hour)))
+
+                if self.rollups is not None:
+                    self.rollups.update(batch)
+
+                # Rows have moved on to a later hour: earlier segments are complete
+                for hour in [key for key in self.segments if key < unique_hours[0]]:
+                    self._compact(hour)
+
+            if fsync or time.monotonic() - self.last_fsync >= self.fsync_interval:
+                for _, file, _, _ in self.segments.values():
+                    os.fsync(file.fileno())
+                self.last_fsync = time.monotonic()
+
+    def _write(self, hour, batch):
+        """Append a record batch to the live segment of an hour partition"""
+        if hour not in self.segments:
+            partition = os.path.join(self.root, f"hour={hour}")
+            os.makedirs(partition, exist_ok=True)
+            path = os.path.join(partition, f"segment-{self.writer_id}-{self.next_segment:05d}.arrow")
+            self.next_segment += 1
+            file = open(path, 'wb')
+            self.segments[hour] = [path, file, ipc.new_stream(file, TELEMETRY_SCHEMA), 0]
+
+        segment = self.segments[hour]
+        segment[2].write_batch(batch)
+        segment[1].flush()  # Make the batch visible to readers
+        segment[3] += batch.num_rows
+
+        if segment[3] >= self.segment_rows:
+            self._compact(hour)
+
+    def _compact(self, hour):
+        """Turn the live segment of an hour into a sorted Parquet file"""
+        import pyarrow.parquet as pq
+
+        path, file, writer, _ = self.segments.pop(hour)
+        writer.close()
+        file.flush()
+        os.fsync(file.fileno())
+        file.close()
+
+        table = read_segment(path).sort_by([
+            ('intersection_id', 'ascending'), ('lane_id', 'ascending'), ('timestamp', 'ascending')
+        ])
+
+        # Write under a temporary name first so a crash never leaves a half-written part
+        parquet_path = path[:-len('.arrow')] + '.parquet'
+        tmp_path = parquet_path + '.tmp'
+        pq.write_table(table, tmp_path, row_group_size=self.row_group_size)
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, parquet_path)
+        os.remove(path)
+
+    def _partitions(self):
+        """
+        Sorted hour keys of the partitions on disk
+
+        The listing is cached and only rescanned when the root directory changes,
+        which is what creating a partition does. Listings taken right after a change
+        are not cached, as the directory mtime may not have ticked yet.
+        """
+        mtime = os.stat(self.root).st_mtime_ns
+        if self.partition_index is None or self.partition_index[0] != mtime:
+            hours = sorted(entry.name[len('hour='):] for entry in os.scandir(self.root)
+                           if entry.name.startswith('hour=') and entry.is_dir())
+            if time.time_ns() - mtime < 1e9:
+                return hours
+            self.partition_index = (mtime, hours)
+        return self.partition_index[1]
+
+    def _read_partition(self, hour, condition):
+        """
+        Rows of one hour partition matching a dataset filter, unordered
+
+        Returns:
+            table: pyarrow Table, None if nothing matches
+        """
+        import pyarrow.dataset as ds
+
+        partition = os.path.join(self.root, f"hour={hour}")
+        # Segments first: one compacted in between is then found as a Parquet part
+        segments = sorted(glob.glob(os.path.join(partition, '*.arrow')))
+        parts = sorted(glob.glob(os.path.join(partition, '*.parquet')))
+
+        tables = []
+        if parts:
+            tables.append(ds.dataset(parts, schema=TELEMETRY_SCHEMA, format='parquet').to_table(filter=condition))
+        for path in segments:
+            if path[:-len('.arrow')] + '.parquet' in parts:
+                continue
+            try:
+                table = read_segment(path)
+            except FileNotFoundError:
+                # Compacted while we were listing
+                table = ds.dataset(path[:-len('.arrow')] + '.parquet', schema=TELEMETRY_SCHEMA, format='parquet').to_table()
+            tables.append(ds.dataset(table).to_table(filter=condition))
+
+        tables = [table for table in tables if table.num_rows]
+        return pa.concat_tables(tables) if tables else None
+
+    def _scan(self, start, end, lane_id, intersection_id):
+        """
+        Matching rows hour partition by hour partition, in time order
+
+        Only the partitions between start and end are opened, found by bisecting
+        the partition index, and within them the Parquet row groups are skipped by
+        their statistics.
+
+        Yields:
+            table: pyarrow Table of one partition, sorted by ROW_ORDER
+        """
+        import pyarrow.dataset as ds
+
+        # Rows still in this store's buffer become visible through its live segment
+        with self.lock:
+            if not self.closed:
+                self.flush()
+
+        condition = None
+        for expression in [
+            ds.field('timestamp') >= pa.scalar(start, pa.timestamp('us')) if start else None,
+            ds.field('timestamp') <= pa.scalar(end, pa.timestamp('us')) if end else None,
+            ds.field('lane_id') == lane_id if lane_id is not None else None,
+            ds.field('intersection_id') == intersection_id if intersection_id is not None else None
+        ]:
+            if expression is not None:
+                condition = expression if condition is None else condition & expression
+
+        hours = self._partitions()
+        first = bisect.bisect_left(hours, hour_key(start)) if start else 0
+        last = bisect.bisect_right(hours, hour_key(end)) if end else len(hours)
+        for hour in hours[first:last]:
+            table = self._read_partition(hour, condition)
+            if table is not None:
+                yield table.sort_by(ROW_ORDER)
+
+    def read(self, start=None, end=None, lane_id=None, intersection_id=None, columns=None):
+        """
+        Read observations, only touching the partitions and row groups that can match
+
+        Args:
+            start: Earliest timestamp to return (datetime, ISO string or UNIX time)
+            end: Latest timestamp to return
+            lane_id: Only return this lane
+            intersection_id: Only return this intersection
+            columns: Columns to return, all by default
+
+        Returns:
+            table: pyarrow Table in time order
+        """
+        tables = list(self._scan(to_datetime(start), to_datetime(end), lane_id, intersection_id))
+        table = pa.concat_tables(tables) if tables else TELEMETRY_SCHEMA.empty_table()
+        return table.select(columns) if columns is not None else table
+
+    def read_page(self, start=None, end=None, lane_id=None, intersection_id=None, limit=1000, cursor=None,
+                  columns=None):
+        """
+        Read one page of observations in time order
+
+        Partitions are read in time order until the page is full, so the cost of a
+        page depends on the rows around it, not on the length of the history.
+
+        Args:
+            start, end, lane_id, intersection_id, columns: Filters, as for read
+            limit: Maximum number of rows in the page
+            cursor: next_cursor of the previous page, None for the first page
+
+        Returns:
+            table: pyarrow Table of at most limit rows
+            next_cursor: Opaque string to pass for the next page, None on the last page
+        """
+        start, end = to_datetime(start), to_datetime(end)
+        skip = 0
+        if cursor is not None:
+            # Rows before the cursor time are done, and so are the first rows at it
+            start, skip = decode_cursor(cursor)
+
+        tables, rows = [], 0
+        for table in self._scan(start, end, lane_id, intersection_id):
+            tables.append(table)
+            rows += table.num_rows
+            # One row more than needed tells whether there is a next page
+            if rows > skip + limit:
+                break
+        table = pa.concat_tables(tables) if tables else TELEMETRY_SCHEMA.empty_table()
+        has_more = table.num_rows > skip + limit
+        table = table.slice(0, skip + limit)
+
+        next_cursor = None
+        if has_more:
+            timestamps = table.column('timestamp')
+            last = timestamps[-1]
+            # Rows at the last timestamp already returned, over all pages ending there
+            next_cursor = encode_cursor(last.as_py(), pc.sum(pc.equal(timestamps, last)).as_py())
+
+        table = table.slice(skip)
+        return (table.select(columns) if columns is not None else table), next_cursor
+
+    def iter_batches(self, start=None, end=None, lane_id=None, intersection_id=None, batch_size=65536):
+        """
+        Stream observations in time order
+
+        Only one hour partition is held in memory at a time, so exports of any
+        length run in constant memory.
+
+        Args:
+            start, end, lane_id, intersection_id: Filters, as for read
+            batch_size: Maximum rows per record batch
+
+        Yields:
+            batch: pyarrow RecordBatch with the TELEMETRY_SCHEMA columns
+        """
+        for table in self._scan(to_datetime(start), to_datetime(end), lane_id, intersection_id):
+            yield from table.to_batches(max_chunksize=batch_size)
+
+    def aggregate(self, resolution, start=None, end=None, lane_id=None, intersection_id=None):
+        """
+        Bucketed lane statistics: mean, max and percentile vehicle counts, green share
+        and ambulance events
+
+        Resolutions with a rollup are read from it, so long ranges don't touch the raw
+        rows. Others are computed from the raw rows of the range.
+
+        Args:
+            resolution: Name in telemetry_rollups.RESOLUTIONS
+            start, end, lane_id, intersection_id: Filters, as for read
+
+        Returns:
+            table: pyarrow Table with the telemetry_rollups.AGGREGATE_SCHEMA columns, in bucket order
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}, use one of {', '.join(RESOLUTIONS)}")
+        start, end = to_datetime(start), to_datetime(end)
+        if self.rollups is not None and resolution in self.rollups.resolutions:
+            # Rows still in the buffer are added to the rollups by the flush
+            with self.lock:
+                if not self.closed:
+                    self.flush()
+            return self.rollups.query(resolution, start, end, lane_id, intersection_id)
+        return aggregate_table(self.read(start, end, lane_id, intersection_id), resolution)
+
+    def rebuild_rollups(self):
+        """Recompute the rollups from all stored rows, e.g. after importing old data files"""
+        if self.rollups is None:
+            return
+        with self.lock:
+            self.flush()
+            self.rollups.clear()
+            for batch in self.iter_batches():
+                self.rollups.update(batch)
+
+    def close(self):
+        """Flush the buffer, compact the live segments and stop accepting rows"""
+        with self.lock:
+            if self.closed:
+                return
+            self.flush(fsync=True)
+            for hour in list(self.segments):
+                self._compact(hour)
+            if self.rollups is not None:
+                self.rollups.close()
+            self.closed = True
+
+
+def read_segment(path):
+    """
+    Read a live or finished Arrow IPC segment
+
+    A writer may be in the middle of a batch, so reading stops at the last complete one.
+    """
+    batches = []
+    with open(path, 'rb') as f:
+        try:
+            reader = ipc.open_stream(f)
+        except (pa.ArrowInvalid, OSError):
+            return TELEMETRY_SCHEMA.empty_table()
+        while True:
+            try:
+                batches.append(reader.read_next_batch())
+            except StopIteration:
+                break
+            except (pa.ArrowInvalid, OSError):
+                break
+    return pa.Table.from_batches(batches, schema=TELEMETRY_SCHEMA)
+
+
+def import_csv(store, csv_path, intersection_id=0):
+    """
+    Load a traffic_data.csv written by the old CSV loggers into the store
+
+    The API (vehicle_count, signal_state, signal_duration) and the controller
+    (vehicles, signal, time_allocated) wrote the same columns in the same order
+    under different names, so columns are taken by position and a header row,
+    if any, is skipped.
+
+    Returns:
+        count: Number of rows imported
+    """
+    import csv
+
+    rows = []
+    with open(csv_path, newline='') as f:
+        for values in csv.reader(f):
+            if not values or values[0] == 'timestamp':
+                continue
+            timestamp, lane_id, vehicle_count, signal_state, signal_duration, has_ambulance = values[:6]
+            rows.append({
+                'timestamp': timestamp,
+                'intersection_id': intersection_id,
+                'lane_id': int(lane_id),
+                'vehicle_count': int(vehicle_count),
+                'signal_state': signal_state,
+                'signal_duration': float(signal_duration),
+                'has_ambulance': has_ambulance == 'True'
+            })
+    store.append_rows(rows)
+    store.flush(fsync=True)
+    return len(rows)
@@ -1,89 +1,547 @@
 import cv2
 import numpy as np
 import time
-import torch
-from ultralytics import YOLO
 import multiprocessing as mp
 from queue import Empty
 import os
 
+from inference_backends import create_backend
+
+class LazyAnnotation:
+    def __init__(self, detector, frame, boxes, ambulance_mask, annotate_in_place=False):
+        """
+        Annotated frame that is only drawn when a consumer asks for it
+        
+        Args:
+            detector: TrafficDetector that produced the detections
+            frame: Image frame the detections belong to
+            boxes: Integer (x1, y1, x2, y2) array of the vehicle boxes
+            ambulance_mask: Boolean array flagging the boxes taken as ambulances
+            annotate_in_place: Draw on frame itself instead of a copy
+        """
+        self.detector = detector
+        self.frame = frame
+        self.boxes = boxes
+        self.ambulance_mask = ambulance_mask
+        self.annotate_in_place = annotate_in_place
+        self.image = None
+        
+    def render(self):
+        """Draw the annotations on first call and return the annotated frame"""
+        if self.image is None:
+            self.image = self.detector._draw_annotations(self.frame, self.boxes, self.ambulance_mask,
+                                                         self.annotate_in_place)
+            self.frame = None
+        return self.image
+
+class MotionGate:
+    def __init__(self, threshold=0.002, pixel_threshold=12, refresh_interval=30, size=(64, 48)):
+        """
+        Cheap scene-change test in front of the model for one lane
+        
+        Each frame is shrunk to a small grayscale thumbnail and compared with the
+        thumbnail of the last frame the model actually ran on. Comparing with that
+        frame rather than the previous one means slow changes still add up.
+        Counting changed pixels instead of averaging the difference keeps a single
+        small vehicle from being diluted by a large static background.
+        
+        Args:
+            threshold: Share of thumbnail pixels that must change for the scene to count
+                as changed (the default is about 6 pixels of a 64x48 thumbnail)
+            pixel_threshold: Grey level difference (0-255) above which a thumbnail pixel
+                has changed, averaging makes it well above sensor noise
+            refresh_interval: Maximum number of consecutive frames that reuse a result
+            size: (width, height) of the thumbnails
+        """
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.refresh_interval = refresh_interval
+        self.size = tuple(size)
+        self.reference = None
+        self.since_refresh = 0
+        
+        # Hit-rate counters
+        self.frames = 0
+        self.reused = 0
+        
+    def _thumbnail(self, frame):
+        # Point-sample down to 4x the thumbnail first, area-averaging a full 1080p frame
+        # costs more than the rest of the gate; 16 samples per pixel still average out noise
+        width, height = self.size
+        if frame.shape[1] > 4 * width and frame.shape[0] > 4 * height:
+            frame = cv2.resize(frame, (4 * width, 4 * height), interpolation=cv2.INTER_NEAREST)
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        
+    def check(self, frame):
+        """
+        Decide whether the previous result still holds for a frame
+        
+        Args:
+            frame: Image frame (or lane ROI view) about to be processed
+            
+        Returns:
+            reuse: True if the scene has not changed and the last result can be reused,
+                False if the model has to run (the frame becomes the new reference)
+        """
+        self.frames += 1
+        thumbnail = self._thumbnail(frame)
+        
+        if (self.reference is not None and self.since_refresh < self.refresh_interval
+                and np.mean(cv2.absdiff(thumbnail, self.reference) > self.pixel_threshold) < self.threshold):
+            self.since_refresh += 1
+            self.reused += 1
+            return True
+        
+        self.reference = thumbnail
+        self.since_refresh = 0
+        return False
+        
+    def reset(self):
+        """Forget the reference frame, so the next frame always runs the model"""
+        self.reference = None
+        self.since_refresh = 0
+        
+    def get_stats(self):
+        """Frames seen, frames that reused a result, and the hit rate"""
+        return {
+            'frames': self.frames,
+            'reused': self.reused,
+            'hit_rate': self.reused / self.frames if self.frames else 0.0
+        }
+
 class TrafficDetector:
-    def __init__(self, model_path="yolov8n.pt", confidence=0.25):
+    def __init__(self, model_path="yolov8n.pt", confidence=0.25, lane_rois=None, imgsz=640, motion_gate=None,
+                 backend=None, backend_options=None):
         """
         Initialize the traffic detector with YOLO model
         
         Args:
             model_path: Path to the YOLO model weights
             confidence: Confidence threshold for detections
+            lane_rois: Dictionary mapping lane IDs to ROI polygons, see set_lane_roi
+            imgsz: Size the longest side of a full frame is scaled to for inference
+            motion_gate: MotionGate keyword arguments (threshold, refresh_interval, size)
+                to skip inference on static lanes, None to run the model on every frame
+            backend: Inference backend, 'ultralytics' (PyTorch) or 'onnx' (onnxruntime),
+                None to pick from the model file extension, see inference_backends
+            backend_options: Keyword arguments of the backend, e.g. {'intra_op_threads': 2}
         """
-        self.model = YOLO(model_path)
+        self.backend = create_backend(backend, model_path, **(backend_options or {}))
+        self.backend_name = backend
+        self.backend_options = backend_options
+        self.model_path = model_path
         self.confidence = confidence
+        self.imgsz = imgsz
         self.vehicle_classes = [2, 3, 5, 7]  # car, motorcycle, bus, truck
         self.ambulance_class = 7  # Assuming truck class is used for ambulance detection
         
-    def detect_vehicles(self, frame):
+        # Per-lane motion gates and the last model detections they fall back on
+        self.motion_gate = motion_gate
+        self.motion_gates = {}
+        self.lane_detections = {}
+        
+        # Per-lane approach regions, like the simulator's detection_zones
+        self.lane_rois = {}
+        self._roi_cache = {}
+        for lane_id, polygon in (lane_rois or {}).items():
+            self.set_lane_roi(lane_id, polygon)
+        
+        # Long-lived worker pool, see start_worker_pool
+        self.worker_pool = None
+        
+    def warm_up(self, shape=(480, 640, 3)):
+        """
+        Run one inference on a blank frame
+        
+        The backends set up their predictor and buffers on the first call, which
+        takes far longer than a regular inference; warming up moves that cost out
+        of the first real request.
+        
+        Args:
+            shape: Shape of the blank frame
+        """
+        self.backend.predict(np.zeros(shape, dtype=np.uint8), self.confidence, self.imgsz)
+        
+    def set_lane_roi(self, lane_id, polygon):
+        """
+        Restrict detection in a lane to a region of interest
+        
+        Frames of the lane are cropped to the polygon's bounding box and pixels
+        outside the polygon are blanked before inference, so only the approach
+        is counted and fewer pixels go through the model.
+        
+        Args:
+            lane_id: ID of the lane (1-4)
+            polygon: Sequence of (x, y) points in frame pixels, None to remove the ROI
+        """
+        self._roi_cache = {key: value for key, value in self._roi_cache.items() if key[0] != lane_id}
+        if lane_id in self.motion_gates:
+            self.motion_gates[lane_id].reset()
+        if polygon is None:
+            self.lane_rois.pop(lane_id, None)
+            return
+        
+        points = np.asarray(polygon, dtype=np.int32).reshape(-1, 2)
+        if len(points) < 3:
+            raise ValueError(f"ROI of lane {lane_id} needs at least 3 points")
+        self.lane_rois[lane_id] = points
+        
+    def _roi_region(self, lane_id, frame_shape):
+        """
+        Bounding box and polygon mask of a lane ROI for a frame size, cached
+        
+        Returns:
+            region: (x0, y0, x1, y1, mask) with mask True inside the polygon, or
+                None if the ROI lies outside the frame
+        """
+        key = (lane_id, frame_shape[:2])
+        if key not in self._roi_cache:
+            points = self.lane_rois[lane_id]
+            height, width = frame_shape[:2]
+            x, y, w, h = cv2.boundingRect(points)
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + w, width), min(y + h, height)
+        
+            region = None
+            if x1 > x0 and y1 > y0:
+                mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+                cv2.fillPoly(mask, [points - (x0, y0)], 1)
+                region = (x0, y0, x1, y1, mask.astype(bool))
+            self._roi_cache[key] = region
+        return self._roi_cache[key]
+        
+    def _crop_roi(self, frame, region):
+        """
+        Crop a frame to an ROI bounding box and blank the pixels outside the polygon
+        
+        Args:
+            frame: Full image frame
+            region: ROI region as returned by _roi_region
+        """
+        x0, y0, x1, y1, mask = region
+        crop = frame[y0:y1, x0:x1].copy()
+        crop[~mask] = 114  # Same grey as the letterbox padding
+        return crop
+    
+    def _roi_detections(self, detections, region):
+        """
+        Map detections on an ROI crop back to frame coordinates
+        
+        Boxes whose centre falls outside the polygon (vehicles only partly
+        inside the bounding box) are dropped.
+        
+        Args:
+            detections: Array of [x1, y1, x2, y2, confidence, class_id] rows in crop coordinates
+            region: ROI region the crop was taken from
+        """
+        x0, y0, x1, y1, mask = region
+        detections = np.asarray(detections, dtype=np.float64).reshape(-1, 6).copy()
+        
+        centre_x = ((detections[:, 0] + detections[:, 2]) / 2).astype(int).clip(0, mask.shape[1] - 1)
+        centre_y = ((detections[:, 1] + detections[:, 3]) / 2).astype(int).clip(0, mask.shape[0] - 1)
+        detections = detections[mask[centre_y, centre_x]]
+        
+        detections[:, [0, 2]] += x0
+        detections[:, [1, 3]] += y0
+        return detections
+        
+    def _inference_size(self, frame_shape, crop_shape):
+        """Model input size that keeps a crop at the scale of its full frame, stride aligned"""
+        scale = self.imgsz / max(frame_shape[:2])
+        return min(self.imgsz, max(32, -(-int(round(max(crop_shape[:2]) * scale)) // 32) * 32))
+        
+    def _gate(self, lane_id, frame, region):
+        """
+        Run a lane's motion gate on a frame
+        
+        Returns:
+            detections: Previous detections of the lane if they can be reused, else None
+        """
+        if self.motion_gate is None or lane_id is None:
+            return None
+        if lane_id not in self.motion_gates:
+            self.motion_gates[lane_id] = MotionGate(**self.motion_gate)
+        gate = self.motion_gates[lane_id]
+        
+        # Only changes inside the ROI matter
+        if region is not None:
+            x0, y0, x1, y1, _ = region
+            frame = frame[y0:y1, x0:x1]
+        if gate.check(frame) and lane_id in self.lane_detections:
+            return self.lane_detections[lane_id]
+        return None
+        
+    def get_motion_stats(self):
+        """
+        Hit rate of the motion gates
+        
+        Returns:
+            stats: Dictionary with frames, reused and hit_rate per lane ID and under 'total'
+        """
+        stats = {lane_id: gate.get_stats() for lane_id, gate in self.motion_gates.items()}
+        frames = sum(lane['frames'] for lane in stats.values())
+        reused = sum(lane['reused'] for lane in stats.values())
+        stats['total'] = {'frames': frames, 'reused': reused, 'hit_rate': reused / frames if frames else 0.0}
+        return stats
+        
+    def _detect(self, frame, lane_id=None):
+        """
+        Run the model on a frame, with the lane ROI and motion gate applied
+        
+        Returns:
+            detections: Array of [x1, y1, x2, y2, confidence, class_id] rows in frame coordinates
+        """
+        crop, region = frame, None
+        if lane_id in self.lane_rois:
+            region = self._roi_region(lane_id, frame.shape)
+            if region is None:
+                # ROI entirely outside the frame, nothing to detect
+                return np.empty((0, 6))
+        
+        # Static scene: keep the previous boxes
+        detections = self._gate(lane_id, frame, region)
+        if detections is not None:
+            return detections
+        
+        if region is not None:
+            crop = self._crop_roi(frame, region)
+        
+        # A crop is run at the pixel density of the full frame, not scaled up to imgsz
+        imgsz = self._inference_size(frame.shape, crop.shape)
+        detections = self.backend.predict(crop, self.confidence, imgsz)
+        if region is not None:
+            detections = self._roi_detections(detections, region)
+        if self.motion_gate is not None and lane_id is not None:
+            self.lane_detections[lane_id] = detections
+        
+        return detections
+        
+    def detect_boxes(self, frame, lane_id=None):
+        """
+        Detect vehicles in a frame and return their boxes, e.g. for a tracker
+        
+        Args:
+            frame: Image frame to detect vehicles in
+            lane_id: Lane the frame comes from, its ROI and motion gate are applied if set
+            
+        Returns:
+            boxes: Integer (x1, y1, x2, y2) array of the vehicle boxes
+            ambulance_mask: Boolean array flagging the boxes taken as ambulances
+        """
+        return self._filter_detections(self._detect(frame, lane_id))
+        
+    def detect_vehicles(self, frame, annotate=True, annotate_in_place=False, lane_id=None):
         """
         Detect vehicles in a frame
         
         Args:
             frame: Image frame to detect vehicles in
+            annotate: True to draw the annotations now, 'lazy' to return a LazyAnnotation
+                that draws them on first render(), False for counts only (no copy, no drawing)
+            annotate_in_place: Draw the annotations on frame itself instead of a copy
+            lane_id: Lane the frame comes from, its ROI and motion gate are applied if set
             
         Returns:
             vehicles_count: Number of vehicles detected
             has_ambulance: Boolean indicating if an ambulance is detected
-            processed_frame: Frame with detection annotations
+            processed_frame: Frame with detection annotations, a LazyAnnotation, or None
         """
-        results = self.model(frame, conf=self.confidence)[0]
+        return self._process_detections(frame, self._detect(frame, lane_id), annotate, annotate_in_place)
+    
+    def _filter_detections(self, detections):
+        """
+        Select vehicles among raw model detections
+        
+        Args:
+            detections: Array of [x1, y1, x2, y2, confidence, class_id] rows in frame coordinates
+            
+        Returns:
+            boxes: Integer (x1, y1, x2, y2) array of the vehicle boxes
+            ambulance_mask: Boolean array flagging the boxes taken as ambulances
+        """
+        detections = np.asarray(detections, dtype=np.float64).reshape(-1, 6)
+        class_ids = detections[:, 5].astype(int)
+        
+        # Check if detected objects are vehicles
+        vehicle_mask = np.isin(class_ids, self.vehicle_classes)
+        boxes = detections[vehicle_mask, :4].astype(int)
+        class_ids = class_ids[vehicle_mask]
         
-        # Initialize counts
-        vehicles_count = 0
-        has_ambulance = False
+        # Check if they might be an ambulance (using custom logic)
+        # In a real system, this would use a specialized model or additional sensors
+        # For now, we'll use a placeholder based on size and class
+        vehicle_area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        ambulance_mask = (class_ids == self.ambulance_class) & (vehicle_area > 15000)
         
-        # Process detections
-        processed_frame = frame.copy()
+        return boxes, ambulance_mask
+    
+    def _draw_annotations(self, frame, boxes, ambulance_mask, annotate_in_place=False, labels=None):
+        """
+        Draw vehicle boxes and the vehicle count on a frame
         
-        for detection in results.boxes.data.tolist():
-            x1, y1, x2, y2, confidence, class_id = detection
+        Args:
+            frame: Image frame to annotate
+            boxes: Integer (x1, y1, x2, y2) array of the vehicle boxes
+            ambulance_mask: Boolean array flagging the boxes taken as ambulances
+            annotate_in_place: Draw on frame itself instead of a copy
+            labels: Text drawn above each box, defaults to "Vehicle <n>"
             
-            # Convert to integers
-            x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-            class_id = int(class_id)
+        Returns:
+            processed_frame: Frame with detection annotations
+        """
+        processed_frame = frame if annotate_in_place else frame.copy()
+        
+        if labels is None:
+            labels = [f"Vehicle {i}" for i in range(1, len(boxes) + 1)]
+        
+        for (x1, y1, x2, y2), is_ambulance, label in zip(boxes.tolist(), ambulance_mask.tolist(), labels):
+            # Green for regular vehicles, red for ambulance
+            color = (0, 0, 255) if is_ambulance else (0, 255, 0)
             
-            # Check if detected object is a vehicle
-            if class_id in self.vehicle_classes:
-                vehicles_count += 1
-                
-                # Check if it might be an ambulance (using custom logic)
-                # In a real system, this would use a specialized model or additional sensors
-                # For now, we'll use a placeholder based on size and class
-                vehicle_width = x2 - x1
-                vehicle_height = y2 - y1
-                vehicle_area = vehicle_width * vehicle_height
-                
-                # Draw bounding box
-                color = (0, 255, 0)  # Green for regular vehicles
-                
-                # This is a simplified ambulance detection 
-                # In reality, you would need a more sophisticated approach
-                # You mentioned using sound sensors, which would be ideal
-                if class_id == self.ambulance_class and vehicle_area > 15000:
-                    has_ambulance = True
-                    color = (0, 0, 255)  # Red for ambulance
-                
-                cv2.rectangle(processed_frame, (x1, y1), (x2, y2), color, 2)
-                cv2.putText(processed_frame, f"Vehicle {vehicles_count}", (x1, y1 - 10),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+            cv2.rectangle(processed_frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(processed_frame, label, (x1, y1 - 10),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
                 
         # Add count to the frame
-        cv2.putText(processed_frame, f"Vehicles: {vehicles_count}", (10, 30),
+        cv2.putText(processed_frame, f"Vehicles: {len(boxes)}", (10, 30),
                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
         
-        if has_ambulance:
+        if ambulance_mask.any():
             cv2.putText(processed_frame, "AMBULANCE DETECTED! - Green light required immediately", (10, 70),
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
             
+        return processed_frame
+    
+    def _process_detections(self, frame, detections, annotate=True, annotate_in_place=False):
+        """
+        Count vehicles and annotate the frame from raw model detections
+        
+        Args:
+            frame: Image frame the detections belong to
+            detections: Array of [x1, y1, x2, y2, confidence, class_id] rows in frame coordinates
+            annotate: True, 'lazy' or False, as in detect_vehicles
+            annotate_in_place: Draw the annotations on frame itself instead of a copy
+            
+        Returns:
+            vehicles_count: Number of vehicles detected
+            has_ambulance: Boolean indicating if an ambulance is detected
+            processed_frame: Frame with detection annotations, a LazyAnnotation, or None
+        """
+        boxes, ambulance_mask = self._filter_detections(detections)
+        vehicles_count = len(boxes)
+        
+        # This is a simplified ambulance detection 
+        # In reality, you would need a more sophisticated approach
+        # You mentioned using sound sensors, which would be ideal
+        has_ambulance = bool(ambulance_mask.any())
+        
+        if annotate == 'lazy':
+            processed_frame = LazyAnnotation(self, frame, boxes, ambulance_mask, annotate_in_place)
+        elif annotate:
+            processed_frame = self._draw_annotations(frame, boxes, ambulance_mask, annotate_in_place)
+        else:
+            processed_frame = None
+            
         return vehicles_count, has_ambulance, processed_frame
 
+    def _letterbox(self, frame, scale, canvas_shape):
+        """
+        Resize a frame by scale and pad it to the centre of a canvas
+        
+        Returns:
+            canvas: Letterboxed frame
+            pad: (x, y) offset of the resized frame inside the canvas
+        """
+        height, width = frame.shape[:2]
+        new_width, new_height = int(round(width * scale)), int(round(height * scale))
+        pad_x, pad_y = (canvas_shape[1] - new_width) // 2, (canvas_shape[0] - new_height) // 2
+        
+        canvas = np.full((canvas_shape[0], canvas_shape[1], 3), 114, dtype=np.uint8)
+        canvas[pad_y:pad_y + new_height, pad_x:pad_x + new_width] = cv2.resize(
+            frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        return canvas, (pad_x, pad_y)
+    
+    def detect_batch(self, frames, imgsz=None, annotate=True):
+        """
+        Detect vehicles in several lanes with a single batched inference
+        
+        Args:
+            frames: Dictionary of frames, with lane IDs as keys
+            imgsz: Size the longest side of every full frame is scaled to, defaults to
+                self.imgsz. Lanes with an ROI only send their crop at that same scale
+            annotate: True, 'lazy' or False, as in detect_vehicles
+            
+        Returns:
+            results: Dictionary of results, with lane IDs as keys, in the
+                same format as process_all_lanes
+        """
+        imgsz = imgsz or self.imgsz
+        
+        # Crop lanes with an ROI, lanes whose ROI misses the frame have nothing to detect
+        # and static lanes reuse their previous detections
+        inputs, regions, lane_detections = {}, {}, {}
+        for lane_id, frame in frames.items():
+            inputs[lane_id], regions[lane_id] = frame, None
+            if lane_id in self.lane_rois:
+                regions[lane_id] = self._roi_region(lane_id, frame.shape)
+                if regions[lane_id] is None:
+                    lane_detections[lane_id] = np.empty((0, 6))
+                    continue
+            detections = self._gate(lane_id, frame, regions[lane_id])
+            if detections is not None:
+                lane_detections[lane_id] = detections
+            elif regions[lane_id] is not None:
+                inputs[lane_id] = self._crop_roi(frame, regions[lane_id])
+        lane_ids = [lane_id for lane_id in frames if lane_id not in lane_detections]
+        
+        # Scale every frame's longest side to imgsz, then pad to the smallest canvas that
+        # holds them all and is a multiple of the model stride (32). Lanes with the same
+        # aspect ratio thus get a rectangular batch instead of a mostly padded square.
+        # Crops keep the scale of their full frame, so small ROIs shrink the canvas.
+        scales = [imgsz / max(frames[lane_id].shape[:2]) for lane_id in lane_ids]
+        canvas_height = max([round(inputs[lane_id].shape[0] * scale) for lane_id, scale in zip(lane_ids, scales)], default=32)
+        canvas_width = max([round(inputs[lane_id].shape[1] * scale) for lane_id, scale in zip(lane_ids, scales)], default=32)
+        canvas_shape = (-(-canvas_height // 32) * 32, -(-canvas_width // 32) * 32)
+        
+        batch = np.empty((len(lane_ids), canvas_shape[0], canvas_shape[1], 3), dtype=np.uint8)
+        transforms = []
+        for i, (lane_id, scale) in enumerate(zip(lane_ids, scales)):
+            batch[i], pad = self._letterbox(inputs[lane_id], scale, canvas_shape)
+            transforms.append((scale, pad))
+        
+        batch_results = []
+        if lane_ids:
+            batch_results = self.backend.predict_batch(batch, self.confidence)
+        
+        for lane_id, detections, (scale, (pad_x, pad_y)) in zip(lane_ids, batch_results, transforms):
+            detections = detections.copy()
+            
+            # Map boxes from the letterboxed input back to the input, then out of the ROI crop
+            detections[:, [0, 2]] = ((detections[:, [0, 2]] - pad_x) / scale).clip(0, inputs[lane_id].shape[1])
+            detections[:, [1, 3]] = ((detections[:, [1, 3]] - pad_y) / scale).clip(0, inputs[lane_id].shape[0])
+            
+            # Boxes lying entirely in the padding around a small input collapse to nothing
+            detections = detections[(detections[:, 2] > detections[:, 0]) & (detections[:, 3] > detections[:, 1])]
+            if regions[lane_id] is not None:
+                detections = self._roi_detections(detections, regions[lane_id])
+            lane_detections[lane_id] = detections
+            if self.motion_gate is not None:
+                self.lane_detections[lane_id] = detections
+        
+        results = {}
+        for lane_id, frame in frames.items():
+            vehicles_count, has_ambulance, processed_frame = self._process_detections(frame, lane_detections[lane_id], annotate)
+            results[lane_id] = {
+                'lane_id': lane_id,
+                'vehicles_count': vehicles_count,
+                'has_ambulance': has_ambulance,
+                'processed_frame': processed_frame,
+                'timestamp': time.time()
+            }
+        
+        return results
+
     def process_lane(self, frame, lane_id, results_queue):
         """
         Process a single lane
@@ -93,7 +551,7 @@ class TrafficDetector:
             lane_id: ID of the lane (1-4)
             results_queue: Queue to put results in
         """
-        vehicles_count, has_ambulance, processed_frame = self.detect_vehicles(frame)
+        vehicles_count, has_ambulance, processed_frame = self.detect_vehicles(frame, lane_id=lane_id)
         
         # Add results to the queue
         results_queue.put({
@@ -104,16 +562,48 @@ class TrafficDetector:
             'timestamp': time.time()
         })
         
-    def process_all_lanes(self, frames):
+    def start_worker_pool(self, num_workers=4, **kwargs):
+        """
+        Start persistent inference workers used by process_all_lanes
+        
+        Args:
+            num_workers: Number of worker processes, each loads the model once
+            **kwargs: Further InferencePool options (num_slots, max_frame_shape, ...)
+        """
+        from inference_pool import InferencePool
+        
+        self.stop_worker_pool()
+        self.worker_pool = InferencePool(self.model_path, self.confidence, num_workers,
+                                         lane_rois=self.lane_rois, motion_gate=self.motion_gate,
+                                         backend=self.backend_name, backend_options=self.backend_options, **kwargs)
+        
+    def stop_worker_pool(self):
+        """Stop the persistent inference workers, if running"""
+        if self.worker_pool is not None:
+            self.worker_pool.close()
+            self.worker_pool = None
+        
+    def process_all_lanes(self, frames, batched=False):
         """
         Process all lanes in parallel
         
+        Uses the persistent worker pool when one has been started. Otherwise
+        runs one batched inference in this process when batched is set, or
+        spawns one process per lane for this call.
+        
         Args:
             frames: Dictionary of frames, with lane IDs as keys
+            batched: Run all lanes through detect_batch instead of separate processes
             
         Returns:
             results: Dictionary of results, with lane IDs as keys
         """
+        if self.worker_pool is not None:
+            return self.worker_pool.process_all_lanes(frames)
+        
+        if batched:
+            return self.detect_batch(frames)
+        
         # Create a multiprocessing manager and queue
         manager = mp.Manager()
         results_queue = manager.Queue()
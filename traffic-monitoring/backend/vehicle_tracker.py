@@ -0,0 +1,309 @@
+import time
+
+import cv2
+import numpy as np
+
+# Constant velocity model on the box state [cx, cy, area, aspect ratio, vx, vy, v_area]
+STATE_SIZE = 7
+TRANSITION = np.eye(STATE_SIZE)
+TRANSITION[0, 4] = TRANSITION[1, 5] = TRANSITION[2, 6] = 1
+MEASUREMENT = np.eye(4, STATE_SIZE)
+
+# Noise levels as tuned for SORT
+MEASUREMENT_NOISE = np.diag([1.0, 1.0, 10.0, 10.0])
+PROCESS_NOISE = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001])
+INITIAL_COVARIANCE = np.diag([10.0, 10.0, 10.0, 10.0, 10000.0, 10000.0, 10000.0])
+
+
+def boxes_to_measurements(boxes):
+    """Convert (x1, y1, x2, y2) boxes to [cx, cy, area, aspect ratio] measurements"""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    widths = boxes[:, 2] - boxes[:, 0]
+    heights = np.maximum(boxes[:, 3] - boxes[:, 1], 1e-6)
+    return np.stack([boxes[:, 0] + widths / 2, boxes[:, 1] + heights / 2, widths * heights, widths / heights], axis=1)
+
+
+def states_to_boxes(states):
+    """Convert Kalman states back to (x1, y1, x2, y2) boxes"""
+    areas = np.maximum(states[:, 2], 0)
+    widths = np.sqrt(areas * np.maximum(states[:, 3], 0))
+    heights = np.divide(areas, widths, out=np.zeros_like(areas), where=widths > 0)
+    return np.stack([states[:, 0] - widths / 2, states[:, 1] - heights / 2,
+                     states[:, 0] + widths / 2, states[:, 1] + heights / 2], axis=1)
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Intersection over union of every box in boxes_a with every box in boxes_b"""
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = width * height
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def greedy_match(iou, iou_threshold):
+    """
+    Pair rows and columns of an IoU matrix, best overlaps first
+
+    Returns:
+        matches: List of (row, column) pairs with IoU of at least iou_threshold
+    """
+    if iou.size == 0:
+        return []
+    rows, cols = np.nonzero(iou >= iou_threshold)
+    order = np.argsort(-iou[rows, cols], kind='stable')
+
+    matches = []
+    used_rows, used_cols = set(), set()
+    for row, col in zip(rows[order].tolist(), cols[order].tolist()):
+        if row not in used_rows and col not in used_cols:
+            matches.append((row, col))
+            used_rows.add(row)
+            used_cols.add(col)
+    return matches
+
+
+class VehicleTracker:
+    def __init__(self, iou_threshold=0.3, min_hits=2, max_misses=3, queue_speed=1.0, ambulance_min_hits=2):
+        """
+        Initialize a SORT-style tracker for the vehicles of one lane
+
+        Every track is a Kalman filter on its box, and all tracks are predicted
+        and updated together as arrays. Detections are matched to the predicted
+        boxes by IoU. Between detections, predict() alone moves the boxes along.
+
+        Args:
+            iou_threshold: Minimum IoU between a detection and a predicted box to match them
+            min_hits: Matched detections before a track is counted as a vehicle
+            max_misses: Consecutive detection rounds a track survives without a match
+            queue_speed: Speed in pixels per frame below which a vehicle counts as queued
+            ambulance_min_hits: Ambulance detections after which a track stays an ambulance
+        """
+        self.iou_threshold = iou_threshold
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+        self.queue_speed = queue_speed
+        self.ambulance_min_hits = ambulance_min_hits
+
+        self.states = np.empty((0, STATE_SIZE))
+        self.covariances = np.empty((0, STATE_SIZE, STATE_SIZE))
+        self.ids = np.empty(0, dtype=np.int64)
+        self.hits = np.empty(0, dtype=np.int64)
+        self.misses = np.empty(0, dtype=np.int64)
+        self.ambulance_hits = np.empty(0, dtype=np.int64)
+        self.next_id = 1
+        self.rounds = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def predict(self):
+        """Advance every track by one frame"""
+        if not len(self):
+            return
+        # Keep the predicted area from going negative
+        shrinking = self.states[:, 2] + self.states[:, 6] <= 0
+        self.states[shrinking, 6] = 0
+
+        self.states = self.states @ TRANSITION.T
+        self.covariances = TRANSITION @ self.covariances @ TRANSITION.T + PROCESS_NOISE
+
+    def update(self, boxes, ambulance_mask=None):
+        """
+        Correct the tracks with a new set of detections
+
+        Call predict() first for the frame the detections come from.
+
+        Args:
+            boxes: (x1, y1, x2, y2) array of the detected vehicle boxes
+            ambulance_mask: Boolean array flagging the boxes taken as ambulances
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        ambulance_mask = np.zeros(len(boxes), dtype=bool) if ambulance_mask is None else np.asarray(ambulance_mask, dtype=bool)
+        self.rounds += 1
+
+        matches = greedy_match(iou_matrix(boxes, states_to_boxes(self.states)), self.iou_threshold)
+        matched_boxes = np.array([row for row, _ in matches], dtype=np.int64)
+        matched_tracks = np.array([col for _, col in matches], dtype=np.int64)
+
+        # Kalman correction of the matched tracks, all at once
+        self.misses += 1
+        if len(matches):
+            measurements = boxes_to_measurements(boxes[matched_boxes])
+            covariances = self.covariances[matched_tracks]
+            innovation = measurements - self.states[matched_tracks] @ MEASUREMENT.T
+            innovation_covariance = MEASUREMENT @ covariances @ MEASUREMENT.T + MEASUREMENT_NOISE
+            gain = covariances @ MEASUREMENT.T @ np.linalg.inv(innovation_covariance)
+            self.states[matched_tracks] += np.einsum('nij,nj->ni', gain, innovation)
+            self.covariances[matched_tracks] = (np.eye(STATE_SIZE) - gain @ MEASUREMENT) @ covariances
+
+            self.hits[matched_tracks] += 1
+            self.misses[matched_tracks] = 0
+            self.ambulance_hits[matched_tracks] += ambulance_mask[matched_boxes]
+
+        # Drop tracks that have gone unmatched for too long
+        keep = self.misses <= self.max_misses
+        self._select(keep)
+
+        # New tracks for the unmatched detections
+        new = np.ones(len(boxes), dtype=bool)
+        new[matched_boxes] = False
+        self._add(boxes[new], ambulance_mask[new])
+
+    def _select(self, keep):
+        self.states = self.states[keep]
+        self.covariances = self.covariances[keep]
+        self.ids = self.ids[keep]
+        self.hits = self.hits[keep]
+        self.misses = self.misses[keep]
+        self.ambulance_hits = self.ambulance_hits[keep]
+
+    def _add(self, boxes, ambulance_mask):
+        count = len(boxes)
+        if not count:
+            return
+        states = np.zeros((count, STATE_SIZE))
+        states[:, :4] = boxes_to_measurements(boxes)
+
+        self.states = np.concatenate([self.states, states])
+        self.covariances = np.concatenate([self.covariances, np.repeat(INITIAL_COVARIANCE[None], count, axis=0)])
+        self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + count)])
+        self.hits = np.concatenate([self.hits, np.ones(count, dtype=np.int64)])
+        self.misses = np.concatenate([self.misses, np.zeros(count, dtype=np.int64)])
+        self.ambulance_hits = np.concatenate([self.ambulance_hits, ambulance_mask.astype(np.int64)])
+        self.next_id += count
+
+    def confirmed(self):
+        """Boolean mask of the tracks counted as vehicles"""
+        # Until min_hits rounds have run, new tracks are trusted straight away
+        return (self.hits >= self.min_hits) | (self.rounds <= self.min_hits)
+
+    def get_tracks(self):
+        """
+        Get the confirmed tracks
+
+        Returns:
+            tracks: Dictionary of arrays: ids, boxes (x1, y1, x2, y2), speeds in pixels
+                per frame, queued and ambulance flags
+        """
+        confirmed = self.confirmed()
+        states = self.states[confirmed]
+        speeds = np.hypot(states[:, 4], states[:, 5])
+        return {
+            'ids': self.ids[confirmed],
+            'boxes': states_to_boxes(states),
+            'speeds': speeds,
+            'queued': speeds < self.queue_speed,
+            # Sticky: once seen often enough, a track stays an ambulance for its whole life
+            'ambulance': self.ambulance_hits[confirmed] >= self.ambulance_min_hits
+        }
+
+
+class TrackingDetector:
+    def __init__(self, detector, detect_every=3, **tracker_kwargs):
+        """
+        Initialize per-lane vehicle tracking on top of a TrafficDetector
+
+        The model only runs on every detect_every-th frame of a lane. On the
+        frames in between, the lane's tracker moves the last known boxes along,
+        so counts stay steady without running inference on every frame.
+
+        Args:
+            detector: TrafficDetector used for detection (its ROIs and motion gate apply)
+            detect_every: Run detection once every this many frames per lane
+            **tracker_kwargs: VehicleTracker options (iou_threshold, min_hits, ...)
+        """
+        self.detector = detector
+        self.detect_every = max(1, detect_every)
+        self.tracker_kwargs = tracker_kwargs
+        self.trackers = {}
+        self.frame_counts = {}
+
+    def reset(self, lane_id=None):
+        """Forget the tracks of one lane, or of every lane"""
+        for lane in ([lane_id] if lane_id is not None else list(self.trackers)):
+            self.trackers.pop(lane, None)
+            self.frame_counts.pop(lane, None)
+
+    def process_lane(self, frame, lane_id, annotate=True):
+        """
+        Track the vehicles of one lane through a new frame
+
+        Args:
+            frame: Image frame for the lane
+            lane_id: ID of the lane (1-4)
+            annotate: Draw the tracked boxes, their IDs and the queue length
+
+        Returns:
+            result: Dictionary with lane_id, vehicles_count, queue_length, has_ambulance,
+                tracks, detected (whether the model ran), processed_frame and timestamp
+        """
+        if lane_id not in self.trackers:
+            self.trackers[lane_id] = VehicleTracker(**self.tracker_kwargs)
+            self.frame_counts[lane_id] = 0
+        tracker = self.trackers[lane_id]
+
+        tracker.predict()
+        detected = self.frame_counts[lane_id] % self.detect_every == 0
+        if detected:
+            boxes, ambulance_mask = self.detector.detect_boxes(frame, lane_id)
+            tracker.update(boxes, ambulance_mask)
+        self.frame_counts[lane_id] += 1
+
+        tracks = tracker.get_tracks()
+        processed_frame = None
+        if annotate:
+            processed_frame = self.detector._draw_annotations(
+                frame, tracks['boxes'].astype(int), tracks['ambulance'],
+                labels=[f"Vehicle {track_id}" for track_id in tracks['ids'].tolist()])
+            cv2.putText(processed_frame, f"Queue: {int(tracks['queued'].sum())}", (10, 110),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+
+        return {
+            'lane_id': lane_id,
+            'vehicles_count': len(tracks['ids']),
+            'queue_length': int(tracks['queued'].sum()),
+            'has_ambulance': bool(tracks['ambulance'].any()),
+            'tracks': tracks,
+            'detected': detected,
+            'processed_frame': processed_frame,
+            'timestamp': time.time()
+        }
+
+    def process_all_lanes(self, frames, annotate=True):
+        """
+        Track every lane through its new frame
+
+        Args:
+            frames: Dictionary of frames, with lane IDs as keys
+
+        Returns:
+            results: Dictionary of results, with lane IDs as keys
+        """
+        return {lane_id: self.process_lane(frame, lane_id, annotate) for lane_id, frame in frames.items()}
+
+
+if __name__ == "__main__":
+    from traffic_detection import TrafficDetector
+
+    # Track the test video, running the model on every third frame only
+    tracking = TrackingDetector(TrafficDetector(), detect_every=3)
+    cap = cv2.VideoCapture("../data/test_video.mp4")
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        result = tracking.process_lane(frame, 1)
+        print(f"Vehicles: {result['vehicles_count']}, queued: {result['queue_length']}, "
+              f"ambulance: {result['has_ambulance']}, detected: {result['detected']}")
+        cv2.imshow("Tracking", result['processed_frame'])
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+    cap.release()
+    cv2.destroyAllWindows()
@@ -1,36 +1,295 @@
 from ultralytics import YOLO
 import cv2
+import numpy as np
+import queue
+import threading
+import time
+from collections import deque
 
-# Load the YOLO model
-model = YOLO("yolov8n.pt")
+# Frame dropping policies when a stage falls behind
+DROP_OLDEST = 'drop_oldest'    # Replace the oldest queued frame with the new one
+DROP_NEWEST = 'drop_newest'    # Discard the new frame, keep what is queued
+EVERY_NTH = 'every_nth'        # Only read every Nth frame and block when the queue is full
 
-# Load video
-video_path = "../data/test_video.mp4"
-cap = cv2.VideoCapture(video_path)
+VEHICLE_CLASSES = [2, 3, 5, 7]  # car, motorcycle, bus, truck
 
-# Output video settings
-fourcc = cv2.VideoWriter_fourcc(*'XVID')
-out = cv2.VideoWriter('../data/output_video.avi', fourcc, 20.0, (640, 480))
 
-while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
-        break  # Exit if video ends
+class StageMetrics:
+    def __init__(self, window=500):
+        """
+        Rolling latency statistics for one pipeline stage
 
-    # Run YOLO on the frame
-    results = model(frame)
+        Args:
+            window: Number of most recent samples kept
+        """
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
 
-    # Draw results
-    frame = results[0].plot()
+    def add(self, latency_ms):
+        with self.lock:
+            self.samples.append(latency_ms)
 
-    # Show frame
-    cv2.imshow("YOLO Detection", frame)
-    out.write(frame)
+    def summary(self):
+        """Count, mean, p50, p95 and max of the recent samples in milliseconds"""
+        with self.lock:
+            samples = np.array(self.samples)
+        if len(samples) == 0:
+            return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+        return {
+            'count': len(samples),
+            'mean': float(samples.mean()),
+            'p50': float(np.percentile(samples, 50)),
+            'p95': float(np.percentile(samples, 95)),
+            'max': float(samples.max())
+        }
 
-    # Press 'q' to quit
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
 
-cap.release()
-out.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+class StreamingPipeline:
+    def __init__(self, model, source, output_path=None, show=True, policy=DROP_OLDEST, every_nth=1,
+                 queue_size=2, max_staleness_ms=500, realtime=False, on_counts=None):
+        """
+        Initialize a pipelined video detection stream
+
+        Decode and inference run in their own threads, output runs in the calling
+        thread. Stages are connected by bounded queues, so a slow model drops frames
+        according to policy instead of building up latency.
+
+        Args:
+            model: YOLO model instance
+            source: cv2.VideoCapture source (device index, file or stream URL)
+            output_path: Path of an output video to write, None to skip writing
+            show: Show annotated frames in a window
+            policy: DROP_OLDEST, DROP_NEWEST or EVERY_NTH
+            every_nth: With EVERY_NTH, process one frame out of every_nth
+            queue_size: Capacity of each queue between stages
+            max_staleness_ms: Frames older than this when inference starts or ends are dropped
+            realtime: Pace decoding at the source frame rate (for video files)
+            on_counts: Callback receiving (vehicles_count, age_ms) for every fresh result,
+                e.g. to feed TrafficSignalController.update_lane_state
+        """
+        if policy not in (DROP_OLDEST, DROP_NEWEST, EVERY_NTH):
+            raise ValueError(f"Unknown frame policy: {policy}")
+
+        self.model = model
+        self.source = source
+        self.output_path = output_path
+        self.show = show
+        self.policy = policy
+        self.every_nth = max(1, every_nth)
+        self.max_staleness_ms = max_staleness_ms
+        self.realtime = realtime
+        self.on_counts = on_counts
+
+        self.decode_queue = queue.Queue(maxsize=queue_size)
+        self.output_queue = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+
+        self.metrics = {stage: StageMetrics() for stage in ('decode', 'queue_wait', 'inference', 'output', 'end_to_end')}
+        self.counters = {'read': 0, 'skipped': 0, 'dropped': 0, 'stale': 0, 'processed': 0}
+        self.counters_lock = threading.Lock()
+
+    def _count(self, name):
+        with self.counters_lock:
+            self.counters[name] += 1
+
+    def _put(self, q, item):
+        """Put an item on a bounded queue according to the drop policy"""
+        if self.policy == EVERY_NTH:
+            # Backpressure: wait for room, but keep checking for stop
+            while not self.stop_event.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+            return
+
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+
+        if self.policy == DROP_NEWEST:
+            self._count('dropped')
+            return
+
+        # DROP_OLDEST: make room by discarding the head of the queue
+        try:
+            q.get_nowait()
+            self._count('dropped')
+        except queue.Empty:
+            pass
+        try:
+            q.put_nowait(item)
+        except queue.Full:
+            self._count('dropped')
+
+    def _put_end(self, q):
+        """Signal the end of the stream to the next stage"""
+        while not self.stop_event.is_set():
+            try:
+                q.put(None, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _decode_loop(self, cap):
+        """Decode stage: read frames from the source"""
+        frame_interval = 0
+        if self.realtime:
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            frame_interval = 1 / fps if fps > 0 else 0
+
+        frame_index = 0
+        next_frame_time = time.perf_counter()
+        while not self.stop_event.is_set() and cap.isOpened():
+            if self.realtime and frame_interval:
+                delay = next_frame_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_frame_time += frame_interval
+
+            # Frames we are not going to process are grabbed but never decoded
+            if self.policy == EVERY_NTH and frame_index % self.every_nth:
+                frame_index += 1
+                self._count('skipped')
+                if not cap.grab():
+                    break
+                continue
+
+            start = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                break  # Exit if video ends
+            captured = time.perf_counter()
+            self.metrics['decode'].add((captured - start) * 1000)
+            self._count('read')
+
+            self._put(self.decode_queue, (frame_index, captured, frame))
+            frame_index += 1
+
+        self._put_end(self.decode_queue)
+
+    def _age_ms(self, captured):
+        return (time.perf_counter() - captured) * 1000
+
+    def _inference_loop(self):
+        """Inference stage: run the model on the freshest frames"""
+        while True:
+            item = self.decode_queue.get()
+            if item is None:
+                break
+            frame_index, captured, frame = item
+
+            # Frames that waited too long are no longer worth the inference time
+            wait_ms = self._age_ms(captured)
+            self.metrics['queue_wait'].add(wait_ms)
+            if wait_ms > self.max_staleness_ms:
+                self._count('stale')
+                continue
+
+            start = time.perf_counter()
+            results = self.model(frame, verbose=False)
+            self.metrics['inference'].add((time.perf_counter() - start) * 1000)
+
+            age_ms = self._age_ms(captured)
+            if age_ms > self.max_staleness_ms:
+                self._count('stale')
+                continue
+
+            classes = results[0].boxes.cls.cpu().numpy().astype(int)
+            vehicles_count = int(np.isin(classes, VEHICLE_CLASSES).sum())
+            if self.on_counts is not None:
+                self.on_counts(vehicles_count, age_ms)
+            self._count('processed')
+
+            if self.show or self.output_path:
+                self._put(self.output_queue, (frame_index, captured, results[0]))
+
+        self._put_end(self.output_queue)
+
+    def run(self):
+        """Run the pipeline until the source ends or 'q' is pressed"""
+        cap = cv2.VideoCapture(self.source)
+        out = None
+        if self.output_path:
+            # Output video settings
+            fourcc = cv2.VideoWriter_fourcc(*'XVID')
+            out = cv2.VideoWriter(self.output_path, fourcc, 20.0, (640, 480))
+
+        threads = [
+            threading.Thread(target=self._decode_loop, args=(cap,), daemon=True),
+            threading.Thread(target=self._inference_loop, daemon=True)
+        ]
+        for thread in threads:
+            thread.start()
+
+        # Output stage runs here, GUI calls are only safe on the main thread
+        try:
+            while True:
+                try:
+                    item = self.output_queue.get(timeout=0.5)
+                except queue.Empty:
+                    if not threads[1].is_alive():
+                        break
+                    continue
+                if item is None:
+                    break
+                frame_index, captured, result = item
+
+                start = time.perf_counter()
+                frame = result.plot()
+                if out is not None:
+                    out.write(cv2.resize(frame, (640, 480)))
+                if self.show:
+                    cv2.imshow("YOLO Detection", frame)
+
+                    # Press 'q' to quit
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+                self.metrics['output'].add((time.perf_counter() - start) * 1000)
+                self.metrics['end_to_end'].add(self._age_ms(captured))
+        finally:
+            self.stop_event.set()
+            for thread in threads:
+                thread.join(timeout=5)
+            cap.release()
+            if out is not None:
+                out.release()
+            if self.show:
+                cv2.destroyAllWindows()
+
+    def get_metrics(self):
+        """
+        Get per-stage latency statistics and frame counters
+
+        Returns:
+            metrics: Dictionary with a latency summary per stage and the frame counters
+        """
+        with self.counters_lock:
+            counters = dict(self.counters)
+        return {
+            'stages': {stage: stage_metrics.summary() for stage, stage_metrics in self.metrics.items()},
+            'frames': counters
+        }
+
+
+if __name__ == "__main__":
+    # Load the YOLO model
+    model = YOLO("yolov8n.pt")
+
+    # Stream the test video at its own frame rate, as a camera would deliver it
+    pipeline = StreamingPipeline(
+        model,
+        "../data/test_video.mp4",
+        output_path='../data/output_video.avi',
+        policy=DROP_OLDEST,
+        realtime=True,
+        on_counts=lambda count, age_ms: print(f"Vehicles: {count} ({age_ms:.0f} ms old)")
+    )
+    pipeline.run()
+
+    for stage, summary in pipeline.get_metrics()['stages'].items():
+        print(f"{stage:>10}: mean {summary['mean']:.1f} ms, p95 {summary['p95']:.1f} ms, max {summary['max']:.1f} ms")
+    print(pipeline.get_metrics()['frames'])
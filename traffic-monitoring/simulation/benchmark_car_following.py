@@ -0,0 +1,61 @@
+import time
+import matplotlib
+matplotlib.use('Agg')  # No window needed, only the stepping code is timed
+
+from traffic_simulator import TrafficSimulator
+from headless_simulator import HeadlessTrafficSimulator
+
+QUEUE_LENGTHS = [10, 100, 1000, 10000]
+
+
+def build_queue(queue_length):
+    """
+    Build both simulators with a queue of stopped vehicles waiting at a red light in lane 1
+
+    Args:
+        queue_length: Number of vehicles in the queue
+
+    Returns:
+        simulator: TrafficSimulator instance
+        headless: HeadlessTrafficSimulator instance with the same vehicles
+    """
+    simulator = TrafficSimulator()
+    headless = HeadlessTrafficSimulator(capacity=queue_length)
+    simulator.signal_states = {1: 'red', 2: 'red', 3: 'red', 4: 'green'}
+    headless.signal_states = dict(simulator.signal_states)
+
+    # Leader waits at the stop line, followers are spaced just inside the stopping gap
+    stop_y = -simulator.intersection_size/2 - 10
+    for i in range(queue_length):
+        position = (-10, stop_y - i * 34)
+        simulator.vehicles[1].append({
+            'width': 10,
+            'length': 15,
+            'color': 'blue',
+            'speed': 1.5,
+            'is_ambulance': False,
+            'in_intersection': False,
+            'position': position,
+            'direction': (0, 1)
+        })
+        headless._add_vehicle(1, position, 1.5, False, 0)
+
+    return simulator, headless
+
+
+def time_ticks(step, ticks):
+    """Average wall time of one call to step, in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(ticks):
+        step()
+    return (time.perf_counter() - start) / ticks * 1000
+
+
+if __name__ == "__main__":
+    print(f"{'queue length':>12} {'TrafficSimulator':>18} {'Headless':>10}")
+    for queue_length in QUEUE_LENGTHS:
+        simulator, headless = build_queue(queue_length)
+        ticks = max(5, 20000 // queue_length)
+        simulator_ms = time_ticks(simulator._move_vehicles, ticks)
+        headless_ms = time_ticks(headless._move_vehicles, ticks)
+        print(f"{queue_length:>12} {simulator_ms:>15.3f} ms {headless_ms:>7.3f} ms")
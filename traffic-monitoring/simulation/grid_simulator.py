@@ -0,0 +1,277 @@
+import multiprocessing as mp
+
+from headless_simulator import HeadlessTrafficSimulator
+
+# Where a vehicle leaving each lane goes next: (row step, column step).
+# Lane 1 drives towards +y (next row), lane 2 towards -x, lane 3 towards -y, lane 4 towards +x.
+LANE_NEIGHBOURS = {
+    1: (1, 0),
+    2: (0, -1),
+    3: (-1, 0),
+    4: (0, 1)
+}
+
+
+def _default_gen_probs():
+    return {1: 0.3, 2: 0.4, 3: 0.2, 4: 0.3}
+
+
+class GridBlock:
+    def __init__(self, rows, cols, cells, controller_factory=None, vehicle_gen_probs=None, seed=None):
+        """
+        A rectangular block of intersections stepped together in one process
+
+        Args:
+            rows: Number of intersection rows in the whole grid
+            cols: Number of intersection columns in the whole grid
+            cells: List of (row, col) intersections owned by this block
+            controller_factory: Callable returning a new TrafficSignalController, one per intersection
+            vehicle_gen_probs: Arrival probabilities on the grid's outer edge, with lane IDs as keys
+            seed: Base seed, each intersection derives its own seed from it
+        """
+        self.rows = rows
+        self.cols = cols
+        self.cells = set(cells)
+        if vehicle_gen_probs is None:
+            vehicle_gen_probs = _default_gen_probs()
+
+        self.intersections = {}
+        for row, col in sorted(self.cells):
+            # Vehicles only enter from outside the grid on arms without an upstream intersection
+            gen_probs = {}
+            for lane_id, (d_row, d_col) in LANE_NEIGHBOURS.items():
+                upstream = (row - d_row, col - d_col)
+                gen_probs[lane_id] = 0 if self._in_grid(upstream) else vehicle_gen_probs[lane_id]
+
+            simulator = HeadlessTrafficSimulator(
+                controller=controller_factory() if controller_factory else None,
+                vehicle_gen_probs=gen_probs,
+                seed=None if seed is None else f"{seed}:{row}:{col}"
+            )
+            simulator.collect_exits = True
+            self.intersections[(row, col)] = simulator
+
+        # Vehicles that left one of our intersections for another one of ours, admitted next tick
+        self.pending = []
+
+        # Vehicles that left the grid altogether
+        self.network_exited = 0
+        self.network_wait_ticks = 0
+
+    def _in_grid(self, cell):
+        row, col = cell
+        return 0 <= row < self.rows and 0 <= col < self.cols
+
+    def step(self, inbound):
+        """
+        Advance every intersection in the block by one tick
+
+        Args:
+            inbound: List of (row, col, vehicle) arrivals from other blocks
+
+        Returns:
+            outbound: List of (row, col, vehicle) departures for other blocks
+        """
+        # Vehicles that exited last tick enter their next intersection now, whichever block
+        # they came from, so results do not depend on how the grid is split
+        for row, col, vehicle in self.pending + inbound:
+            self.intersections[(row, col)].admit_vehicle(*vehicle)
+        self.pending = []
+
+        outbound = []
+        for (row, col), simulator in self.intersections.items():
+            simulator.step()
+
+            for vehicle in simulator.outbox:
+                d_row, d_col = LANE_NEIGHBOURS[vehicle[0]]
+                target = (row + d_row, col + d_col)
+                if target in self.cells:
+                    self.pending.append((target[0], target[1], vehicle))
+                elif self._in_grid(target):
+                    outbound.append((target[0], target[1], vehicle))
+                else:
+                    self.network_exited += 1
+                    self.network_wait_ticks += vehicle[5]
+            simulator.outbox = []
+
+        return outbound
+
+    def get_results(self):
+        """Get per-intersection and network results for this block"""
+        return {
+            'intersections': {
+                cell: {
+                    'results': simulator.get_results(),
+                    'performance': simulator.get_performance(),
+                    'signal_states': dict(simulator.signal_states)
+                }
+                for cell, simulator in self.intersections.items()
+            },
+            'network_exited': self.network_exited,
+            'network_wait_ticks': self.network_wait_ticks
+        }
+
+
+def _block_worker(connection, block_args):
+    """Run a GridBlock in a worker process, driven by messages on a pipe"""
+    block = GridBlock(*block_args)
+    while True:
+        command, payload = connection.recv()
+        if command == 'step':
+            connection.send(block.step(payload))
+        elif command == 'results':
+            connection.send(block.get_results())
+        else:
+            break
+    connection.close()
+
+
+class GridSimulator:
+    def __init__(self, rows, cols, blocks=(1, 1), controller_factory=None, vehicle_gen_probs=None, seed=None):
+        """
+        Initialize a headless simulation of an N x M grid of intersections
+
+        Every intersection is a HeadlessTrafficSimulator with its own controller. A vehicle
+        leaving an arm enters the same arm of the next intersection in its direction of
+        travel. The grid is split into blocks, and when there is more than one block each
+        block steps in its own process; only vehicles crossing a block boundary are
+        exchanged between processes each tick.
+
+        Args:
+            rows: Number of intersection rows
+            cols: Number of intersection columns
+            blocks: Number of (row, column) blocks to split the grid into
+            controller_factory: Callable returning a new TrafficSignalController, one per intersection.
+                Must be picklable when running more than one block.
+            vehicle_gen_probs: Arrival probabilities on the grid's outer edge, with lane IDs as keys
+            seed: Base seed for all intersections
+        """
+        self.rows = rows
+        self.cols = cols
+        self.time_elapsed = 0
+        self.frame_count = 0
+
+        # Split rows and columns as evenly as possible
+        block_rows, block_cols = min(blocks[0], rows), min(blocks[1], cols)
+        self.block_of = {}
+        block_cells = [[] for _ in range(block_rows * block_cols)]
+        for row in range(rows):
+            for col in range(cols):
+                block_id = (row * block_rows // rows) * block_cols + (col * block_cols // cols)
+                self.block_of[(row, col)] = block_id
+                block_cells[block_id].append((row, col))
+
+        block_args = [(rows, cols, cells, controller_factory, vehicle_gen_probs, seed) for cells in block_cells]
+
+        # A single block is stepped in this process
+        self.blocks = None
+        self.connections = None
+        self.processes = None
+        if len(block_args) == 1:
+            self.blocks = [GridBlock(*block_args[0])]
+        else:
+            self.connections = []
+            self.processes = []
+            for args in block_args:
+                parent_connection, child_connection = mp.Pipe()
+                p = mp.Process(target=_block_worker, args=(child_connection, args), daemon=True)
+                p.start()
+                child_connection.close()
+                self.connections.append(parent_connection)
+                self.processes.append(p)
+
+        # Boundary vehicles waiting to be handed to each block on the next tick
+        self.inbound = [[] for _ in block_args]
+
+    def step(self):
+        """Advance every intersection in the grid by one tick"""
+        self.frame_count += 1
+        self.time_elapsed += 0.1
+
+        inbound = self.inbound
+        self.inbound = [[] for _ in inbound]
+
+        if self.blocks is not None:
+            outbound = [block.step(arrivals) for block, arrivals in zip(self.blocks, inbound)]
+        else:
+            # Send every block its arrivals first so that all blocks step concurrently
+            for connection, arrivals in zip(self.connections, inbound):
+                connection.send(('step', arrivals))
+            outbound = [connection.recv() for connection in self.connections]
+
+        # Route boundary vehicles to the block that owns their next intersection
+        for departures in outbound:
+            for row, col, vehicle in departures:
+                self.inbound[self.block_of[(row, col)]].append((row, col, vehicle))
+
+    def run(self, ticks=1000):
+        """
+        Run the grid simulation
+
+        Args:
+            ticks: Number of ticks to simulate
+
+        Returns:
+            results: Grid results, as returned by get_results
+        """
+        for _ in range(ticks):
+            self.step()
+        return self.get_results()
+
+    def get_results(self):
+        """
+        Get grid simulation results
+
+        Returns:
+            results: Dictionary with per-intersection results keyed by (row, col), plus
+                network throughput and average delay of vehicles that left the grid
+        """
+        if self.blocks is not None:
+            block_results = [block.get_results() for block in self.blocks]
+        else:
+            for connection in self.connections:
+                connection.send(('results', None))
+            block_results = [connection.recv() for connection in self.connections]
+
+        intersections = {}
+        network_exited = 0
+        network_wait_ticks = 0
+        for block_result in block_results:
+            intersections.update(block_result['intersections'])
+            network_exited += block_result['network_exited']
+            network_wait_ticks += block_result['network_wait_ticks']
+
+        return {
+            'intersections': intersections,
+            'network_exited': network_exited,
+            'avg_network_delay': network_wait_ticks * 0.1 / network_exited if network_exited else 0.0
+        }
+
+    def close(self):
+        """Stop the worker processes"""
+        if self.processes is None:
+            return
+        for connection in self.connections:
+            connection.send(('stop', None))
+            connection.close()
+        for p in self.processes:
+            p.join()
+        self.processes = None
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import time
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+    from traffic_control import TrafficSignalController
+
+    # Demo usage: a 4x4 district split into 2x2 blocks, ten simulated minutes
+    grid = GridSimulator(4, 4, blocks=(2, 2), controller_factory=TrafficSignalController, seed=1)
+    start = time.time()
+    results = grid.run(6000)
+    grid.close()
+
+    print(f"Simulated 10 minutes of a 4x4 grid in {time.time() - start:.1f}s")
+    print(f"Vehicles through the network: {results['network_exited']}, "
+          f"average delay: {results['avg_network_delay']:.1f}s")
@@ -0,0 +1,441 @@
+import random
+import numpy as np
+
+# Signal states encoded as integers so they can be gathered per vehicle
+RED, YELLOW, GREEN = 0, 1, 2
+SIGNAL_CODES = {'red': RED, 'yellow': YELLOW, 'green': GREEN}
+
+# Direction of travel for each lane, indexed by lane ID (row 0 is unused)
+LANE_DIRECTIONS = np.array([
+    [0, 0],
+    [0, 1],   # Lane 1 (North)
+    [-1, 0],  # Lane 2 (East)
+    [0, -1],  # Lane 3 (South)
+    [1, 0]    # Lane 4 (West)
+], dtype=np.float64)
+
+# Position component across the road for each lane, indexed by lane ID
+LATERAL_AXIS = np.array([0, 0, 1, 0, 1])
+
+# Per-vehicle state arrays, resized and compacted together
+VEHICLE_ARRAYS = ('positions', 'speeds', 'lane_ids', 'lengths', 'widths', 'colors', 'is_ambulance', 'wait_ticks')
+
+VEHICLE_COLORS = ['blue', 'green', 'black', 'purple']
+
+
+class HeadlessTrafficSimulator:
+    def __init__(self, controller=None, vehicle_gen_probs=None, seed=None, capacity=1024):
+        """
+        Initialize the headless traffic simulator
+
+        Same intersection model as TrafficSimulator, but without any plotting.
+        Vehicles are stored in NumPy arrays and all of them are advanced in
+        one batched step per tick.
+
+        Args:
+            controller: TrafficSignalController instance used to compute green times
+            vehicle_gen_probs: Dictionary of vehicle generation probabilities, with lane IDs as keys
+            seed: Seed for the vehicle generation random number generator
+            capacity: Initial number of vehicle slots to allocate
+        """
+        self.controller = controller
+        self.rng = random.Random(seed)
+
+        # Set up the road
+        self.road_width = 40
+        self.lane_width = 20
+        self.road_length = 200
+        self.intersection_size = 60
+
+        # Vehicle state arrays, only the first num_vehicles entries are live
+        self.num_vehicles = 0
+        self.positions = np.zeros((capacity, 2), dtype=np.float64)
+        self.speeds = np.zeros(capacity, dtype=np.float64)
+        self.lane_ids = np.zeros(capacity, dtype=np.int64)
+        self.lengths = np.zeros(capacity, dtype=np.float64)
+        self.widths = np.zeros(capacity, dtype=np.float64)
+        self.colors = np.zeros(capacity, dtype=np.int8)  # -1 for ambulance, else index into VEHICLE_COLORS
+        self.is_ambulance = np.zeros(capacity, dtype=bool)
+        self.wait_ticks = np.zeros(capacity, dtype=np.int64)
+
+        # Vehicle counts
+        self.vehicle_counts = {1: 0, 2: 0, 3: 0, 4: 0}
+
+        # Ambulance presence
+        self.has_ambulance = {1: False, 2: False, 3: False, 4: False}
+
+        # Traffic signal states
+        self.signal_states = {1: 'red', 2: 'red', 3: 'red', 4: 'green'}
+
+        # Time allocated to each signal
+        self.signal_times = {1: 0, 2: 0, 3: 0, 4: 10}
+
+        # Vehicle generation probabilities (vehicles per tick)
+        if vehicle_gen_probs is None:
+            vehicle_gen_probs = {1: 0.3, 2: 0.4, 3: 0.2, 4: 0.3}
+        self.vehicle_gen_probs = dict(vehicle_gen_probs)
+
+        # Simulation clock, each tick is 0.1 seconds
+        self.tick_seconds = 0.1
+        self.time_elapsed = 0
+        self.frame_count = 0
+
+        # Result data
+        self.result_frames = {
+            1: {'vehicles': 0, 'time': 0},
+            2: {'vehicles': 0, 'time': 0},
+            3: {'vehicles': 0, 'time': 0},
+            4: {'vehicles': 0, 'time': 0}
+        }
+
+        # Vehicles that left the simulation and the ticks they spent stopped, per lane
+        self.vehicles_exited = np.zeros(5, dtype=np.int64)
+        self.total_wait_ticks = np.zeros(5, dtype=np.int64)
+
+        # When set, vehicles leaving the simulation are also appended to outbox as
+        # (lane_id, lateral, speed, is_ambulance, color, wait_ticks) tuples
+        self.collect_exits = False
+        self.outbox = []
+
+        # Detection zone coordinates, one row of [x, y, width, height] per lane ID
+        self.detection_zones = np.array([
+            [0, 0, 0, 0],
+            [-self.road_width, -self.road_length, self.road_width, self.road_length - self.intersection_size/2],  # North
+            [self.intersection_size/2, -self.road_width, self.road_length - self.intersection_size/2, self.road_width],  # East
+            [0, self.intersection_size/2, self.road_width, self.road_length - self.intersection_size/2],  # South
+            [-self.road_length, 0, self.road_length - self.intersection_size/2, self.road_width]   # West
+        ], dtype=np.float64)
+
+    def _ensure_capacity(self, extra):
+        """Grow the vehicle arrays so that extra more vehicles fit"""
+        needed = self.num_vehicles + extra
+        capacity = len(self.speeds)
+        if needed <= capacity:
+            return
+
+        while capacity < needed:
+            capacity *= 2
+
+        for name in VEHICLE_ARRAYS:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.num_vehicles] = old[:self.num_vehicles]
+            setattr(self, name, new)
+
+    def _entry_position(self, lane_id, lateral):
+        """Position where vehicles enter a lane, at the given offset across the road"""
+        if lane_id == 1:  # North
+            return (lateral, -self.road_length)
+        elif lane_id == 2:  # East
+            return (self.road_length, lateral)
+        elif lane_id == 3:  # South
+            return (lateral, self.road_length)
+        else:  # West
+            return (-self.road_length, lateral)
+
+    def _add_vehicle(self, lane_id, position, speed, is_ambulance, color, wait_ticks=0):
+        """Append a single vehicle to the state arrays"""
+        self._ensure_capacity(1)
+        i = self.num_vehicles
+        self.positions[i] = position
+        self.speeds[i] = speed
+        self.lane_ids[i] = lane_id
+        self.lengths[i] = 15
+        self.widths[i] = 10
+        self.colors[i] = color
+        self.is_ambulance[i] = is_ambulance
+        self.wait_ticks[i] = wait_ticks
+        self.num_vehicles += 1
+
+    def admit_vehicle(self, lane_id, lateral, speed, is_ambulance, color, wait_ticks=0):
+        """
+        Admit a vehicle arriving from outside, e.g. from a neighbouring intersection
+
+        Args:
+            lane_id: ID of the lane (1-4) the vehicle enters
+            lateral: Offset across the road, as reported in outbox
+            speed: Speed of the vehicle
+            is_ambulance: Boolean indicating if the vehicle is an ambulance
+            color: Color index of the vehicle (-1 for ambulance)
+            wait_ticks: Ticks the vehicle has already spent stopped
+        """
+        self._add_vehicle(lane_id, self._entry_position(lane_id, lateral), speed, is_ambulance, color, wait_ticks)
+        if is_ambulance:
+            self.has_ambulance[lane_id] = True
+
+    def _generate_vehicles(self):
+        """Generate new vehicles at the edges of the simulation"""
+        # Random draws are made in the same order as TrafficSimulator._generate_vehicles,
+        # so both simulators spawn identical vehicles from the same seed
+        rng = self.rng
+        for lane_id in range(1, 5):
+            # Skip if probability condition not met
+            if rng.random() > self.vehicle_gen_probs[lane_id]:
+                continue
+
+            # Determine if this is an ambulance (small probability)
+            is_ambulance = rng.random() < 0.01
+            color = -1 if is_ambulance else VEHICLE_COLORS.index(rng.choice(VEHICLE_COLORS))
+            speed = rng.uniform(1.0, 2.0)
+
+            # Set position based on lane, inbound lanes 1 and 2 drive on the negative side
+            if lane_id in (1, 2):
+                lateral = rng.uniform(-self.road_width/2 + 5, 0 - 5)
+            else:
+                lateral = rng.uniform(0 + 5, self.road_width/2 - 5)
+
+            self._add_vehicle(lane_id, self._entry_position(lane_id, lateral), speed, is_ambulance, color)
+
+            # Update ambulance flag
+            if is_ambulance:
+                self.has_ambulance[lane_id] = True
+
+    def _progress(self, n):
+        """Distance travelled along the lane by each of the first n vehicles"""
+        directions = LANE_DIRECTIONS[self.lane_ids[:n]]
+        return np.einsum('ij,ij->i', self.positions[:n], directions) + self.road_length
+
+    def _move_vehicles(self):
+        """Move all vehicles in one batched step and handle traffic signals"""
+        n = self.num_vehicles
+        if n == 0:
+            return
+
+        lane_ids = self.lane_ids[:n]
+        lengths = self.lengths[:n]
+        directions = LANE_DIRECTIONS[lane_ids]
+
+        # Every lane becomes one axis once positions are projected on the direction of travel
+        progress = self._progress(n)
+        stop_line = self.road_length - self.intersection_size/2
+        at_intersection = progress > stop_line - lengths
+        in_intersection = (progress > stop_line) & (progress < self.road_length + self.intersection_size/2)
+        exited = progress > 2 * self.road_length
+
+        # Handle traffic signals
+        signal_codes = np.array([RED] + [SIGNAL_CODES[self.signal_states[i]] for i in range(1, 5)])
+        signals = signal_codes[lane_ids]
+        approaching = at_intersection & ~in_intersection
+        should_stop = (signals == RED) & approaching
+        speeds = np.where((signals == YELLOW) & approaching, self.speeds[:n] * 0.5, self.speeds[:n])
+
+        # Check for the vehicle in front. As in TrafficSimulator, each lane moves leader
+        # first and a vehicle checks its gap to where its leader is after the leader's
+        # move. Sorting on a key that offsets each lane puts every vehicle right after its
+        # leader; of vehicles level with each other the older one leads.
+        keys = lane_ids * 10000.0 + progress
+        order = np.lexsort((np.arange(n), -keys))
+        has_leader = np.zeros(n, dtype=bool)
+        has_leader[1:] = lane_ids[order][1:] == lane_ids[order][:-1]
+        moved_progress = np.einsum('ij,ij->i', self.positions[:n] + directions * speeds[:, None],
+                                   directions) + self.road_length
+        sorted_progress = progress[order]
+        follower_lengths = lengths[order][1:]
+        gap_if_held = np.zeros(n)
+        gap_if_held[1:] = sorted_progress[:-1] - sorted_progress[1:] - follower_lengths
+        gap_if_moved = np.zeros(n)
+        gap_if_moved[1:] = moved_progress[order][:-1] - sorted_progress[1:] - follower_lengths
+        free = ~(should_stop | exited)[order]
+        moves_if_held = free & ~(has_leader & (gap_if_held > 0) & (gap_if_held < 20))
+        moves_if_moved = free & ~(has_leader & (gap_if_moved > 0) & (gap_if_moved < 20))
+
+        # Whether a vehicle moves only depends on whether its leader did: it always does
+        # the same, or follows it, or does the opposite. The chain is resolved in one
+        # pass from the last vehicle whose move is settled (every lane's first one),
+        # flipping once for every vehicle since then that does the opposite.
+        index = np.arange(n)
+        settled = np.maximum.accumulate(np.where(moves_if_held == moves_if_moved, index, 0))
+        flips = np.cumsum(moves_if_held & ~moves_if_moved)
+        moves = moves_if_held[settled] ^ ((flips - flips[settled]) % 2 == 1)
+        should_stop[order] |= ~moves & free
+
+        # Move the vehicles that are not stopped
+        moving = ~should_stop & ~exited
+        self.positions[:n][moving] += directions[moving] * speeds[moving, None]
+        self.wait_ticks[:n][should_stop & ~exited] += 1
+
+        # Remove vehicles that have left the simulation
+        if exited.any():
+            exited_lanes = lane_ids[exited]
+            self.vehicles_exited += np.bincount(exited_lanes, minlength=5)
+            self.total_wait_ticks += np.bincount(exited_lanes, weights=self.wait_ticks[:n][exited],
+                                                 minlength=5).astype(np.int64)
+
+            # If an ambulance is leaving, update the flag
+            for lane_id in np.unique(exited_lanes[self.is_ambulance[:n][exited]]):
+                self.has_ambulance[int(lane_id)] = False
+
+            if self.collect_exits:
+                lateral = self.positions[:n][exited, LATERAL_AXIS[exited_lanes]]
+                self.outbox.extend(zip(
+                    exited_lanes.tolist(),
+                    lateral.tolist(),
+                    self.speeds[:n][exited].tolist(),
+                    self.is_ambulance[:n][exited].tolist(),
+                    self.colors[:n][exited].tolist(),
+                    self.wait_ticks[:n][exited].tolist()
+                ))
+
+            keep = ~exited
+            remaining = int(keep.sum())
+            for name in VEHICLE_ARRAYS:
+                array = getattr(self, name)
+                array[:remaining] = array[:n][keep]
+            self.num_vehicles = remaining
+
+    def _update_vehicle_counts(self):
+        """Update the count of vehicles in each lane"""
+        n = self.num_vehicles
+        lane_ids = self.lane_ids[:n]
+        x = self.positions[:n, 0]
+        y = self.positions[:n, 1]
+
+        # Count vehicles inside their own lane's detection zone
+        zones = self.detection_zones[lane_ids]
+        inside = (zones[:, 0] < x) & (x < zones[:, 0] + zones[:, 2]) & \
+                 (zones[:, 1] < y) & (y < zones[:, 1] + zones[:, 3])
+        counts = np.bincount(lane_ids[inside], minlength=5)
+
+        for lane_id in range(1, 5):
+            self.vehicle_counts[lane_id] = int(counts[lane_id])
+
+    def _update_signal_states(self):
+        """Update traffic signal states based on timing or external controller"""
+        # Decrement time for current green signal
+        for lane_id in range(1, 5):
+            if self.signal_states[lane_id] == 'green' or self.signal_states[lane_id] == 'yellow':
+                self.signal_times[lane_id] -= 1
+
+                # If time is up, change signal
+                if self.signal_times[lane_id] <= 0:
+                    if self.signal_states[lane_id] == 'green':
+                        # Change to yellow
+                        self.signal_states[lane_id] = 'yellow'
+                        self.signal_times[lane_id] = 3  # Yellow duration
+                    else:
+                        # Change to red
+                        self.signal_states[lane_id] = 'red'
+
+                        # Determine next green signal
+                        next_lane = (lane_id % 4) + 1
+
+                        # Skip to next lane if no vehicles and no ambulance
+                        while self.vehicle_counts[next_lane] == 0 and not self.has_ambulance[next_lane]:
+                            next_lane = (next_lane % 4) + 1
+
+                            # Break if we've gone full circle
+                            if next_lane == lane_id:
+                                break
+
+                        # Set next lane to green
+                        self.signal_states[next_lane] = 'green'
+
+                        # Calculate time based on vehicle count
+                        if self.controller:
+                            # Use external controller if available
+                            self.signal_times[next_lane] = self.controller.calculate_green_time(
+                                self.vehicle_counts[next_lane]
+                            )
+                        else:
+                            # Simple calculation: 5 seconds + 2 seconds per vehicle, max 30 seconds
+                            self.signal_times[next_lane] = min(5 + self.vehicle_counts[next_lane] * 2, 30)
+
+                            # Increase time if ambulance present
+                            if self.has_ambulance[next_lane]:
+                                self.signal_times[next_lane] = max(self.signal_times[next_lane], 15)
+
+        # Handle ambulance emergency override
+        for lane_id in range(1, 5):
+            if self.has_ambulance[lane_id] and self.signal_states[lane_id] == 'red':
+                # Find current green signal
+                current_green = None
+                for i in range(1, 5):
+                    if self.signal_states[i] == 'green':
+                        current_green = i
+                        break
+
+                if current_green:
+                    # Change current green to yellow if not already
+                    if self.signal_states[current_green] != 'yellow':
+                        self.signal_states[current_green] = 'yellow'
+                        self.signal_times[current_green] = 3
+
+        # Update results data
+        for lane_id in range(1, 5):
+            if self.signal_states[lane_id] == 'green':
+                self.result_frames[lane_id]['vehicles'] += self.vehicle_counts[lane_id]
+                self.result_frames[lane_id]['time'] += 1
+
+    def step(self):
+        """Advance the simulation by one tick"""
+        self.frame_count += 1
+        self.time_elapsed += self.tick_seconds
+
+        self._generate_vehicles()
+        self._move_vehicles()
+        self._update_vehicle_counts()
+        self._update_signal_states()
+
+    def run(self, ticks=1000):
+        """
+        Run the simulation without drawing
+
+        Args:
+            ticks: Number of ticks to simulate
+
+        Returns:
+            results: Simulation results, as returned by get_results
+        """
+        for _ in range(ticks):
+            self.step()
+        return self.get_results()
+
+    def get_results(self):
+        """Get simulation results"""
+        results = {}
+        for lane_id in range(1, 5):
+            lane_data = self.result_frames[lane_id]
+            avg_time = 0
+            if lane_data['vehicles'] > 0:
+                avg_time = lane_data['time'] / lane_data['vehicles']
+
+            results[lane_id] = {
+                'total_vehicles': lane_data['vehicles'],
+                'total_green_time': lane_data['time'],
+                'avg_time_per_vehicle': avg_time
+            }
+
+        return results
+
+    def get_performance(self):
+        """
+        Get throughput and delay of the vehicles that left the simulation
+
+        Returns:
+            performance: Dictionary of per-lane statistics, with lane IDs as keys
+        """
+        performance = {}
+        for lane_id in range(1, 5):
+            exited = int(self.vehicles_exited[lane_id])
+            wait_seconds = self.total_wait_ticks[lane_id] * self.tick_seconds
+            performance[lane_id] = {
+                'vehicles_exited': exited,
+                'total_delay': float(wait_seconds),
+                'avg_delay': float(wait_seconds / exited) if exited else 0.0,
+                'queued': int(np.count_nonzero(self.lane_ids[:self.num_vehicles] == lane_id))
+            }
+        return performance
+
+
+if __name__ == "__main__":
+    # Demo usage: simulate one hour of traffic
+    simulator = HeadlessTrafficSimulator(seed=42)
+    ticks = int(3600 / simulator.tick_seconds)
+    results = simulator.run(ticks)
+    performance = simulator.get_performance()
+
+    for lane_id, direction in enumerate(['North', 'East', 'South', 'West'], 1):
+        print(f"{direction} Lane (Lane {lane_id}): "
+              f"{performance[lane_id]['vehicles_exited']} vehicles exited, "
+              f"avg delay {performance[lane_id]['avg_delay']:.1f}s, "
+              f"green time {results[lane_id]['total_green_time']}")
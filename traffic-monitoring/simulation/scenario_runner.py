@@ -0,0 +1,221 @@
+import argparse
+import glob
+import itertools
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+
+import pandas as pd
+
+from headless_simulator import HeadlessTrafficSimulator
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from traffic_control import TrafficSignalController
+
+# Keyword arguments of TrafficSignalController that can be swept
+TIMING_PARAMS = ['base_time', 'time_per_vehicle', 'max_green_time', 'min_green_time']
+
+
+def build_scenarios(param_grid):
+    """
+    Expand a parameter grid into the list of scenarios to simulate
+
+    Args:
+        param_grid: Dictionary mapping each of TIMING_PARAMS and 'vehicle_gen_probs'
+            to a list of values to try. Missing keys keep the controller defaults.
+
+    Returns:
+        scenarios: List of scenario dictionaries, one per combination
+    """
+    keys = [key for key in TIMING_PARAMS + ['vehicle_gen_probs'] if key in param_grid]
+    scenarios = []
+    for values in itertools.product(*(param_grid[key] for key in keys)):
+        scenario = dict(zip(keys, values))
+        if 'vehicle_gen_probs' in scenario:
+            scenario['vehicle_gen_probs'] = {int(lane_id): prob for lane_id, prob in scenario['vehicle_gen_probs'].items()}
+        scenario['scenario_key'] = json.dumps(scenario, sort_keys=True)
+        scenarios.append(scenario)
+    return scenarios
+
+
+def run_replication(task):
+    """
+    Run one seeded replication of a scenario
+
+    Args:
+        task: Tuple of (scenario, replication, base_seed, ticks)
+
+    Returns:
+        row: Dictionary of scenario parameters and replication statistics
+    """
+    scenario, replication, base_seed, ticks = task
+
+    # The seed only depends on the scenario values and replication number, so a
+    # replication gives the same result whichever worker runs it and in which order
+    seed = f"{base_seed}:{scenario['scenario_key']}:{replication}"
+
+    controller = TrafficSignalController(**{key: scenario[key] for key in TIMING_PARAMS if key in scenario})
+    simulator = HeadlessTrafficSimulator(
+        controller=controller,
+        vehicle_gen_probs=scenario.get('vehicle_gen_probs'),
+        seed=seed
+    )
+    simulator.run(ticks)
+    performance = simulator.get_performance()
+
+    exited = sum(lane['vehicles_exited'] for lane in performance.values())
+    total_delay = sum(lane['total_delay'] for lane in performance.values())
+    simulated_hours = ticks * simulator.tick_seconds / 3600
+
+    row = {'scenario_key': scenario['scenario_key'], 'replication': replication}
+    for key in TIMING_PARAMS:
+        row[key] = scenario.get(key)
+    gen_probs = simulator.vehicle_gen_probs
+    for lane_id in range(1, 5):
+        row[f'gen_prob_{lane_id}'] = gen_probs[lane_id]
+    row.update({
+        'throughput_per_hour': exited / simulated_hours,
+        'avg_delay': total_delay / exited if exited else 0.0,
+        'queued': sum(lane['queued'] for lane in performance.values())
+    })
+    for lane_id in range(1, 5):
+        row[f'throughput_lane_{lane_id}'] = performance[lane_id]['vehicles_exited'] / simulated_hours
+        row[f'avg_delay_lane_{lane_id}'] = performance[lane_id]['avg_delay']
+    return row
+
+
+class ScenarioRunner:
+    def __init__(self, output_dir, replications=100, ticks=6000, seed=0, processes=None, flush_every=200):
+        """
+        Initialize the Monte-Carlo scenario runner
+
+        Replication rows are written to Parquet part files under output_dir as they
+        complete. Rerunning with the same output_dir skips replications that are
+        already on disk, so an interrupted sweep resumes where it stopped.
+
+        Args:
+            output_dir: Directory for replication parts and the summary file
+            replications: Number of seeded replications per scenario
+            ticks: Number of simulator ticks per replication (0.1 seconds each)
+            seed: Base seed shared by the whole sweep
+            processes: Number of worker processes (defaults to the CPU count)
+            flush_every: Number of completed replications per part file
+        """
+        self.output_dir = output_dir
+        self.replications = replications
+        self.ticks = ticks
+        self.seed = seed
+        self.processes = processes
+        self.flush_every = flush_every
+
+        self.parts_dir = os.path.join(output_dir, 'replications')
+        self.summary_file = os.path.join(output_dir, 'summary.parquet')
+        os.makedirs(self.parts_dir, exist_ok=True)
+
+    def _load_parts(self):
+        """Read every replication row written so far"""
+        parts = sorted(glob.glob(os.path.join(self.parts_dir, 'part-*.parquet')))
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+
+    def _write_part(self, rows):
+        """Write a batch of replication rows to a new part file"""
+        part_id = len(glob.glob(os.path.join(self.parts_dir, 'part-*.parquet')))
+        path = os.path.join(self.parts_dir, f'part-{part_id:05d}.parquet')
+
+        # Write under a temporary name first so a crash never leaves a half-written part
+        tmp_path = path + '.tmp'
+        pd.DataFrame(rows).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def run(self, param_grid):
+        """
+        Run every replication of every scenario that is not on disk yet
+
+        Args:
+            param_grid: Parameter grid, as accepted by build_scenarios
+
+        Returns:
+            summary: DataFrame of aggregated statistics per scenario
+        """
+        scenarios = build_scenarios(param_grid)
+
+        done = set()
+        existing = self._load_parts()
+        if not existing.empty:
+            done = set(zip(existing['scenario_key'], existing['replication']))
+
+        tasks = [
+            (scenario, replication, self.seed, self.ticks)
+            for scenario in scenarios
+            for replication in range(self.replications)
+            if (scenario['scenario_key'], replication) not in done
+        ]
+        print(f"{len(scenarios)} scenarios, {len(done)} replications done, {len(tasks)} to run")
+
+        if tasks:
+            start = time.time()
+            rows = []
+            with mp.Pool(self.processes) as pool:
+                for completed, row in enumerate(pool.imap_unordered(run_replication, tasks), 1):
+                    rows.append(row)
+                    if len(rows) >= self.flush_every:
+                        self._write_part(rows)
+                        rows = []
+                        print(f"{completed}/{len(tasks)} replications, {time.time() - start:.0f}s")
+            if rows:
+                self._write_part(rows)
+
+        return self.summarize()
+
+    def summarize(self):
+        """
+        Aggregate all replication rows into per-scenario statistics
+
+        Returns:
+            summary: DataFrame with mean, standard deviation and 95% confidence
+                half-width of throughput and delay for each scenario
+        """
+        df = self._load_parts()
+        if df.empty:
+            return df
+
+        group_columns = ['scenario_key'] + TIMING_PARAMS + [f'gen_prob_{lane_id}' for lane_id in range(1, 5)]
+        metrics = ['throughput_per_hour', 'avg_delay', 'queued']
+        summary = df.groupby(group_columns, dropna=False)[metrics].agg(['mean', 'std', 'count'])
+        summary.columns = [f'{metric}_{stat}' for metric, stat in summary.columns]
+        for metric in metrics:
+            summary[f'{metric}_ci95'] = 1.96 * summary[f'{metric}_std'] / summary[f'{metric}_count'] ** 0.5
+        summary = summary.reset_index()
+
+        summary.to_parquet(self.summary_file, index=False)
+        return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Sweep signal timing parameters with the headless simulator')
+    parser.add_argument('--output', default='sweep_results', help='Output directory, reuse it to resume')
+    parser.add_argument('--replications', type=int, default=100)
+    parser.add_argument('--ticks', type=int, default=6000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    # Demo grid: timing parameters around the controller defaults, two demand levels
+    param_grid = {
+        'base_time': [5, 10, 15],
+        'time_per_vehicle': [1, 2, 3],
+        'max_green_time': [30, 60],
+        'min_green_time': [10],
+        'vehicle_gen_probs': [
+            {1: 0.3, 2: 0.4, 3: 0.2, 4: 0.3},
+            {1: 0.5, 2: 0.5, 3: 0.4, 4: 0.5}
+        ]
+    }
+
+    runner = ScenarioRunner(args.output, args.replications, args.ticks, args.seed, args.processes)
+    summary = runner.run(param_grid)
+    print(summary.sort_values('avg_delay_mean').head(10).to_string(index=False))
@@ -92,8 +92,8 @@ class TrafficSimulator:
         
         # Detection zone coordinates
         self.detection_zones = {
-            1: [0, -self.road_length, self.road_width, self.road_length - self.intersection_size/2],  # North
-            2: [self.intersection_size/2, 0, self.road_length - self.intersection_size/2, self.road_width],  # East
+            1: [-self.road_width, -self.road_length, self.road_width, self.road_length - self.intersection_size/2],  # North
+            2: [self.intersection_size/2, -self.road_width, self.road_length - self.intersection_size/2, self.road_width],  # East
             3: [0, self.intersection_size/2, self.road_width, self.road_length - self.intersection_size/2],  # South
             4: [-self.road_length, 0, self.road_length - self.intersection_size/2, self.road_width]   # West
         }
@@ -320,51 +320,43 @@ class TrafficSimulator:
             if is_ambulance:
                 self.has_ambulance[lane_id] = True
     
+    def _progress(self, vehicle):
+        """Distance travelled by a vehicle along its direction of travel"""
+        x, y = vehicle['position']
+        dx, dy = vehicle['direction']
+        return x * dx + y * dy + self.road_length
+    
     def _move_vehicles(self):
         """Move vehicles and handle traffic signals"""
+        stop_line = self.road_length - self.intersection_size/2
+        
         for lane_id in range(1, 5):
             signal_state = self.signal_states[lane_id]
             
-            # List to keep track of vehicles that leave the simulation
-            to_remove = []
+            # Vehicles in a lane are kept ordered along the direction of travel, leader first,
+            # so each vehicle only has to look at the one just before it in the list
+            vehicles = self.vehicles[lane_id]
+            progress = [self._progress(vehicle) for vehicle in vehicles]
             
-            for i, vehicle in enumerate(self.vehicles[lane_id]):
+            # Vehicles that have left the simulation are at the front of the lane
+            exited = 0
+            while exited < len(vehicles) and progress[exited] > 2 * self.road_length:
+                exited += 1
+            
+            for i in range(exited, len(vehicles)):
+                vehicle = vehicles[i]
                 x, y = vehicle['position']
                 dx, dy = vehicle['direction']
                 speed = vehicle['speed']
                 
                 # Check if vehicle is at intersection
-                at_intersection = False
-                if lane_id == 1 and y > -self.intersection_size/2 - vehicle['length']:
-                    at_intersection = True
-                elif lane_id == 2 and x < self.intersection_size/2 + vehicle['length']:
-                    at_intersection = True
-                elif lane_id == 3 and y < self.intersection_size/2 + vehicle['length']:
-                    at_intersection = True
-                elif lane_id == 4 and x > -self.intersection_size/2 - vehicle['length']:
-                    at_intersection = True
+                at_intersection = progress[i] > stop_line - vehicle['length']
                 
                 # Check if vehicle is in intersection
-                in_intersection = False
-                if lane_id == 1 and y > -self.intersection_size/2 and y < self.intersection_size/2:
-                    in_intersection = True
-                elif lane_id == 2 and x < self.intersection_size/2 and x > -self.intersection_size/2:
-                    in_intersection = True
-                elif lane_id == 3 and y < self.intersection_size/2 and y > -self.intersection_size/2:
-                    in_intersection = True
-                elif lane_id == 4 and x > -self.intersection_size/2 and x < self.intersection_size/2:
-                    in_intersection = True
+                in_intersection = stop_line < progress[i] < self.road_length + self.intersection_size/2
                 
                 vehicle['in_intersection'] = in_intersection
                 
-                # Check if vehicle has left the simulation
-                if (lane_id == 1 and y > self.road_length) or \
-                   (lane_id == 2 and x < -self.road_length) or \
-                   (lane_id == 3 and y < -self.road_length) or \
-                   (lane_id == 4 and x > self.road_length):
-                    to_remove.append(i)
-                    continue
-                
                 # Handle traffic signals
                 should_stop = False
                 if signal_state == 'red' and at_intersection and not in_intersection:
@@ -373,45 +365,31 @@ class TrafficSimulator:
                     # Slow down for yellow
                     speed = speed * 0.5
                 
-                # Check for vehicle in front
-                for other_vehicle in self.vehicles[lane_id]:
-                    if other_vehicle != vehicle:
-                        other_x, other_y = other_vehicle['position']
-                        
-                        # Calculate distance based on lane direction
-                        distance = 0
-                        if lane_id == 1:  # North
-                            if y < other_y and abs(x - other_x) < vehicle['width']:
-                                distance = other_y - y - vehicle['length']
-                        elif lane_id == 2:  # East
-                            if x > other_x and abs(y - other_y) < vehicle['width']:
-                                distance = x - other_x - vehicle['length']
-                        elif lane_id == 3:  # South
-                            if y > other_y and abs(x - other_x) < vehicle['width']:
-                                distance = y - other_y - vehicle['length']
-                        elif lane_id == 4:  # West
-                            if x < other_x and abs(y - other_y) < vehicle['width']:
-                                distance = other_x - x - vehicle['length']
-                        
-                        # Stop if too close
-                        if 0 < distance < 20:
-                            should_stop = True
-                            break
+                # Check for vehicle in front, where it is after its own move this tick
+                if i > 0:
+                    distance = progress[i - 1] - progress[i] - vehicle['length']
+                    
+                    # Stop if too close
+                    if 0 < distance < 20:
+                        should_stop = True
                 
                 # Move the vehicle if not stopped
                 if not should_stop:
                     new_x = x + dx * speed
                     new_y = y + dy * speed
                     vehicle['position'] = (new_x, new_y)
+                    progress[i] = self._progress(vehicle)
             
             # Remove vehicles that have left the simulation
-            for i in sorted(to_remove, reverse=True):
+            for vehicle in vehicles[:exited]:
                 # If an ambulance is leaving, update the flag
-                if self.vehicles[lane_id][i]['is_ambulance']:
+                if vehicle['is_ambulance']:
                     self.has_ambulance[lane_id] = False
-                
-                # Remove the vehicle
-                self.vehicles[lane_id].pop(i)
+            del vehicles[:exited]
+            
+            # Overlapping vehicles can pass each other, so restore the order.
+            # The list is almost sorted already, which keeps this linear.
+            vehicles.sort(key=self._progress, reverse=True)
     
     def _update_vehicle_counts(self):
         """Update the count of vehicles in each lane"""
@@ -474,10 +452,8 @@ class TrafficSimulator:
                         # Calculate time based on vehicle count (minimum 10 seconds)
                         if self.controller:
                             # Use external controller if available
-                            self.signal_times[next_lane] = self.controller.calculate_signal_time(
-                                next_lane, 
-                                self.vehicle_counts,
-                                self.has_ambulance
+                            self.signal_times[next_lane] = self.controller.calculate_green_time(
+                                self.vehicle_counts[next_lane]
                             )
                         else:
                             # Simple calculation: 5 seconds + 2 seconds per vehicle, max 30 seconds